@@ -0,0 +1,434 @@
+"""
+Columnar storage layer for telemetry data (Parquet via PyArrow)
+Converts the raw CSV once into a typed, compressed store. Later loads read
+only the columns / meters they need instead of re-parsing the whole CSV.
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:  # Optional: without pyarrow everything falls back to CSV
+    HAS_PYARROW = False
+
+
+STORE_SUFFIX = '.parquet'
+DEFAULT_COMPRESSION = 'zstd'
+DEFAULT_ROW_GROUP_SIZE = 100_000
+
+
+def store_path_for(path):
+    """Return the columnar store path that pairs with a CSV path"""
+    return Path(path).with_suffix(STORE_SUFFIX)
+
+
+def _is_store(path):
+    return Path(path).suffix.lower() == STORE_SUFFIX
+
+
+def _store_is_fresh(csv_path, store_path):
+    """Store is usable if it exists and is not older than its CSV"""
+    if not store_path.exists():
+        return False
+    if not csv_path.exists():
+        return True
+    return store_path.stat().st_mtime >= csv_path.stat().st_mtime
+
+
+def resolve_telemetry_path(path):
+    """
+    Return the file that should actually be read for `path`.
+
+    A `.csv` path resolves to its sibling `.parquet` when that store exists and
+    is up to date; otherwise the CSV itself. Returns None if neither exists.
+    """
+    path = Path(path)
+    if _is_store(path):
+        return path if path.exists() else None
+
+    store = store_path_for(path)
+    if HAS_PYARROW and _store_is_fresh(path, store):
+        return store
+    if path.exists():
+        return path
+    return None
+
+
+def telemetry_exists(path):
+    """True if the CSV or its columnar store exists"""
+    return resolve_telemetry_path(path) is not None
+
+
+def source_fingerprint(path):
+    """
+    Identity of the file actually read for `path` (resolved path, size, mtime),
+    used by derived caches to detect a changed source.
+    """
+    source = resolve_telemetry_path(path)
+    if source is None:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    stat = Path(source).stat()
+    return {'source': str(Path(source).resolve()), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def logical_fingerprint(path):
+    """
+    Identity of `path` itself (the CSV when it exists), unchanged when its
+    columnar store is created next to it; the store's identity otherwise.
+    """
+    path = Path(path)
+    if not path.exists():
+        return source_fingerprint(path)
+    stat = path.stat()
+    return {'source': str(path.resolve()), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _value_columns(columns):
+    return [col for col in columns if str(col).startswith('index_')]
+
+
+def _common_type(current, new):
+    """
+    Narrowest type that holds both: null < int64 < float64 < string.
+    A column only widens when a later chunk needs it (an integral column
+    that gets a fraction becomes float64, any column that gets text becomes
+    string), so integral columns stay int64 and keep all their digits.
+    """
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if pa.types.is_integer(current) and pa.types.is_integer(new):
+        return pa.int64()
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(check(current) for check in numeric) and any(check(new) for check in numeric):
+        return pa.float64()
+    return pa.string()
+
+
+def _parse_text(array):
+    """Text parsed from the CSV as int64 when every value is an integer, float64 when numeric, else kept"""
+    for target in (pa.int64(), pa.float64()):
+        try:
+            return pc.cast(array, target)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+    return array
+
+
+def _chunk_arrays(chunk):
+    """
+    Arrow arrays of a normalized chunk, each with the type its own values need:
+    - index_* readings as float64 (NaN = missing)
+    - id / data as dictionary-encoded strings
+    - other columns as int64 / float64 / string (text is parsed the way
+      pd.read_csv would, but exactly: 9007199254740993 stays an integer)
+    """
+    value_columns = set(_value_columns(chunk.columns))
+    arrays = {}
+    for name in chunk.columns:
+        if name in value_columns:
+            arrays[name] = pa.array(chunk[name], type=pa.float64(), from_pandas=True)
+        elif name in ('id', 'data'):
+            arrays[name] = pa.array(chunk[name], type=pa.string(), from_pandas=True).dictionary_encode()
+        else:
+            array = pa.array(chunk[name], from_pandas=True)
+            if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+                array = _parse_text(array)
+            arrays[name] = array
+    return arrays
+
+
+def _arrow_schema(arrays, schema=None):
+    """
+    Store schema for a chunk's arrays. The first chunk fixes the columns;
+    later chunks widen a field (see _common_type) when their values do not
+    fit the type inferred so far.
+    """
+    if schema is None:
+        return pa.schema([pa.field(name, array.type) for name, array in arrays.items()])
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            fields.append(field)
+        else:
+            fields.append(pa.field(field.name, _common_type(field.type, arrays[field.name].type)))
+    return pa.schema(fields)
+
+
+def _normalize_chunk(chunk):
+    """Make chunk dtypes consistent with the store schema"""
+    for col in ('id', 'data'):
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype('string').astype(object)
+    value_columns = _value_columns(chunk.columns)
+    if value_columns:
+        chunk[value_columns] = chunk[value_columns].astype(float)
+    return chunk
+
+
+def _chunk_table(arrays, schema):
+    """Arrow table of a chunk's arrays in the store schema"""
+    return pa.Table.from_arrays([arrays[field.name].cast(field.type) for field in schema], schema=schema)
+
+
+def convert_csv_to_store(csv_path, store_path=None, chunksize=500_000,
+                         compression=DEFAULT_COMPRESSION, verbose=True):
+    """
+    Convert a telemetry CSV into the columnar store, chunk by chunk.
+
+    Memory stays bounded by `chunksize` rows. Rows are written in file order
+    (the export is grouped by meter), so row-group statistics on `id` let
+    meter-subset reads skip most of the file. Columns other than the readings
+    are read as text and typed by TelemetryWriter, so a column whose later
+    chunks hold fractions or text is widened instead of failing the conversion.
+
+    Args:
+        csv_path: Source CSV
+        store_path: Destination (default: same name with .parquet)
+        chunksize: Rows parsed per chunk
+        compression: Parquet codec
+        verbose: Print progress
+
+    Returns:
+        Path of the written store
+    """
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow é necessário para o armazenamento colunar (pip install pyarrow)")
+
+    csv_path = Path(csv_path)
+    store_path = Path(store_path) if store_path else store_path_for(csv_path)
+
+    if verbose:
+        print(f"🗜️  Convertendo {csv_path.name} → {store_path.name} ({compression})...")
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    dtype = {col: str for col in header if col not in set(_value_columns(header))}
+    with TelemetryWriter(store_path, compression=compression) as writer:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=dtype):
+            writer.write(chunk)
+            if verbose:
+                print(f"   {writer.rows_written:,} linhas convertidas...")
+        if writer.rows_written == 0:
+            raise ValueError(f"Arquivo vazio: {csv_path}")
+
+    if verbose:
+        csv_mb = csv_path.stat().st_size / (1024 * 1024)
+        store_mb = store_path.stat().st_size / (1024 * 1024)
+        print(f"   ✓ {writer.rows_written:,} linhas | CSV {csv_mb:.1f} MB → Parquet {store_mb:.1f} MB")
+
+    return store_path
+
+
+def _convert_or_keep_csv(csv_path, verbose=False):
+    """
+    Store for `csv_path`, converted now; on any conversion error the partial
+    file is already removed and the CSV itself is returned, to be read with
+    pd.read_csv as before the store existed.
+    """
+    try:
+        return convert_csv_to_store(csv_path, verbose=verbose)
+    except Exception as e:
+        print(f"⚠️  Conversão de {Path(csv_path).name} para Parquet falhou ({e}); lendo o CSV")
+        return csv_path
+
+
+def _meter_filter(meter_ids):
+    if meter_ids is None:
+        return None
+    return [('id', 'in', [str(m) for m in meter_ids])]
+
+
+def _to_pandas(table):
+    """
+    DataFrame of a store table or batch. Dictionary columns come back as
+    plain strings, and integer columns with missing values as nullable
+    Int64 (instead of float64, which would turn 42 into 42.0)
+    """
+    df = table.to_pandas()
+    for name, column in zip(table.schema.names, table.columns):
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(object)
+        elif pa.types.is_integer(column.type) and column.null_count:
+            df[name] = column.to_pandas(types_mapper={column.type: pd.Int64Dtype()}.get).values
+    return df
+
+
+def load_telemetry(path, columns=None, meter_ids=None, convert=True, verbose=False):
+    """
+    Load telemetry (original or imputed) as a DataFrame.
+
+    Reads the columnar store when available. A CSV without an up-to-date store
+    is converted once (if pyarrow is installed and `convert` is True), so every
+    later call is a fast columnar read.
+
+    Args:
+        path: CSV or .parquet path
+        columns: Optional subset of columns to read
+        meter_ids: Optional iterable of meter ids to read (pushed down to Parquet)
+        convert: Build the store from the CSV if it is missing/stale
+        verbose: Print what is being read
+
+    Returns:
+        DataFrame
+    """
+    path = Path(path)
+    source = resolve_telemetry_path(path)
+    if source is None:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+
+    if not _is_store(source) and HAS_PYARROW and convert:
+        source = _convert_or_keep_csv(source, verbose=verbose)
+
+    if verbose:
+        print(f"📂 Lendo: {source}")
+
+    if _is_store(source):
+        table = pq.read_table(source, columns=columns, filters=_meter_filter(meter_ids))
+        return _to_pandas(table)
+
+    df = pd.read_csv(source, usecols=columns)
+    if meter_ids is not None:
+        wanted = set(str(m) for m in meter_ids)
+        df = df[df['id'].astype(str).isin(wanted)].reset_index(drop=True)
+    return df
+
+
+def iter_telemetry_chunks(path, chunksize=100_000, columns=None, convert=True):
+    """
+    Yield the telemetry file as DataFrame chunks of about `chunksize` rows,
+    in file order, without loading the whole file.
+    """
+    source = resolve_telemetry_path(path)
+    if source is None:
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+
+    if not _is_store(source) and HAS_PYARROW and convert:
+        source = _convert_or_keep_csv(source)
+
+    if _is_store(source):
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield _to_pandas(batch)
+    else:
+        for chunk in pd.read_csv(source, chunksize=chunksize, usecols=columns):
+            yield chunk
+
+
+def save_telemetry(df, path, compression=DEFAULT_COMPRESSION):
+    """
+    Save a telemetry DataFrame to the columnar store paired with `path`.
+
+    Falls back to CSV at `path` when pyarrow is not installed.
+
+    Returns:
+        Path actually written
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if not HAS_PYARROW:
+        csv_path = path if not _is_store(path) else path.with_suffix('.csv')
+        df.to_csv(csv_path, index=False)
+        return csv_path
+
+    store_path = path if _is_store(path) else store_path_for(path)
+    tmp_path = store_path.with_name(store_path.name + '.tmp')
+    out = _normalize_chunk(df.copy(deep=False))
+    out.to_parquet(tmp_path, index=False, compression=compression,
+                   row_group_size=DEFAULT_ROW_GROUP_SIZE)
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def telemetry_num_rows(path):
+    """Row count from the store metadata (None for CSV, which would need a full scan)"""
+    source = resolve_telemetry_path(path)
+    if source is None or not _is_store(source):
+        return None
+    return pq.ParquetFile(source).metadata.num_rows
+
+
+class TelemetryWriter:
+    """
+    Append DataFrame chunks incrementally to the store paired with `path`
+    (CSV when pyarrow is missing). Chunks go to a temporary file that only
+    replaces the target on a successful close(). The first chunk fixes the
+    columns and their types; a later chunk that needs a wider type (a
+    fraction in an integer column, text in a numeric one) rewrites the rows
+    written so far in the widened schema.
+    """
+
+    def __init__(self, path, compression=DEFAULT_COMPRESSION):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if HAS_PYARROW:
+            self.path = path if _is_store(path) else store_path_for(path)
+        else:
+            self.path = path if not _is_store(path) else path.with_suffix('.csv')
+        self.tmp_path = self.path.with_name(self.path.name + '.tmp')
+        self.compression = compression
+        self.rows_written = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, df):
+        if len(df) == 0:
+            return
+        if not HAS_PYARROW:
+            df.to_csv(self.tmp_path, mode='a', header=self.rows_written == 0, index=False)
+        else:
+            arrays = _chunk_arrays(_normalize_chunk(df.copy(deep=False)))
+            schema = _arrow_schema(arrays, self._schema)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.tmp_path, schema, compression=self.compression)
+            elif not schema.equals(self._schema):
+                self._widen(schema)
+            self._schema = schema
+            self._writer.write_table(_chunk_table(arrays, schema), row_group_size=DEFAULT_ROW_GROUP_SIZE)
+        self.rows_written += len(df)
+
+    def _widen(self, schema):
+        """Rewrite what was written so far in the widened schema, one row group at a time"""
+        self._writer.close()
+        previous = self.tmp_path.with_name(self.tmp_path.name + '.old')
+        os.replace(self.tmp_path, previous)
+        self._writer = pq.ParquetWriter(self.tmp_path, schema, compression=self.compression)
+        try:
+            with open(previous, 'rb') as source:
+                written = pq.ParquetFile(source)
+                for group in range(written.num_row_groups):
+                    self._writer.write_table(written.read_row_group(group).cast(schema))
+        finally:
+            previous.unlink()
+
+    def close(self):
+        """Finalize the file and move it into place; returns the written path"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.tmp_path.exists():
+            os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self.tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
@@ -13,6 +13,8 @@ from matplotlib.gridspec import GridSpec
 from datetime import datetime
 import sys
 
+from columnar_store import load_telemetry
+
 # Configurar estilo visual para prevenir lag
 plt.style.use('fast')
 sns.set_style("whitegrid")
@@ -21,9 +23,9 @@ def get_comparison_data(original_file, imputed_file='data/imputed_consumption_fu
     """Carrega dados e seleciona os 6 contadores para comparação"""
     
     print(f"[DATA] Carregando datasets...")
-    df_original = pd.read_csv(original_file)
+    df_original = load_telemetry(original_file)
     try:
-        df_imputed = pd.read_csv(imputed_file)
+        df_imputed = load_telemetry(imputed_file)
     except FileNotFoundError:
         print("[ERROR] Arquivo de imputação não encontrado para comparação")
         return None
@@ -1,18 +1,19 @@
 """
 Debug script to test smoothing on actual data
 """
-import pandas as pd
 import numpy as np
 from pathlib import Path
 import sys
 sys.path.append('c:/Users/Utilizador/Downloads/LATC')
 
+from columnar_store import load_telemetry, telemetry_exists
+
 # Load the data files
 resultado_final = Path("c:/Users/Utilizador/Downloads/LATC/data/RESULTADO_FINAL.csv")
 resultado_suavizado = Path("c:/Users/Utilizador/Downloads/LATC/data/RESULTADO_FINAL_SUAVIZADO.csv")
 
-if resultado_final.exists():
-    df_imputed = pd.read_csv(resultado_final)
+if telemetry_exists(resultado_final):
+    df_imputed = load_telemetry(resultado_final)
     print(f"✓ Loaded RESULTADO_FINAL.csv: {len(df_imputed)} rows")
     
     # Check a specific meter
@@ -36,8 +37,8 @@ if resultado_final.exists():
 else:
     print("✗ RESULTADO_FINAL.csv not found")
 
-if resultado_suavizado.exists():
-    df_smoothed = pd.read_csv(resultado_suavizado)
+if telemetry_exists(resultado_suavizado):
+    df_smoothed = load_telemetry(resultado_suavizado)
     print(f"\n✓ Loaded RESULTADO_FINAL_SUAVIZADO.csv: {len(df_smoothed)} rows")
     
     if test_meter in df_smoothed['id'].astype(str).values:
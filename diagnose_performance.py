@@ -6,6 +6,8 @@ import numpy as np
 import time
 from pathlib import Path
 
+from columnar_store import load_telemetry, resolve_telemetry_path, telemetry_exists
+
 def diagnose_bottleneck():
     print("🔍 Diagnóstico de Performance LATC\n")
     print("="*60)
@@ -13,17 +15,17 @@ def diagnose_bottleneck():
     # 1. Verificar tamanho do dataset
     data_file = Path("data/dataset_exemplo_70mb.csv")
     
-    if not data_file.exists():
+    if not telemetry_exists(data_file):
         print("❌ Arquivo de teste não encontrado")
         return
         
-    file_size = data_file.stat().st_size / (1024*1024)
+    file_size = resolve_telemetry_path(data_file).stat().st_size / (1024*1024)
     print(f"1. Tamanho do arquivo: {file_size:.1f} MB")
     
     # 2. Teste de leitura (I/O)
     print("\n2. Teste de I/O (leitura)...")
     start = time.time()
-    df = pd.read_csv(data_file)
+    df = load_telemetry(data_file)
     io_time = time.time() - start
     print(f"   Tempo de leitura: {io_time:.2f}s")
     print(f"   Linhas: {len(df):,}")
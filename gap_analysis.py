@@ -8,16 +8,73 @@ import pandas as pd
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
 import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import json
 from datetime import datetime
+from multiprocessing import Pool, cpu_count
 
+from columnar_store import iter_telemetry_chunks, load_telemetry, telemetry_exists
+from gap_index import gap_runs, gap_statistics, open_gap_index
+from gap_stream import GapAccumulator, sketch_quantiles
+from monotonic import meter_date_order
 
-def analyze_gaps(df, value_columns):
+
+def _shard_gap_stats(args):
+    """Worker: gap statistics of one shard of meters"""
+    missing, offsets = args
+    meters, _, lengths = gap_runs(missing, offsets)
+    return gap_statistics(meters, lengths, len(offsets) - 1)
+
+
+def meter_gap_stats(df, value_columns, id_column='id', date_column='data',
+                    n_workers=None, shard_rows=1_000_000):
+    """
+    Per-meter gap statistics on each meter's date-sorted series (gaps continue
+    across days). Frames larger than `shard_rows` rows are split at meter
+    boundaries and the shards processed in a multiprocessing Pool.
+    
+    Returns:
+        DataFrame (meter_id, hours, missing_count, missing_pct, num_gaps,
+        max_gap_size, avg_gap_size, median_gap_size), meters in first-appearance order
+    """
+    ids = df[id_column].values
+    dates = df[date_column].values if date_column in df.columns else None
+    order, offsets = meter_date_order(ids, dates)
+    missing = df[value_columns].isna().values[order]
+    n_meters = len(offsets) - 1
+    
+    # Shard boundaries (meter indices) every ~shard_rows rows
+    cuts = np.searchsorted(offsets, np.arange(0, offsets[-1], shard_rows))
+    bounds = np.unique(np.concatenate([[0], cuts, [n_meters]]))
+    shards = [(missing[offsets[a]:offsets[b]], offsets[a:b + 1] - offsets[a])
+              for a, b in zip(bounds[:-1], bounds[1:])]
+    
+    n_workers = n_workers or min(cpu_count(), len(shards))
+    if len(shards) > 1 and n_workers > 1:
+        with Pool(processes=n_workers) as pool:
+            results = pool.map(_shard_gap_stats, shards)
+    else:
+        results = [_shard_gap_stats(shard) for shard in shards]
+    
+    stats = {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+    hours = np.diff(offsets) * len(value_columns)
+    stats_df = pd.DataFrame({'meter_id': pd.unique(ids), 'hours': hours, **stats})
+    stats_df.insert(3, 'missing_pct', 100 * stats_df['missing_count'] / np.maximum(hours, 1))
+    return stats_df
+
+
+def analyze_gaps(df, value_columns, gap_index=None, n_workers=None):
     """
     Analyze gap patterns in the dataset
     
+    Statistics are per real meter id ('id' column), over each meter's whole
+    date-sorted series.
+    
+    Args:
+        gap_index: Optional GapIndex (gap_index.open_gap_index) of the same
+            data - statistics come straight from its gap lists (no rescan)
+        n_workers: Processes for the sharded scan (default: cpu_count())
+    
     Returns:
         dict: Comprehensive gap statistics
     """
@@ -25,62 +82,90 @@ def analyze_gaps(df, value_columns):
     print("ANÁLISE DE GAPS - Dataset de Telemetria")
     print("="*70)
     
-    consumption_matrix = df[value_columns].values.astype(float)
-    mask = ~np.isnan(consumption_matrix)
+    n_meters = df['id'].nunique()
+    if gap_index is not None and gap_index.n_meters == n_meters and (gap_index.lookup(pd.unique(df['id'])) >= 0).all():
+        stats = gap_index.meter_stats()
+        stats_df = pd.DataFrame(stats)
+        stats_df.insert(3, 'missing_pct', 100 * stats_df['missing_count'] / np.maximum(stats_df['hours'], 1))
+    else:
+        stats_df = meter_gap_stats(df, value_columns, n_workers=n_workers)
+    
+    return _summarize_gaps(stats_df, len(df), len(value_columns))
+
+
+def _chunk_accumulator(chunk):
+    """Worker: mergeable gap statistics of one chunk"""
+    value_columns = [col for col in chunk.columns if str(col).startswith('index_')]
+    dates = chunk['data'].values if 'data' in chunk.columns else None
+    return GapAccumulator.from_rows(chunk['id'].values, dates, chunk[value_columns].isna().values), len(chunk), len(value_columns)
+
+
+def analyze_gaps_streaming(data_file, chunksize=200_000, n_workers=None, max_pending=None):
+    """
+    Gap analysis in constant memory: the file is read in chunks, each chunk
+    reduced to a mergeable GapAccumulator (in a multiprocessing Pool, at most
+    `max_pending` chunks in flight) and the partials merged in file order.
+    
+    Rows of a meter must appear in date order across the file (see gap_stream).
+    The median gap per meter and the global gap quantiles come from a
+    log-bucket histogram sketch (exact up to 16 h, ~9 % buckets above).
+    
+    Returns:
+        dict: Same structure as analyze_gaps, plus 'gap_quantiles'
+    """
+    from collections import deque
+    
+    print("\n" + "="*70)
+    print("ANÁLISE DE GAPS - Dataset de Telemetria (Streaming)")
+    print("="*70)
+    
+    n_workers = n_workers or cpu_count()
+    max_pending = max_pending or 2 * n_workers
+    total = GapAccumulator()
+    n_rows = 0
+    n_cols = 0
+    
+    def absorb(result):
+        nonlocal total, n_rows, n_cols
+        partial, rows, cols = result
+        total = total.merge(partial)
+        n_rows += rows
+        n_cols = cols
+        print(f"   {n_rows:,} linhas processadas...")
+    
+    chunks = iter_telemetry_chunks(data_file, chunksize)
+    if n_workers > 1:
+        with Pool(processes=n_workers) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_chunk_accumulator, (chunk,)))
+                while len(pending) >= max_pending:
+                    absorb(pending.popleft().get())
+            while pending:
+                absorb(pending.popleft().get())
+    else:
+        for chunk in chunks:
+            absorb(_chunk_accumulator(chunk))
+    
+    stats_df, gap_histogram = total.meter_stats()
+    return _summarize_gaps(stats_df, n_rows, n_cols, gap_histogram)
+
+
+def _summarize_gaps(stats_df, n_rows, n_cols, gap_histogram=None):
+    """Print and package the per-meter statistics (analyze_gaps result dict)"""
+    n_meters = len(stats_df)
     
     # Global statistics
-    total_values = consumption_matrix.size
-    missing_count = np.sum(~mask)
-    missing_pct = 100 * missing_count / total_values
+    total_values = int(stats_df['hours'].sum())
+    missing_count = int(stats_df['missing_count'].sum())
+    missing_pct = 100 * missing_count / max(total_values, 1)
     
     print(f"\n📊 Estatísticas Globais:")
-    print(f"   Contadores: {consumption_matrix.shape[0]:,}")
-    print(f"   Timestamps: {consumption_matrix.shape[1]:,}")
+    print(f"   Contadores: {n_meters:,}")
+    print(f"   Linhas (contador × dia): {n_rows:,}")
     print(f"   Total de valores: {total_values:,}")
     print(f"   Valores faltantes: {missing_count:,} ({missing_pct:.2f}%)")
-    print(f"   Valores presentes: {np.sum(mask):,} ({100-missing_pct:.2f}%)")
-    
-    # Per-meter statistics
-    meter_stats = []
-    
-    for i in range(consumption_matrix.shape[0]):
-        row = consumption_matrix[i, :]
-        row_mask = ~np.isnan(row)
-        
-        missing_in_row = np.sum(~row_mask)
-        pct_missing = 100 * missing_in_row / len(row)
-        
-        # Find gap sequences
-        gaps = []
-        in_gap = False
-        gap_start = 0
-        
-        for j in range(len(row)):
-            if np.isnan(row[j]):
-                if not in_gap:
-                    gap_start = j
-                    in_gap = True
-            else:
-                if in_gap:
-                    gaps.append(j - gap_start)
-                    in_gap = False
-        
-        if in_gap:  # Gap extends to end
-            gaps.append(len(row) - gap_start)
-        
-        meter_id = df.iloc[i, 0] if 'id_contador' in df.columns else f"Meter_{i}"
-        
-        meter_stats.append({
-            'meter_id': meter_id,
-            'missing_count': missing_in_row,
-            'missing_pct': pct_missing,
-            'num_gaps': len(gaps),
-            'max_gap_size': max(gaps) if gaps else 0,
-            'avg_gap_size': np.mean(gaps) if gaps else 0,
-            'median_gap_size': np.median(gaps) if gaps else 0
-        })
-    
-    stats_df = pd.DataFrame(meter_stats)
+    print(f"   Valores presentes: {total_values - missing_count:,} ({100-missing_pct:.2f}%)")
     
     print(f"\n📈 Estatísticas por Contador:")
     print(f"   Contadores com 0% falta: {np.sum(stats_df['missing_pct'] == 0):,}")
@@ -89,55 +174,150 @@ def analyze_gaps(df, value_columns):
     print(f"   Contadores com >50% falta: {np.sum(stats_df['missing_pct'] > 50):,}")
     print(f"   Contadores 100% vazios: {np.sum(stats_df['missing_pct'] == 100):,}")
     
-    print(f"\n🔍 Tamanho dos Gaps:")
-    print(f"   Maior gap encontrado: {stats_df['max_gap_size'].max():.0f} horas")
-    print(f"   Gap médio: {stats_df['avg_gap_size'].mean():.1f} horas")
-    print(f"   Mediana de gap: {stats_df['median_gap_size'].median():.1f} horas")
+    num_gaps = int(stats_df['num_gaps'].sum())
+    cross_day = {
+        'num_gaps': num_gaps,
+        'max_gap_hours': int(stats_df['max_gap_size'].max()) if n_meters else 0,
+        'mean_gap_hours': missing_count / num_gaps if num_gaps else 0.0,
+        'meters_over_72h': int(np.sum(stats_df['max_gap_size'] > 72)),
+    }
+    
+    print(f"\n🔍 Tamanho dos Gaps (contínuos entre dias):")
+    print(f"   Total de gaps: {num_gaps:,}")
+    print(f"   Maior gap encontrado: {cross_day['max_gap_hours']:,} horas ({cross_day['max_gap_hours'] / 24:.1f} dias)")
+    print(f"   Gap médio: {cross_day['mean_gap_hours']:.1f} horas")
+    print(f"   Mediana de gap (mediana por contador): {stats_df['median_gap_size'].median():.1f} horas")
+    print(f"   Contadores com gap >72h: {cross_day['meters_over_72h']:,}")
+    
+    gap_quantiles = None
+    if gap_histogram is not None:
+        p50, p90, p99 = sketch_quantiles(gap_histogram, [0.5, 0.9, 0.99])
+        gap_quantiles = {'p50': float(p50), 'p90': float(p90), 'p99': float(p99)}
+        print(f"   Quantis de gap (sketch): p50={p50:.0f}h | p90={p90:.0f}h | p99={p99:.0f}h")
     
     return {
         'global': {
-            'total_meters': consumption_matrix.shape[0],
-            'total_timestamps': consumption_matrix.shape[1],
-            'total_values': int(total_values),
-            'missing_count': int(missing_count),
+            'total_meters': int(n_meters),
+            'total_rows': int(n_rows),
+            'total_timestamps': total_values,
+            'total_values': total_values,
+            'missing_count': missing_count,
             'missing_pct': float(missing_pct)
         },
         'meter_stats': stats_df.to_dict('records'),
-        'consumption_matrix_shape': consumption_matrix.shape,
+        'cross_day_gaps': cross_day,
+        'gap_quantiles': gap_quantiles,
+        'consumption_matrix_shape': (n_rows, n_cols),
         'timestamp': datetime.now().isoformat()
     }
 
 
-def generate_gap_heatmap(df, value_columns, output_path='data/gap_heatmap.png', sample_size=500):
+def gap_raster(df, value_columns, n_time_bins=400, max_rows=2000, sort_by='severity',
+               resolution='day', chunk_rows=500_000):
+    """
+    Missing-fraction image of the whole population: every meter is placed on
+    the common calendar and its missing slots are counted with bincount
+    straight into the image cells (no per-meter or per-cell loop).
+    
+    Args:
+        n_time_bins: Maximum image columns
+        max_rows: Image rows; with more meters, consecutive (sorted) meters
+            are aggregated into one row
+        sort_by: 'severity' (most missing first), 'calibre' (then severity)
+            or None (first-appearance order)
+        resolution: 'day' - columns are whole days (one bincount per row,
+            fast) - or 'hour' - columns group calendar hours (per-slot counts)
+        
+    Returns:
+        (image, bin_start_dates): image (rows, bins) with the missing fraction
+        in [0, 1], NaN where a bin has no row in the source
+    """
+    meter_codes, meter_ids = pd.factorize(df['id'], sort=False)
+    days = pd.to_datetime(df['data']).values.astype('datetime64[D]')
+    first_day = days.min()
+    day_index = (days - first_day).astype(np.int64)
+    is_missing = df[value_columns].isna().values
+    row_missing = is_missing.sum(axis=1)
+    n_cols = len(value_columns)
+    n_days = int(day_index.max()) + 1
+    n_meters = len(meter_ids)
+    
+    # Image row of every meter (sorted, then grouped down to max_rows)
+    rank = np.arange(n_meters)
+    if sort_by is not None:
+        missing_per_meter = np.bincount(meter_codes, weights=row_missing, minlength=n_meters)
+        severity = missing_per_meter / (np.bincount(meter_codes, minlength=n_meters) * n_cols)
+        keys = [-severity]
+        if sort_by == 'calibre' and 'calibre' in df.columns:
+            calibre = pd.Series(df['calibre'].values).groupby(meter_codes).first().reindex(np.arange(n_meters))
+            keys.append(pd.to_numeric(calibre, errors='coerce').astype(float).fillna(np.inf).values)
+        rank[np.lexsort(keys)] = np.arange(n_meters)
+    n_rows = min(n_meters, max_rows)
+    image_row = rank * n_rows // n_meters
+    
+    if resolution == 'day':
+        days_per_bin = -(-n_days // n_time_bins)
+        n_bins = -(-n_days // days_per_bin)
+        cells = image_row[meter_codes] * n_bins + day_index // days_per_bin
+        missing = np.bincount(cells, weights=row_missing, minlength=n_rows * n_bins)
+        total = np.bincount(cells, minlength=n_rows * n_bins) * float(n_cols)
+        bin_dates = first_day + (np.arange(n_bins) * days_per_bin).astype('timedelta64[D]')
+    else:
+        n_slots = n_days * n_cols
+        n_bins = max(1, min(n_time_bins, n_slots))
+        slot_bin = np.arange(n_slots) * n_bins // n_slots
+        hours = np.arange(n_cols)
+        missing = np.zeros(n_rows * n_bins)
+        total = np.zeros(n_rows * n_bins)
+        for start in range(0, len(df), chunk_rows):
+            stop = min(start + chunk_rows, len(df))
+            slots = day_index[start:stop, None] * n_cols + hours
+            cells = image_row[meter_codes[start:stop], None] * n_bins + slot_bin[slots]
+            missing += np.bincount(cells[is_missing[start:stop]], minlength=n_rows * n_bins)
+            total += np.bincount(cells.ravel(), minlength=n_rows * n_bins)
+        bin_dates = first_day + ((np.arange(n_bins) * n_slots // n_bins) // n_cols).astype('timedelta64[D]')
+    
+    missing = missing.reshape(n_rows, n_bins)
+    total = total.reshape(n_rows, n_bins)
+    image = np.divide(missing, total, out=np.full(missing.shape, np.nan), where=total > 0)
+    return image, bin_dates
+
+
+def generate_gap_heatmap(df, value_columns, output_path='data/gap_heatmap.png',
+                         n_time_bins=400, max_rows=2000, sort_by='severity', resolution='day'):
     """
     Generate heatmap visualization of gaps
+    
+    All meters are drawn (no sampling) as one raster image: each pixel is the
+    missing fraction of a meter (or group of meters) over a time bin.
+    See gap_raster for the arguments.
     """
     print(f"\n🎨 Gerando heatmap de gaps...")
     
-    consumption_matrix = df[value_columns].values.astype(float)
-    
-    # Sample if too large
-    if consumption_matrix.shape[0] > sample_size:
-        indices = np.random.choice(consumption_matrix.shape[0], sample_size, replace=False)
-        consumption_matrix = consumption_matrix[indices, :]
-        print(f"   (Amostrando {sample_size} contadores de {df.shape[0]} para visualização)")
-    
-    # Create binary mask (1=missing, 0=present)
-    gap_mask = np.isnan(consumption_matrix).astype(int)
-    
-    # Downsample timestamps for visualization
-    step = max(1, consumption_matrix.shape[1] // 200)  # ~200 colunas max
-    gap_mask_downsampled = gap_mask[:, ::step]
-    
-    plt.figure(figsize=(14, 8))
-    sns.heatmap(gap_mask_downsampled, cmap='RdYlGn_r', cbar_kws={'label': 'Missing Data'},
-                yticklabels=False, xticklabels=False)
-    plt.title('Padrão de Dados Faltantes (Vermelho = Falta)', fontsize=14)
-    plt.xlabel('Tempo (Horas)', fontsize=12)
-    plt.ylabel('Contadores', fontsize=12)
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close()
+    image, bin_dates = gap_raster(df, value_columns, n_time_bins, max_rows, sort_by, resolution)
+    n_meters = df['id'].nunique()
+    if n_meters > image.shape[0]:
+        print(f"   ({n_meters:,} contadores agregados em {image.shape[0]:,} linhas)")
+    
+    cmap = plt.get_cmap('RdYlGn_r').copy()
+    cmap.set_bad('lightgrey')
+    
+    fig, ax = plt.subplots(figsize=(14, 8))
+    im = ax.imshow(np.ma.masked_invalid(image), aspect='auto', cmap=cmap, vmin=0, vmax=1,
+                   interpolation='nearest')
+    fig.colorbar(im, ax=ax, label='Fração de Dados Faltantes')
+    
+    ticks = np.linspace(0, image.shape[1] - 1, min(8, image.shape[1])).astype(int)
+    ax.set_xticks(ticks)
+    ax.set_xticklabels([str(bin_dates[t]) for t in ticks], rotation=30, ha='right')
+    ax.set_yticks([])
+    order_label = {'severity': 'ordenados por % de falta', 'calibre': 'ordenados por calibre'}.get(sort_by, '')
+    ax.set_title('Padrão de Dados Faltantes (Vermelho = Falta, Cinza = Sem Registo)', fontsize=14)
+    ax.set_xlabel('Tempo', fontsize=12)
+    ax.set_ylabel(f'Contadores ({n_meters:,}) {order_label}'.strip(), fontsize=12)
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150, bbox_inches='tight')
+    plt.close(fig)
     
     print(f"   ✓ Heatmap salvo: {output_path}")
 
@@ -199,19 +379,27 @@ def generate_gap_report(stats, output_path='data/gap_report.md'):
 def main():
     """Run gap analysis on dataset"""
     import sys
-    import os
     
-    if len(sys.argv) > 1:
-        data_file = sys.argv[1]
-    else:
-        data_file = "data/telemetria_consumos_202507281246.csv"
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    data_file = args[0] if args else "data/telemetria_consumos_202507281246.csv"
     
-    if not os.path.exists(data_file):
+    if not telemetry_exists(data_file):
         print(f"❌ Erro: Arquivo não encontrado: {data_file}")
         return
     
+    if '--stream' in sys.argv:
+        # Constant memory: chunked read, mergeable statistics, no heatmap
+        print(f"🌊 Streaming: {data_file}")
+        stats = analyze_gaps_streaming(data_file)
+        Path("data").mkdir(exist_ok=True)
+        generate_gap_report(stats)
+        with open('data/gap_metrics.json', 'w', encoding='utf-8') as f:
+            json.dump(stats, f, indent=2, ensure_ascii=False)
+        print("\n✅ ANÁLISE COMPLETA (streaming)")
+        return
+    
     print(f"📂 Carregando: {data_file}")
-    df = pd.read_csv(data_file)
+    df = load_telemetry(data_file, verbose=True)
     
     value_columns = [col for col in df.columns if col.startswith('index_')]
     
@@ -219,8 +407,9 @@ def main():
         print("❌ Erro: Nenhuma coluna de valores encontrada (esperado 'index_*')")
         return
     
-    # Run analysis
-    stats = analyze_gaps(df, value_columns)
+    # Run analysis (the gap index is persisted and reused by later runs)
+    gap_index = open_gap_index(data_file, df=df)
+    stats = analyze_gaps(df, value_columns, gap_index=gap_index)
     
     # Generate outputs
     Path("data").mkdir(exist_ok=True)
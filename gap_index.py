@@ -0,0 +1,266 @@
+"""
+Run-length gap index over each meter's date-sorted hourly series
+Gaps are measured on the meter's concatenated series (day after day, hour
+after hour), so an outage that crosses midnight is one gap of its real length
+instead of several ≤24 h pieces. Days absent from the source are not counted.
+
+The index is computed in one vectorized pass (run starts / ends from the
+shifted missing mask, broken at meter boundaries) and persisted next to the
+data file, so the hybrid router, the gap report and the app reuse it without
+rescanning the readings.
+
+Index file (data/<arquivo>_gaps.npz):
+    meter_ids    str   (n_meters,)      - meter ids (first-appearance order)
+    hours        int64 (n_meters,)      - hourly slots per meter (rows × 24)
+    gap_offsets  int64 (n_meters + 1,)  - gaps of meter m: gap_offsets[m]:gap_offsets[m + 1]
+    gap_start    datetime64[h] (n_gaps,) - first missing hour of each gap
+    gap_length   int32 (n_gaps,)        - gap length in hours
+    fingerprint  str (JSON)             - source file identity
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import load_telemetry, source_fingerprint, telemetry_exists
+from monotonic import meter_date_order
+
+
+def gap_runs(missing, offsets):
+    """
+    Runs of missing values along each meter's flattened (rows × hours) series.
+
+    Args:
+        missing: (rows, hours) bool, rows of each meter contiguous and date-sorted
+        offsets: Meter boundaries (n_meters + 1,)
+
+    Returns:
+        (meters, positions, lengths): meter of each run, start position inside
+        the meter's flattened series, run length - ordered by meter then position
+    """
+    missing = np.asarray(missing, dtype=bool)
+    flat = missing.ravel()
+    n_cols = missing.shape[1] if missing.ndim == 2 else 1
+    flat_offsets = np.asarray(offsets, dtype=np.int64) * n_cols
+    if not flat.any():
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    # A run starts where the previous slot is present (or at a meter start)
+    # and ends where the next one is present (or at a meter end)
+    prev = np.concatenate([[False], flat[:-1]])
+    nxt = np.concatenate([flat[1:], [False]])
+    prev[flat_offsets[:-1][flat_offsets[:-1] < len(flat)]] = False
+    nxt[flat_offsets[1:][flat_offsets[1:] > 0] - 1] = False
+
+    run_starts = np.flatnonzero(flat & ~prev)
+    run_ends = np.flatnonzero(flat & ~nxt) + 1
+    meters = np.searchsorted(flat_offsets, run_starts, side='right') - 1
+    return meters, run_starts - flat_offsets[meters], run_ends - run_starts
+
+
+def max_gap_per_meter(missing, offsets):
+    """Longest missing run (hours) per meter; 0 = no gap"""
+    meters, _, lengths = gap_runs(missing, offsets)
+    max_gap = np.zeros(len(offsets) - 1, dtype=np.int64)
+    np.maximum.at(max_gap, meters, lengths)
+    return max_gap
+
+
+def gap_statistics(meters, lengths, n_meters):
+    """
+    Per-meter gap statistics from run lists, with array operations only.
+
+    Args:
+        meters: Meter index of each gap
+        lengths: Gap lengths (hours)
+        n_meters: Number of meters
+
+    Returns:
+        dict of (n_meters,) arrays: 'missing_count', 'num_gaps', 'max_gap_size',
+        'avg_gap_size', 'median_gap_size' (0 for meters without gaps)
+    """
+    meters = np.asarray(meters, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    num_gaps = np.bincount(meters, minlength=n_meters)
+    missing = np.bincount(meters, weights=lengths, minlength=n_meters).astype(np.int64)
+    max_gap = np.zeros(n_meters, dtype=np.int64)
+    np.maximum.at(max_gap, meters, lengths)
+    avg_gap = np.divide(missing, num_gaps, out=np.zeros(n_meters), where=num_gaps > 0)
+
+    # Median: middle element(s) of each meter's sorted run lengths
+    sorted_lengths = lengths[np.lexsort((lengths, meters))].astype(float)
+    first = np.concatenate([[0], np.cumsum(num_gaps)[:-1]])
+    has_gaps = num_gaps > 0
+    median_gap = np.zeros(n_meters)
+    lo = first[has_gaps] + (num_gaps[has_gaps] - 1) // 2
+    hi = first[has_gaps] + num_gaps[has_gaps] // 2
+    median_gap[has_gaps] = (sorted_lengths[lo] + sorted_lengths[hi]) / 2
+
+    return {
+        'missing_count': missing,
+        'num_gaps': num_gaps,
+        'max_gap_size': max_gap,
+        'avg_gap_size': avg_gap,
+        'median_gap_size': median_gap,
+    }
+
+
+class GapIndex:
+    """Per-meter gap lists (start, length) for a whole dataset"""
+
+    def __init__(self, meter_ids, hours, gap_offsets, gap_start, gap_length, fingerprint=None):
+        self.meter_ids = np.asarray(meter_ids)
+        self.hours = np.asarray(hours, dtype=np.int64)
+        self.gap_offsets = np.asarray(gap_offsets, dtype=np.int64)
+        self.gap_start = np.asarray(gap_start, dtype='datetime64[h]')
+        self.gap_length = np.asarray(gap_length, dtype=np.int32)
+        self.fingerprint = fingerprint
+        self._id_lookup = None
+
+    @property
+    def n_meters(self):
+        return len(self.meter_ids)
+
+    @property
+    def n_gaps(self):
+        return len(self.gap_length)
+
+    def gap_meter(self):
+        """Meter index of every gap"""
+        return np.repeat(np.arange(self.n_meters), np.diff(self.gap_offsets))
+
+    def missing_hours(self):
+        """Missing hours per meter"""
+        return np.bincount(self.gap_meter(), weights=self.gap_length, minlength=self.n_meters).astype(np.int64)
+
+    def max_gap(self):
+        """Longest gap (hours) per meter; 0 = no gap"""
+        max_gap = np.zeros(self.n_meters, dtype=np.int64)
+        np.maximum.at(max_gap, self.gap_meter(), self.gap_length)
+        return max_gap
+
+    def meter_stats(self):
+        """Per-meter statistics (see gap_statistics) plus 'meter_id' and 'hours'"""
+        stats = gap_statistics(self.gap_meter(), self.gap_length, self.n_meters)
+        return {'meter_id': self.meter_ids, 'hours': self.hours, **stats}
+
+    def lookup(self, meter_ids):
+        """Index positions of `meter_ids` (-1 for unknown ids)"""
+        if self._id_lookup is None:
+            self._id_lookup = pd.Index(self.meter_ids)
+        return self._id_lookup.get_indexer(np.asarray(meter_ids).astype(str))
+
+    def meter_gaps(self, meter_id):
+        """DataFrame (start, length_hours) of one meter's gaps"""
+        i = self.lookup([meter_id])[0]
+        if i < 0:
+            raise KeyError(meter_id)
+        lo, hi = self.gap_offsets[i], self.gap_offsets[i + 1]
+        return pd.DataFrame({'start': self.gap_start[lo:hi], 'length_hours': self.gap_length[lo:hi]})
+
+    def to_frame(self):
+        """All gaps as a long DataFrame (id, start, length_hours)"""
+        return pd.DataFrame({
+            'id': self.meter_ids[self.gap_meter()],
+            'start': self.gap_start,
+            'length_hours': self.gap_length,
+        })
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            meter_ids=self.meter_ids.astype(str),
+            hours=self.hours,
+            gap_offsets=self.gap_offsets,
+            gap_start=self.gap_start.astype(np.int64),
+            gap_length=self.gap_length,
+            fingerprint=np.array(json.dumps(self.fingerprint)),
+        )
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['meter_ids'], data['hours'], data['gap_offsets'],
+                data['gap_start'].astype('datetime64[h]'), data['gap_length'],
+                json.loads(str(data['fingerprint'])),
+            )
+
+
+def build_gap_index(df, value_columns, id_column='id', date_column='data', fingerprint=None):
+    """
+    Gap index of a long (id, data, index_*) frame.
+
+    Returns:
+        GapIndex (meters in first-appearance order)
+    """
+    order, offsets = meter_date_order(df[id_column].values, df[date_column].values)
+    missing = df[value_columns].isna().values[order]
+    meters, positions, lengths = gap_runs(missing, offsets)
+
+    n_cols = len(value_columns)
+    first_rows = order[offsets[meters] + positions // n_cols]
+    days = pd.to_datetime(pd.Series(df[date_column].values[first_rows])).values.astype('datetime64[h]')
+    gap_start = days + (positions % n_cols).astype('timedelta64[h]')
+
+    meter_ids = pd.factorize(df[id_column].values, sort=False)[1]
+    gap_offsets = np.concatenate([[0], np.cumsum(np.bincount(meters, minlength=len(meter_ids)))])
+    return GapIndex(np.asarray(meter_ids).astype(str), np.diff(offsets) * n_cols,
+                    gap_offsets, gap_start, lengths, fingerprint)
+
+
+def default_index_path(data_file):
+    """data/telemetria.csv -> data/telemetria_gaps.npz"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.stem + '_gaps.npz')
+
+
+def open_gap_index(data_file, index_path=None, rebuild=False, verbose=True, df=None):
+    """
+    Open the gap index for `data_file`, (re)building it if missing or stale.
+
+    `df` may be the already loaded frame of `data_file` (avoids a second read
+    when the index has to be built).
+    """
+    index_path = Path(index_path) if index_path else default_index_path(data_file)
+    fingerprint = source_fingerprint(data_file)
+    if not rebuild and index_path.exists():
+        index = GapIndex.load(index_path)
+        if index.fingerprint == fingerprint:
+            if verbose:
+                print(f"🕳️  Usando índice de gaps: {index_path}")
+            return index
+
+    if verbose:
+        print(f"🕳️  Construindo índice de gaps: {index_path}")
+    if df is None:
+        df = load_telemetry(data_file)
+    value_columns = [col for col in df.columns if col.startswith('index_')]
+    index = build_gap_index(df, value_columns, fingerprint=fingerprint)
+    index.save(index_path)
+    if verbose:
+        print(f"   ✓ {index.n_meters:,} contadores, {index.n_gaps:,} gaps")
+    return index
+
+
+def main():
+    """Build the gap index for a telemetry file"""
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    data_file = args[0] if args else "data/telemetria_consumos_202507281246.csv"
+
+    if not telemetry_exists(data_file):
+        print(f"❌ Erro: Arquivo não encontrado: {data_file}")
+        return
+
+    open_gap_index(data_file, rebuild='--rebuild' in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
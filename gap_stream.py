@@ -0,0 +1,208 @@
+"""
+Mergeable gap statistics for streaming analysis
+Per-meter accumulators that are built from one chunk of rows and merged in
+file order, so gap statistics of arbitrarily large files are computed in
+constant memory (per meter: a few counters plus a small log-bucket histogram).
+
+A partial result keeps, per meter, the closed gaps seen so far plus the
+still-open missing runs touching its first and last slot. Merging an earlier
+partial with a later one joins the later's leading run to the earlier's
+trailing run - a gap crossing a chunk boundary is counted once, with its real
+length. Merging is associative, so partials from parallel workers combine in
+chunk order.
+
+Rows of one meter may be split across chunks but must appear in date order
+across chunks (rows inside a chunk are date-sorted here).
+"""
+
+import numpy as np
+import pandas as pd
+
+from gap_index import gap_runs
+from monotonic import meter_date_order
+
+
+def _sketch_edges(exact=16, per_octave=4, octaves=24):
+    """Bucket lower bounds: exact up to `exact`, then log-spaced (~9 % wide)"""
+    geometric = np.round(exact * 2 ** (np.arange(1, per_octave * octaves + 1) / per_octave))
+    return np.unique(np.concatenate([np.arange(1, exact + 1), geometric])).astype(np.int64)
+
+
+SKETCH_EDGES = _sketch_edges()
+
+
+def sketch_bucket(lengths):
+    """Histogram bucket of each gap length"""
+    return np.searchsorted(SKETCH_EDGES, lengths, side='right') - 1
+
+
+def sketch_quantiles(histogram, quantiles):
+    """
+    Approximate quantiles from bucket counts: value of the bucket holding the
+    quantile (exact for lengths ≤ 16, geometric bucket center above).
+
+    Args:
+        histogram: (..., n_buckets) counts
+        quantiles: Sequence of q in [0, 1]
+
+    Returns:
+        (..., len(quantiles)) array (0 where the histogram is empty)
+    """
+    histogram = np.asarray(histogram)
+    upper = np.append(SKETCH_EDGES[1:], SKETCH_EDGES[-1] + 1)
+    centers = np.where(upper - SKETCH_EDGES > 1, np.sqrt(SKETCH_EDGES * (upper - 1)), SKETCH_EDGES)
+    cumulative = np.cumsum(histogram, axis=-1)
+    total = cumulative[..., -1:]
+    result = []
+    for q in quantiles:
+        target = np.maximum(np.ceil(q * total), 1)
+        bucket = np.minimum((cumulative < target).sum(axis=-1), len(SKETCH_EDGES) - 1)
+        result.append(np.where(total[..., 0] > 0, centers[bucket], 0.0))
+    return np.stack(result, axis=-1)
+
+
+class GapAccumulator:
+    """
+    Mergeable per-meter gap statistics of a contiguous stretch of rows.
+
+    Arrays are indexed like `meter_ids`:
+        hours, missing         - slots and missing slots seen
+        num_gaps, gap_sum,
+        max_gap, histogram     - closed gaps (both ends observed or merged)
+        head, tail             - open runs touching the first / last slot
+        full                   - every slot seen so far is missing (head = tail = hours)
+    """
+
+    FIELDS = ('hours', 'missing', 'num_gaps', 'gap_sum', 'max_gap', 'head', 'tail')
+
+    def __init__(self, meter_ids=None, n_buckets=len(SKETCH_EDGES)):
+        self.meter_ids = pd.Index([] if meter_ids is None else meter_ids)
+        n = len(self.meter_ids)
+        for field in self.FIELDS:
+            setattr(self, field, np.zeros(n, dtype=np.int64))
+        self.full = np.ones(n, dtype=bool)
+        self.histogram = np.zeros((n, n_buckets), dtype=np.int64)
+
+    @property
+    def n_meters(self):
+        return len(self.meter_ids)
+
+    def _record(self, meters, lengths):
+        """Add closed gaps"""
+        keep = lengths > 0
+        meters, lengths = meters[keep], lengths[keep]
+        np.add.at(self.num_gaps, meters, 1)
+        np.add.at(self.gap_sum, meters, lengths)
+        np.maximum.at(self.max_gap, meters, lengths)
+        np.add.at(self.histogram, (meters, sketch_bucket(lengths)), 1)
+
+    @classmethod
+    def from_rows(cls, ids, dates, missing):
+        """
+        Partial result of one chunk.
+
+        Args:
+            ids: Meter id per row
+            dates: Date per row (sortable), or None to keep row order
+            missing: (rows, slots) bool
+        """
+        order, offsets = meter_date_order(np.asarray(ids), dates)
+        missing = np.asarray(missing, dtype=bool)[order]
+        acc = cls(pd.unique(np.asarray(ids)).astype(str))
+        n_cols = missing.shape[1]
+
+        acc.hours = np.diff(offsets) * n_cols
+        acc.missing = np.add.reduceat(missing.sum(axis=1), offsets[:-1]) if len(missing) else acc.missing
+        meters, positions, lengths = gap_runs(missing, offsets)
+        touches_start = positions == 0
+        touches_end = positions + lengths == acc.hours[meters]
+
+        full = touches_start & touches_end
+        acc.full = acc.hours == 0
+        acc.full[meters[full]] = True
+        acc.head[meters[full]] = lengths[full]
+        acc.tail[meters[full]] = lengths[full]
+        head = touches_start & ~full
+        acc.head[meters[head]] = lengths[head]
+        tail = touches_end & ~full
+        acc.tail[meters[tail]] = lengths[tail]
+        interior = ~touches_start & ~touches_end
+        acc._record(meters[interior], lengths[interior])
+        return acc
+
+    def _aligned(self, meter_ids):
+        """Copy of the state reindexed to `meter_ids` (absent meters = empty)"""
+        other = GapAccumulator(meter_ids, self.histogram.shape[1])
+        positions = meter_ids.get_indexer(self.meter_ids)
+        for field in self.FIELDS + ('full', 'histogram'):
+            getattr(other, field)[positions] = getattr(self, field)
+        return other
+
+    def merge(self, later):
+        """
+        Combine with the partial result of the rows that follow.
+
+        Returns:
+            New GapAccumulator
+        """
+        meter_ids = self.meter_ids.append(later.meter_ids.difference(self.meter_ids, sort=False))
+        a, b = self._aligned(meter_ids), later._aligned(meter_ids)
+        merged = GapAccumulator(meter_ids, a.histogram.shape[1])
+
+        for field in ('hours', 'missing', 'num_gaps', 'gap_sum'):
+            setattr(merged, field, getattr(a, field) + getattr(b, field))
+        merged.max_gap = np.maximum(a.max_gap, b.max_gap)
+        merged.histogram = a.histogram + b.histogram
+        merged.full = a.full & b.full
+
+        # Open runs: a fully-missing side extends the other side's run
+        merged.head = np.where(a.full, a.hours + b.head, a.head)
+        merged.tail = np.where(b.full, a.tail + b.hours, b.tail)
+
+        # The run joining a's tail and b's head is closed when neither side is full
+        join = ~a.full & ~b.full
+        meters = np.flatnonzero(join)
+        merged._record(meters, (a.tail + b.head)[meters])
+        return merged
+
+    def finalize(self):
+        """
+        Close the open runs.
+
+        Returns:
+            (num_gaps, gap_sum, max_gap, histogram) per meter, open runs included
+        """
+        num_gaps = self.num_gaps.copy()
+        gap_sum = self.gap_sum.copy()
+        max_gap = self.max_gap.copy()
+        histogram = self.histogram.copy()
+        ends = np.concatenate([self.head, np.where(self.full, 0, self.tail)])
+        meters = np.concatenate([np.arange(self.n_meters)] * 2)
+        keep = ends > 0
+        meters, ends = meters[keep], ends[keep]
+        np.add.at(num_gaps, meters, 1)
+        np.add.at(gap_sum, meters, ends)
+        np.maximum.at(max_gap, meters, ends)
+        np.add.at(histogram, (meters, sketch_bucket(ends)), 1)
+        return num_gaps, gap_sum, max_gap, histogram
+
+    def meter_stats(self):
+        """
+        Per-meter statistics (same columns as gap_analysis.meter_gap_stats;
+        the median gap comes from the histogram sketch).
+
+        Returns:
+            (stats DataFrame, global histogram of gap lengths)
+        """
+        num_gaps, gap_sum, max_gap, histogram = self.finalize()
+        stats_df = pd.DataFrame({
+            'meter_id': np.asarray(self.meter_ids),
+            'hours': self.hours,
+            'missing_count': self.missing,
+            'missing_pct': 100 * self.missing / np.maximum(self.hours, 1),
+            'num_gaps': num_gaps,
+            'max_gap_size': max_gap,
+            'avg_gap_size': np.divide(gap_sum, num_gaps, out=np.zeros(self.n_meters), where=num_gaps > 0),
+            'median_gap_size': sketch_quantiles(histogram, [0.5])[:, 0],
+        })
+        return stats_df, histogram.sum(axis=0)
@@ -6,6 +6,7 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import latc_simple
+from columnar_store import load_telemetry, save_telemetry, telemetry_exists
 import os
 
 def generate_demo_imputed():
@@ -14,12 +15,12 @@ def generate_demo_imputed():
     input_file = Path("data/dataset_exemplo_70mb.csv")
     output_file = Path("data/dataset_exemplo_70mb_imputado.csv")
     
-    if not input_file.exists():
+    if not telemetry_exists(input_file):
         print(f"❌ Arquivo de entrada não encontrado: {input_file}")
         return
         
     print(f"📂 Lendo: {input_file}")
-    df = pd.read_csv(input_file)
+    df = load_telemetry(input_file)
     
     value_columns = [col for col in df.columns if col.startswith('index_')]
     print(f"   Colunas de valor: {len(value_columns)} (index_0..index_23)")
@@ -39,8 +40,8 @@ def generate_demo_imputed():
     
     print("\n✅ Imputação concluída!")
     
-    print(f"💾 Salvando: {output_file}")
-    imputed_df.to_csv(output_file, index=False)
+    output_file = save_telemetry(imputed_df, output_file)
+    print(f"💾 Salvo: {output_file}")
     
     print(f"✨ Arquivo de imputação demo criado com sucesso! ({output_file.stat().st_size / (1024*1024):.2f} MB)")
 
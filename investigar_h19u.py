@@ -3,7 +3,8 @@ Investigação do Contador H19U
 """
 
 import numpy as np
-import pandas as pd
+
+from columnar_store import load_telemetry
 
 print("="*80)
 print("INVESTIGAÇÃO: Contador H19U")
@@ -11,8 +12,8 @@ print("="*80)
 
 # Carregar dados
 print("\nCarregando dados do contador H19U...")
-df_original = pd.read_csv('data/telemetria_consumos_202507281246.csv')
-df_imputed = pd.read_csv('data/imputed_consumption_full.csv')
+df_original = load_telemetry('data/telemetria_consumos_202507281246.csv')
+df_imputed = load_telemetry('data/imputed_consumption_full.csv')
 
 # Filtrar contador H19U
 meter_orig = df_original[df_original['id'].str.contains('H19U', na=False)].sort_values('data')
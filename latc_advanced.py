@@ -14,12 +14,24 @@ import numpy as np
 import pandas as pd
 from scipy.sparse.linalg import svds
 from scipy.signal import savgol_filter
-from scipy.interpolate import UnivariateSpline
 from sklearn.preprocessing import StandardScaler
 import warnings
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
 from progress_tracker import ProgressTracker
+from columnar_store import load_telemetry, save_telemetry, telemetry_exists
+from tensor_cache import frame_to_tensor, open_tensor_cache
+from monotonic import enforce_monotonic_frame, enforce_monotonic_rows, enforce_monotonic_segments, meter_date_order
+from gap_fill import fill_gaps_batch
+from lowrank_svd import (clean_readings, complete_block, length_sorted_blocks, meter_ranks,
+                         soft_impute, stack_block)
+from latc_tensor import DEFAULT_TIME_LAGS, latc_impute_tensor
+from gap_index import max_gap_per_meter
+from meter_scheduler import isolated_executor_map
+from run_checkpoint import checkpointed_imputation, open_run_checkpoint
+from shared_matrix import group_rows_by_meter
+from smooth_fast_numpy import moving_average_segments, whittaker_lambda, whittaker_smooth
 
 
 def smooth_imputed_data(imputed_matrix, original_matrix, method='savgol', window_size=11, preserve_monotonicity=True, verbose=False):
@@ -27,12 +39,17 @@ def smooth_imputed_data(imputed_matrix, original_matrix, method='savgol', window
     Apply smoothing to imputed values while preserving original data points.
     
     This eliminates the "staircase" effect in imputed consumption profiles.
+    All rows with imputed values are smoothed together: Savitzky-Golay as one
+    filter along the hour axis, 'spline' as a Whittaker smoother (penalized
+    least squares, one banded solve for all rows), moving average as a rolling
+    mean along the hour axis.
     
     Args:
         imputed_matrix: Matrix with imputed values (numpy array)
         original_matrix: Original matrix with NaN gaps (numpy array)
         method: Smoothing method - 'moving_avg', 'spline', or 'savgol' (default: 'savgol')
-        window_size: Window size for smoothing (must be odd for savgol)
+        window_size: Window size for smoothing (must be odd for savgol; for
+            'spline' it sets the Whittaker penalty, see whittaker_lambda)
         preserve_monotonicity: Ensure non-decreasing values after smoothing
         verbose: Print progress messages
         
@@ -42,87 +59,73 @@ def smooth_imputed_data(imputed_matrix, original_matrix, method='savgol', window
     if verbose:
         print(f"\n🌊 Aplicando suavização ({method})...")
     
+    if method not in ('moving_avg', 'spline', 'savgol'):
+        raise ValueError(f"Unknown smoothing method: {method}")
+    
     # Create mask for imputed values (where original was NaN)
     mask_imputed = np.isnan(original_matrix)
     
     # Create output matrix (start with imputed values)
     smoothed_matrix = imputed_matrix.copy()
     
+    # Only rows with imputed values are smoothed
+    rows = np.flatnonzero(mask_imputed.any(axis=1))
+    if len(rows) == 0:
+        return smoothed_matrix
+    block = np.asarray(imputed_matrix[rows], dtype=float)
+    n_cols = block.shape[1]
+    
     # Ensure window size is odd for Savitzky-Golay
     if method == 'savgol' and window_size % 2 == 0:
         window_size += 1
     
-    # Apply smoothing row-by-row (each meter)
-    for i in range(imputed_matrix.shape[0]):
-        row = imputed_matrix[i, :].copy()
-        original_row = original_matrix[i, :]
-        imputed_mask_row = mask_imputed[i, :]
-        
-        # Skip if no imputed values in this row
-        if not imputed_mask_row.any():
-            continue
+    if method == 'moving_avg':
+        # Simple moving average (each row its own segment)
+        smoothed_rows = moving_average_segments(block, np.arange(len(block) + 1), window_size)
         
-        try:
-            if method == 'moving_avg':
-                # Simple moving average
-                df_row = pd.Series(row)
-                smoothed_row = df_row.rolling(window=window_size, center=True, min_periods=1).mean().values
-                
-            elif method == 'spline':
-                # Cubic spline interpolation
-                x = np.arange(len(row))
-                valid_mask = ~np.isnan(row)
-                if valid_mask.sum() > 3:  # Need at least 4 points for cubic spline
-                    spline = UnivariateSpline(x[valid_mask], row[valid_mask], k=3, s=len(row)*0.1)
-                    smoothed_row = spline(x)
-                else:
-                    smoothed_row = row  # Not enough points, skip smoothing
-                    
-            elif method == 'savgol':
-                # Savitzky-Golay filter (polynomial smoothing)
-                # Handle NaN values by temporarily filling them
-                row_filled = row.copy()
-                if np.isnan(row_filled).any():
-                    # Use linear interpolation for NaNs before smoothing
-                    row_series = pd.Series(row_filled)
-                    row_filled = row_series.interpolate(method='linear').bfill().ffill().values
-                
-                # Apply filter (requires window_size <= len(row))
-                actual_window = min(window_size, len(row_filled))
-                if actual_window % 2 == 0:
-                    actual_window -= 1
-                if actual_window >= 5:  # Minimum window for polynomial order 3
-                    smoothed_row = savgol_filter(row_filled, actual_window, polyorder=3)
-                else:
-                    smoothed_row = row_filled
-            else:
-                raise ValueError(f"Unknown smoothing method: {method}")
-            
-            # Only replace imputed values, keep original values intact
-            smoothed_matrix[i, imputed_mask_row] = smoothed_row[imputed_mask_row]
-            smoothed_matrix[i, ~imputed_mask_row] = original_row[~imputed_mask_row]
-            
-            # Optional: Preserve monotonicity (horizontal)
-            if preserve_monotonicity:
-                for j in range(1, smoothed_matrix.shape[1]):
-                    if smoothed_matrix[i, j] < smoothed_matrix[i, j-1]:
-                        smoothed_matrix[i, j] = smoothed_matrix[i, j-1]
+    elif method == 'spline':
+        # Whittaker smoother (2nd-order differences) over the valid points;
+        # rows with fewer than 4 valid points are left as they are
+        valid = ~np.isnan(block)
+        smoothed_rows = block.copy()
+        enough = valid.sum(axis=1) > 3
+        if enough.any():
+            smoothed_rows[enough] = whittaker_smooth(block[enough], whittaker_lambda(window_size),
+                                                     weights=valid[enough])
             
-        except Exception as e:
-            if verbose:
-                print(f"   ⚠️ Erro ao suavizar linha {i}: {e}. Mantendo valores originais.")
-            # Keep original imputed values if smoothing fails
-            continue
+    else:
+        # Savitzky-Golay filter (polynomial smoothing) along the hour axis
+        # Handle NaN values by temporarily filling them (linear + edges)
+        block_filled = fill_gaps_batch(block, np.arange(len(block) + 1), empty_value=np.nan)
+        
+        # Apply filter (requires window_size <= row length)
+        actual_window = min(window_size, n_cols)
+        if actual_window % 2 == 0:
+            actual_window -= 1
+        if actual_window >= 5:  # Minimum window for polynomial order 3
+            smoothed_rows = savgol_filter(block_filled, actual_window, polyorder=3, axis=1)
+        else:
+            smoothed_rows = block_filled
+    
+    # Only replace imputed values, keep original values intact
+    block_mask = mask_imputed[rows]
+    result_rows = np.where(block_mask, smoothed_rows, original_matrix[rows])
+    
+    # Optional: Preserve monotonicity (horizontal)
+    if preserve_monotonicity:
+        result_rows = enforce_monotonic_rows(result_rows)
+    smoothed_matrix[rows] = result_rows
     
     if verbose:
-        print(f"   ✓ Suavização concluída")
+        print(f"   ✓ Suavização concluída ({len(rows):,} linhas)")
     
     return smoothed_matrix
 
 
 def latc_svd_imputation(df, value_columns, n_components=20, max_iterations=3, 
                         tolerance=1e-4, enforce_monotonicity=True, apply_smoothing=False, 
-                        smoothing_method='savgol', smoothing_window=11, verbose=True, progress_callback=None):
+                        smoothing_method='savgol', smoothing_window=11, verbose=True, progress_callback=None,
+                        engine='batched', solver='svds', retries=1, meter_timeout=None):
     """
     Advanced LATC imputation using SVD-based matrix completion
     NOW WITH PER-METER PROCESSING to prevent cross-contamination
@@ -137,9 +140,19 @@ def latc_svd_imputation(df, value_columns, n_components=20, max_iterations=3,
         tolerance: Convergence tolerance
         enforce_monotonicity: Ensure non-decreasing values
         verbose: Print progress
+        engine: 'batched' (meters stacked in blocks, batched Gram eigendecompositions)
+            or 'threads' (one svds call per meter in a thread pool)
+        solver: Per-matrix solver for the 'threads' engine and the no-id path:
+            'svds', 'soft' or 'randomized' (see _legacy_svd_imputation)
+        retries: Extra attempts for a meter (or 'batched' block) that raises;
+            a failed block is retried meter by meter
+        meter_timeout: Seconds after which a meter (or block) is abandoned
+            (None = no limit)
         
     Returns:
-        DataFrame with scientifically imputed values
+        DataFrame with scientifically imputed values (same rows and row order as `df`).
+        result_df.attrs['quarantine'] maps each meter that failed or timed out
+        to its error; its rows are filled with the gap-fill kernel instead
     """
     if verbose:
         print("\n" + "="*70)
@@ -152,136 +165,131 @@ def latc_svd_imputation(df, value_columns, n_components=20, max_iterations=3,
             print("⚠️  WARNING: 'id' column not found. Using legacy mode (may cause spikes).")
         return _legacy_svd_imputation(df, value_columns, n_components, max_iterations, 
                                      tolerance, enforce_monotonicity, apply_smoothing,
-                                     smoothing_method, smoothing_window, verbose, progress_callback)
+                                     smoothing_method, smoothing_window, verbose, progress_callback,
+                                     solver=solver)
     
     # Process each meter separately to avoid cross-contamination
     # THREADING MODE (Windows/Streamlit compatible + Real speedup)
     # NumPy/SciPy release GIL during computations, so threads work well!
     unique_ids = df['id'].unique()
-    if verbose:
-        print(f"\n📊 Processando {len(unique_ids):,} contadores com THREADING...")
-        print(f"   (Threads paralelas + NumPy libera GIL)")
-    
-    import time
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    from multiprocessing import cpu_count
     
-    # Determine number of workers
-    n_workers = min(cpu_count(), 16)  # Cap at 16 for optimal performance
-    if verbose:
-        print(f"   Usando {n_workers} threads paralelas")
-    
-    # Worker function for one meter
-    def process_one_meter(meter_tuple):
-        meter_id, meter_df = meter_tuple
-        result = _legacy_svd_imputation(
-            meter_df, value_columns, n_components, max_iterations,
-            tolerance, enforce_monotonicity, apply_smoothing, smoothing_method, 
-            smoothing_window, verbose=False, progress_callback=None
+    if engine == 'batched':
+        if verbose:
+            print(f"\n📊 Processando {len(unique_ids):,} contadores em blocos (SVD em lote)...")
+        order, offsets = meter_date_order(df['id'].values)
+        imputed, failed = _batched_svd_imputation(
+            df[value_columns].values.astype(float)[order], offsets, n_components, max_iterations,
+            tolerance, enforce_monotonicity, apply_smoothing, smoothing_method, smoothing_window,
+            verbose=verbose, progress_callback=progress_callback, retries=retries, meter_timeout=meter_timeout
         )
-        return result
+        # Each row back at its input position
+        result_df = df.copy()
+        result_values = np.empty_like(imputed)
+        result_values[order] = imputed
+        result_df[value_columns] = result_values
+        result_df.attrs['quarantine'] = {df['id'].values[order[offsets[m]]]: error for m, error in failed.items()}
+    else:
+        if verbose:
+            print(f"\n📊 Processando {len(unique_ids):,} contadores com THREADING...")
+            print(f"   (Threads paralelas + NumPy libera GIL)")
+        
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from multiprocessing import cpu_count
     
-    # Group data first (avoid repeated filtering)
-    grouped = df.groupby('id', sort=False)
-    tasks = [(meter_id, group.copy()) for meter_id, group in grouped]
+        # Determine number of workers
+        n_workers = min(cpu_count(), 16)  # Cap at 16 for optimal performance
+        if verbose:
+            print(f"   Usando {n_workers} threads paralelas")
+    
+        # Worker function for one meter: (meter position, imputed values)
+        def process_one_meter(meter_tuple):
+            m, meter_df = meter_tuple
+            result = _legacy_svd_imputation(
+                meter_df, value_columns, n_components, max_iterations,
+                tolerance, enforce_monotonicity, apply_smoothing, smoothing_method, 
+                smoothing_window, verbose=False, progress_callback=None, solver=solver
+            )
+            return m, result[value_columns].values
+    
+        # Group row indices once; each meter's DataFrame is sliced only when
+        # its task is generated (at most 2 × n_workers in flight) and its
+        # result written back at the same rows
+        order, offsets = group_rows_by_meter(df['id'].values)
+        n_tasks = len(offsets) - 1
+        result_values = np.full((len(df), len(value_columns)), np.nan)
+        
+        def iter_tasks():
+            for m in range(n_tasks):
+                yield m, df.iloc[order[offsets[m]:offsets[m + 1]]]
+        
+        def store(result):
+            m, values = result
+            result_values[order[offsets[m]:offsets[m + 1]]] = values
     
-    start_time = time.time()
+        start_time = time.time()
+        quarantine = {}
     
-    # THREADING with ThreadPoolExecutor (Works great with NumPy!)
-    try:
+        # THREADING with ThreadPoolExecutor (Works great with NumPy!)
+        # Failures are isolated per meter: retried, then quarantined (filled
+        # with the gap-fill kernel) while the other meters carry on
         if verbose:
             print(f"   Iniciando processamento paralelo (threading)...")
-        
-        processed_batches = []
+    
         with ThreadPoolExecutor(max_workers=n_workers) as executor:
-            # Submit all tasks
-            future_to_idx = {executor.submit(process_one_meter, task): idx 
-                           for idx, task in enumerate(tasks)}
-            
-            # Collect results as they complete
+            # Collect results as they complete (tasks generated lazily)
             completed = 0
-            for future in as_completed(future_to_idx):
-                result = future.result()
-                processed_batches.append(result)
+            for m, result, error in isolated_executor_map(executor, process_one_meter, iter_tasks(),
+                                                         2 * n_workers, retries=retries,
+                                                         timeout=meter_timeout):
+                if error is None:
+                    store(result)
+                else:
+                    # Quarantined: the cheap kernel (gap fill + monotonic rows) instead
+                    rows = order[offsets[m]:offsets[m + 1]]
+                    fallback = fill_gaps_batch(df.iloc[rows][value_columns].values.astype(float))
+                    result_values[rows] = enforce_monotonic_rows(fallback) if enforce_monotonicity else fallback
+                    quarantine[df['id'].values[rows[0]]] = error
+                    if verbose:
+                        print(f"   ⚠️  Contador {df['id'].values[rows[0]]} em quarentena: {error}")
                 completed += 1
-                
+            
                 # Progress reporting every 20 meters
-                if verbose and (completed % 20 == 0 or completed == len(tasks)):
+                if verbose and (completed % 20 == 0 or completed == n_tasks):
                     elapsed = time.time() - start_time
-                    percent = completed / len(tasks) * 100
+                    percent = completed / n_tasks * 100
                     throughput = completed / elapsed if elapsed > 0 else 0
-                    eta_seconds = (len(tasks) - completed) / throughput if throughput > 0 else 0
+                    eta_seconds = (n_tasks - completed) / throughput if throughput > 0 else 0
                     eta_min = eta_seconds / 60
-                    
-                    print(f"   [{completed}/{len(tasks)}] {percent:.1f}% | {throughput:.1f} c/s | ETA: {eta_min:.1f}min")
                 
+                    print(f"   [{completed}/{n_tasks}] {percent:.1f}% | {throughput:.1f} c/s | ETA: {eta_min:.1f}min")
+            
                 # Update Streamlit progress callback more frequently (every 10 meters)
                 if progress_callback and completed % 10 == 0:
                     progress_pct = int(80 * completed / len(unique_ids))
                     progress_callback(progress_pct, f"Processando contador {completed}/{len(unique_ids)}")
-        
+    
         elapsed = time.time() - start_time
         throughput = len(unique_ids) / elapsed
-        
+    
         if verbose:
             print(f"\n   ✅ Threading: {elapsed:.1f}s ({throughput:.1f} meters/s)")
-        
-    except Exception as e:
-        if verbose:
-            print(f"\n   ⚠️  Threading failed: {e}")
-            print(f"   Falling back to sequential processing...")
-        
-        # Sequential fallback (only if threading fails - unlikely)
-        processed_batches = []
-        for idx, task in enumerate(tasks):
-            result = process_one_meter(task)
-            processed_batches.append(result)
-            
-            # Progress reporting every 20 meters
-            if verbose and (idx % 20 == 0 or idx == len(tasks)-1):
-                elapsed = time.time() - start_time
-                percent = (idx + 1) / len(tasks) * 100
-                throughput = (idx + 1) / elapsed if elapsed > 0 else 0
-                eta_seconds = (len(tasks) - idx - 1) / throughput if throughput > 0 else 0
-                eta_min = eta_seconds / 60
-                
-                print(f"   [{idx+1}/{len(tasks)}] {percent:.1f}% | {throughput:.1f} c/s | ETA: {eta_min:.1f}min")
-            
-            if progress_callback and idx % 10 == 0:
-                progress_pct = int(80 * (idx + 1) / len(unique_ids))
-                progress_callback(progress_pct, f"Processando contador {idx+1}/{len(unique_ids)}")
+            if quarantine:
+                print(f"   ⚠️  {len(quarantine)} contadores em quarentena (preenchimento linear)")
     
-    # Combine all meters
-    result_df = pd.concat(processed_batches, ignore_index=True)
+        # Same rows and order as the input
+        result_df = df.copy()
+        result_df[value_columns] = result_values
+        result_df.attrs['quarantine'] = quarantine
     
     # CRITICAL FIX: Enforce GLOBAL monotonicity per meter (across ALL days)
     # The per-day enforcement above doesn't catch drops between days
     if verbose:
         print(f"\n🔧 Aplicando monotonicidade global (corrigindo quedas entre dias)...")
     
-    for meter_id in unique_ids:
-        mask = result_df['id'] == meter_id
-        meter_rows = result_df[mask].copy()
-        
-        # Sort by date to ensure chronological order
-        if 'data' in meter_rows.columns:
-            meter_rows = meter_rows.sort_values('data')
-        
-        # Flatten all values (days × hours)
-        all_values = meter_rows[value_columns].values.flatten()
-        
-        # Enforce strict monotonicity globally
-        for i in range(1, len(all_values)):
-            if all_values[i] < all_values[i-1]:
-                all_values[i] = all_values[i-1]  # Never decrease
-        
-        # Reshape back to matrix
-        n_rows = len(meter_rows)
-        n_cols = len(value_columns)
-        corrected_matrix = all_values.reshape(n_rows, n_cols)
-        
-        # Update dataframe
-        result_df.loc[mask, value_columns] = corrected_matrix
+    # Single segmented pass over the (id, date)-sorted values, written back
+    # to each row's own position
+    result_df[value_columns] = enforce_monotonic_frame(result_df, value_columns)
     
     if verbose:
         final_matrix = result_df[value_columns].values.astype(float)
@@ -292,119 +300,236 @@ def latc_svd_imputation(df, value_columns, n_components=20, max_iterations=3,
     return result_df
 
 
-def _legacy_svd_imputation(df, value_columns, n_components=50, max_iterations=10,
-                          tolerance=1e-4, enforce_monotonicity=True, apply_smoothing=False,
-                          smoothing_method='savgol', smoothing_window=11, verbose=True, progress_callback=None):
-    """Legacy SVD imputation (processes all rows together - used per-meter in new mode)"""
+def latc_svd_imputation_cached(cache, n_components=20, max_iterations=3, tolerance=1e-4,
+                               enforce_monotonicity=True, apply_smoothing=False,
+                               smoothing_method='savgol', smoothing_window=11,
+                               verbose=True, progress_callback=None, engine='batched'):
+    """
+    Per-meter SVD imputation reading meters straight from the tensor cache.
     
-    result_df = df.copy()
-    consumption_matrix = df[value_columns].values.astype(float)
-    original_matrix = consumption_matrix.copy()
+    Same algorithm as latc_svd_imputation. The cached rows are already grouped
+    by meter and date-sorted, so the batched engine runs on them directly; the
+    'threads' engine slices each meter's (days, 24) matrix from the
+    memory-mapped cache instead of grouping a DataFrame.
     
-    # Track missing values
-    mask = ~np.isnan(consumption_matrix)
-    total_values = consumption_matrix.size
-    missing_count = np.sum(~mask)
+    Args:
+        cache: TensorCache (see tensor_cache.open_tensor_cache)
+        (other args as in latc_svd_imputation)
+        
+    Returns:
+        DataFrame (id, data, index_*) ordered by meter then date; quarantined
+        meters of the batched engine in `result.attrs['quarantine']`
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from multiprocessing import cpu_count
     
-    if verbose:
-        print(f"\n📊 Dados:")
-        print(f"   Shape: {consumption_matrix.shape}")
-        print(f"   Missing: {missing_count:,} ({100*missing_count/total_values:.2f}%)")
-        print(f"   SVD Components: {n_components}")
+    value_columns = cache.value_columns
+    n_meters = cache.n_meters
+    offsets = cache.row_offsets()
+    imputed_rows = np.empty((offsets[-1], len(value_columns)))
     
-    # PHASE 1: Initial Fill (Smart Interpolation)
     if verbose:
-        print(f"\n🔧 Fase 1: Pré-processamento (Inicialização Inteligente)...")
+        print("\n" + "="*70)
+        print("LATC CIENTÍFICO - Matrix Factorization SVD (Cache Tensorial)")
+        print("="*70)
+        print(f"\n📊 Processando {n_meters:,} contadores a partir de {cache.cache_dir}")
     
-    # Use Pandas for robust interpolation (Vertical then Horizontal)
-    # This provides a MUCH better starting point for SVD than just means
-    temp_df = pd.DataFrame(consumption_matrix)
+    start_time = time.time()
+    quarantine = {}
+    
+    if engine == 'batched':
+        present = np.asarray(cache.present)
+        meter_index, day_index = np.nonzero(present)
+        imputed_rows, failed = _batched_svd_imputation(
+            cache.values[meter_index, day_index], offsets, n_components, max_iterations, tolerance,
+            enforce_monotonicity, apply_smoothing, smoothing_method, smoothing_window,
+            verbose=verbose, progress_callback=progress_callback
+        )
+        quarantine = {str(cache.meter_ids[m]): error for m, error in failed.items()}
+    else:
+        def process_one_meter(i):
+            _, matrix = cache.meter_matrix(i)
+            if len(matrix) == 0:
+                return
+            result = _legacy_svd_imputation(
+                pd.DataFrame(matrix, columns=value_columns), value_columns, n_components, max_iterations,
+                tolerance, enforce_monotonicity, apply_smoothing, smoothing_method,
+                smoothing_window, verbose=False, progress_callback=None
+            )
+            imputed_rows[offsets[i]:offsets[i + 1]] = result[value_columns].values
+        
+        n_workers = min(cpu_count(), 16)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for completed, _ in enumerate(executor.map(process_one_meter, range(n_meters)), start=1):
+                if progress_callback and completed % 10 == 0:
+                    progress_callback(int(80 * completed / n_meters), f"Processando contador {completed}/{n_meters}")
     
-    # 1. Horizontal Interpolation (within day)
-    temp_df = temp_df.interpolate(method='linear', axis=1, limit_direction='both')
+    # Global monotonicity per meter (rows are already date-sorted in the cache)
+    if enforce_monotonicity:
+        imputed_rows = enforce_monotonic_segments(imputed_rows, offsets)
     
-    # 2. Vertical Fill - NOW SAFE within single meter context
-    if temp_df.isnull().values.any():
-        if verbose:
-            print("   Aplicando forward-fill vertical para dias vazios...")
-        temp_df = temp_df.ffill(axis=0).bfill(axis=0)
-    
-    # 3. Final fallback: Horizontal fill then mean
-    temp_df = temp_df.ffill(axis=1).bfill(axis=1)
-    
-    # Fill NaN with row means for initial estimate
-    # -------------------------------------------------------------------------
-    # CLEANING STEP: Filter Outliers (User Request)
-    # 1. Zero values are often sensor errors in accumulated data -> Convert to NaN
-    # 2. Drops (Current < Previous) that aren't resets -> Convert to NaN
-    # -------------------------------------------------------------------------
     if verbose:
-        print("🔧 Limpeza Prévia: Removendo zeros e quedas inválidas...")
+        elapsed = time.time() - start_time
+        print(f"\n✅ Imputação Completa: {elapsed:.1f}s ({n_meters / max(elapsed, 1e-9):.1f} meters/s)")
     
-    # 1. Treat Zeros as False
-    consumption_matrix[consumption_matrix == 0] = np.nan
-    mask = ~np.isnan(consumption_matrix) # Update mask after cleaning zeros
+    result_df = cache.to_frame(imputed_rows)
+    result_df.attrs['quarantine'] = quarantine
+    return result_df
+
+
+def _batched_svd_imputation(values, offsets, n_components=20, max_iterations=3, tolerance=1e-4,
+                            enforce_monotonicity=True, apply_smoothing=False, smoothing_method='savgol',
+                            smoothing_window=11, meters_per_block=256, verbose=True, progress_callback=None,
+                            retries=1, meter_timeout=None):
+    """
+    Per-meter SVD imputation for many meters at once (same pipeline as
+    _legacy_svd_imputation: cleaning, smart init, rank-k refinement,
+    post-processing).
     
-    # 1.5. Filter Spikes (ANTI-RATCHET)
-    if verbose:
-        print("   Aplicando filtro Anti-Spike (Rolling Median)...")
+    Meters are stacked in length-sorted, zero-padded blocks and refined with
+    batched 24×24 Gram eigendecompositions instead of one svds call each.
+    
+    Args:
+        values: (rows, 24) readings, rows of each meter contiguous
+        offsets: Meter boundaries (n_meters + 1,)
+        meters_per_block: Meters stacked per batched solve
+        (other args as in latc_svd_imputation)
         
-    # Use Pandas for rolling median (horizontal window)
-    temp_spike_df = pd.DataFrame(consumption_matrix)
-    median_df = temp_spike_df.rolling(window=5, center=True, min_periods=1, axis=1).median()
+    Returns:
+        (imputed, quarantine): imputed (rows, 24) array in the same row order,
+        and {meter position: error} for the meters that failed or timed out
+        (filled with the gap-fill kernel instead)
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from multiprocessing import cpu_count
     
-    # Define Spike: Value > 1.25 * Median
-    is_spike = (temp_spike_df > median_df * 1.25) & (median_df > 10)
+    original_matrix = np.asarray(values, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
     
-    if is_spike.values.any():
-        count = is_spike.values.sum()
-        if verbose:
-            print(f"      -> Removidos {count} spikes detectados.")
-        temp_spike_df[is_spike] = np.nan
-        consumption_matrix = temp_spike_df.values
-
-    # 2. Filter Drops (STRICT MONOTONICITY FILTER - VECTORIZED)
-    if verbose:
-        print("   Aplicando filtro de monotonicidade estrita (removendo quedas - vetorizado)...")
+    # Cleaning + smart init, vectorized over all meters (never across meters)
+    cleaned = clean_readings(original_matrix, offsets)
+    mask = ~np.isnan(cleaned)
+    initial_filled = fill_gaps_batch(cleaned, offsets, empty_value=np.nan)
+    
+    ranks = meter_ranks(offsets, original_matrix.shape[1], n_components)
+    imputed_matrix = initial_filled.copy()
+    blocks = length_sorted_blocks(offsets, meters_per_block)
+    
+    def process_block(task):
+        _, meters = task
+        block, row_index, row_valid = stack_block(initial_filled, offsets, meters)
+        missing = np.zeros(block.shape, dtype=bool)
+        missing[row_valid] = ~mask[row_index[row_valid]]
+        block_ranks = ranks[meters].copy()
+        # Meters without any reading stay missing (svds would fail on them)
+        block_ranks[np.isnan(block).any(axis=(1, 2))] = 0
+        block, iterations = complete_block(block, missing, block_ranks, max_iterations, tolerance)
+        # Written back by the caller, so an abandoned block never overwrites anything
+        return row_index[row_valid], block[row_valid], iterations
+    
+    start_time = time.time()
+    total_iterations = 0
+    n_workers = min(cpu_count(), 16)
+    failed_meters = []
+    quarantine = {}
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        # Failures are isolated per block (retried, abandoned after meter_timeout)
+        tasks = enumerate(blocks)
+        for done, (b, result, error) in enumerate(
+                isolated_executor_map(executor, process_block, tasks, 2 * n_workers,
+                                      retries=retries, timeout=meter_timeout), start=1):
+            if error is None:
+                rows, block_values, iterations = result
+                imputed_matrix[rows] = block_values
+                total_iterations += int(iterations.sum())
+            else:
+                failed_meters.extend(int(m) for m in blocks[b])
+            if progress_callback:
+                progress_callback(int(80 * done / len(blocks)), f"Processando bloco {done}/{len(blocks)}")
         
-    # VECTORIZED VERSION: 10-15x faster than loops
-    # Calc row-wise differences (current - previous along axis 0)
-    diff_matrix = np.diff(consumption_matrix, axis=0, prepend=consumption_matrix[0:1])
+        # A failed block is solved again meter by meter; only the meters that
+        # fail on their own are quarantined and keep the initial fill
+        # (fill_gaps_batch, made monotonic below)
+        tasks = ((m, np.array([m])) for m in failed_meters)
+        for m, result, error in isolated_executor_map(executor, process_block, tasks, 2 * n_workers,
+                                                      retries=retries, timeout=meter_timeout):
+            if error is None:
+                rows, block_values, iterations = result
+                imputed_matrix[rows] = block_values
+                total_iterations += int(iterations.sum())
+            else:
+                quarantine[m] = error
     
-    # Identify drops: current < previous AND both are valid
-    valid_mask = ~np.isnan(consumption_matrix)
-    prev_valid_mask = np.vstack([np.full((1, consumption_matrix.shape[1]), False), valid_mask[:-1]])
+    if verbose:
+        elapsed = time.time() - start_time
+        n_meters = len(offsets) - 1
+        print(f"   ✅ SVD em lote: {elapsed:.1f}s ({n_meters / max(elapsed, 1e-9):.1f} meters/s, "
+              f"{len(blocks)} blocos, {total_iterations / max(n_meters, 1):.1f} iterações/contador)")
+        if quarantine:
+            print(f"   ⚠️  {len(quarantine)} contadores em quarentena (preenchimento linear)")
+    
+    # Restore known values, then the same post-processing as the per-meter path
+    imputed_matrix[mask] = original_matrix[mask]
+    
+    if enforce_monotonicity:
+        imputed_matrix = enforce_monotonic_rows(imputed_matrix)
+    
+    if apply_smoothing:
+        # Row-wise, so it can run on all meters together
+        imputed_matrix = smooth_imputed_data(
+            imputed_matrix=imputed_matrix,
+            original_matrix=original_matrix,
+            method=smoothing_method,
+            window_size=smoothing_window,
+            preserve_monotonicity=enforce_monotonicity,
+            verbose=verbose
+        )
     
-    # Drops where both current and previous are valid
-    both_valid = valid_mask & prev_valid_mask
+    return np.maximum(imputed_matrix, 0), quarantine
+
+
+def _legacy_svd_imputation(df, value_columns, n_components=50, max_iterations=10,
+                          tolerance=1e-4, enforce_monotonicity=True, apply_smoothing=False,
+                          smoothing_method='savgol', smoothing_window=11, verbose=True, progress_callback=None,
+                          solver='svds', oversampling=10, power_iterations=2):
+    """
+    Legacy SVD imputation (processes all rows together - used per-meter in new mode)
     
-    # Calculate ratio for drops (vectorized)
-    prev_values = np.vstack([consumption_matrix[0:1], consumption_matrix[:-1]])
-    ratios = np.divide(consumption_matrix, prev_values, 
-                       out=np.ones_like(consumption_matrix), 
-                       where=prev_values > 0)
+    solver: 'svds' (fresh truncated SVD + dense reconstruction every iteration),
+        'soft' (exact Gram factors, masked-only reconstruction, see
+        lowrank_svd.soft_impute) or 'randomized' (warm-started row-blocked
+        randomized range finder - bounded memory for network-wide runs;
+        `oversampling` / `power_iterations` tune the sketch)
+    """
     
-    # Mark as NaN if: drop detected AND ratio > 0.1 (not a full reset)
-    invalid_drops = both_valid & (diff_matrix < 0) & (ratios > 0.1)
-    consumption_matrix[invalid_drops] = np.nan
+    result_df = df.copy()
+    consumption_matrix = df[value_columns].values.astype(float)
+    original_matrix = consumption_matrix.copy()
     
-    # Update mask
+    # Track missing values
     mask = ~np.isnan(consumption_matrix)
+    total_values = consumption_matrix.size
+    missing_count = np.sum(~mask)
     
-    # 4. Last resort: Global Mean (after cleaning)
-    row_means = np.nanmean(consumption_matrix, axis=1, keepdims=True)
-    global_mean = np.nanmean(consumption_matrix)
+    if verbose:
+        print(f"\n📊 Dados:")
+        print(f"   Shape: {consumption_matrix.shape}")
+        print(f"   Missing: {missing_count:,} ({100*missing_count/total_values:.2f}%)")
+        print(f"   SVD Components: {n_components}")
     
-    # Smart Init (same as before)
-    temp_df = pd.DataFrame(consumption_matrix)
-    temp_df = temp_df.interpolate(method='linear', axis=1, limit_direction='both')
+    # PHASE 1: Cleaning + Initial Fill (Smart Interpolation)
+    # 1. Zero values are often sensor errors in accumulated data -> NaN
+    # 2. Spikes above 1.25 × the rolling median (anti-ratchet) -> NaN
+    # 3. Drops (current < previous day) that aren't resets -> NaN
+    # Then horizontal interpolation + vertical fill, all vectorized
+    if verbose:
+        print(f"\n🔧 Fase 1: Limpeza (zeros, spikes, quedas) + Inicialização Inteligente...")
     
-    if temp_df.isnull().values.any():
-        if verbose:
-            print("   Aplicando forward-fill vertical para dias vazios...")
-        temp_df = temp_df.ffill(axis=0).bfill(axis=0)
-        
-    initial_filled = temp_df.values
+    consumption_matrix = clean_readings(consumption_matrix, [0, len(consumption_matrix)])
+    mask = ~np.isnan(consumption_matrix)
+    initial_filled = fill_gaps_batch(consumption_matrix, empty_value=np.nan)
     
     # PHASE 2: Iterative SVD Refinement
     if verbose:
@@ -418,36 +543,49 @@ def _legacy_svd_imputation(df, value_columns, n_components=50, max_iterations=10
     if verbose:
         print(f"   Usando rank={rank}")
     
-    for iteration in range(max_iterations):
-        # SVD decomposition
-        try:
-            U, s, Vt = svds(imputed_matrix, k=rank)
-            # Reconstruct
-            reconstructed = U @ np.diag(s) @ Vt
-        except:
-            if verbose:
-                print(f"   ⚠️  SVD falhou, usando valores atuais")
-            break
+    if solver in ('soft', 'randomized'):
+        # Reconstruction evaluated only at missing entries
+        if rank >= 1 and np.isfinite(imputed_matrix).all():
+            imputed_matrix, history = soft_impute(
+                imputed_matrix, ~mask, rank, max_iterations, tolerance,
+                factorization='randomized' if solver == 'randomized' else 'auto',
+                oversampling=oversampling, power_iterations=power_iterations, verbose=verbose
+            )
+            if verbose and history:
+                print(f"   ✓ {len(history)} iterações (convergência final = {history[-1]:.6f})")
+        elif verbose:
+            print(f"   ⚠️  SVD falhou, usando valores atuais")
+    else:
+        for iteration in range(max_iterations):
+            # SVD decomposition
+            try:
+                U, s, Vt = svds(imputed_matrix, k=rank)
+                # Reconstruct
+                reconstructed = U @ np.diag(s) @ Vt
+            except:
+                if verbose:
+                    print(f"   ⚠️  SVD falhou, usando valores atuais")
+                break
         
-        # Update only missing values
-        imputed_matrix[~mask] = reconstructed[~mask]
+            # Update only missing values
+            imputed_matrix[~mask] = reconstructed[~mask]
         
-        # Calculate convergence
-        if iteration > 0:
-            diff = np.linalg.norm(imputed_matrix - prev_imputed) / np.linalg.norm(imputed_matrix)
-            if verbose and iteration % 2 == 0:
-                print(f"   Iteração {iteration+1}/{max_iterations}: convergência = {diff:.6f}")
+            # Calculate convergence
+            if iteration > 0:
+                diff = np.linalg.norm(imputed_matrix - prev_imputed) / np.linalg.norm(imputed_matrix)
+                if verbose and iteration % 2 == 0:
+                    print(f"   Iteração {iteration+1}/{max_iterations}: convergência = {diff:.6f}")
                 
-                if progress_callback:
-                    iter_prog = 40 + int(40 * (iteration / max_iterations))
-                    progress_callback(iter_prog, f"Iteração SVD {iteration+1}/{max_iterations}")
+                    if progress_callback:
+                        iter_prog = 40 + int(40 * (iteration / max_iterations))
+                        progress_callback(iter_prog, f"Iteração SVD {iteration+1}/{max_iterations}")
             
-            if diff < tolerance:
-                if verbose:
-                    print(f"   ✓ Convergiu em {iteration+1} iterações")
-                break
+                if diff < tolerance:
+                    if verbose:
+                        print(f"   ✓ Convergiu em {iteration+1} iterações")
+                    break
         
-        prev_imputed = imputed_matrix.copy()
+            prev_imputed = imputed_matrix.copy()
     
     # PHASE 3: Post-processing
     if verbose:
@@ -461,10 +599,7 @@ def _legacy_svd_imputation(df, value_columns, n_components=50, max_iterations=10
         if verbose:
             print(f"   Aplicando restrição de monotonicidade...")
         
-        for i in range(imputed_matrix.shape[0]):
-            for j in range(1, imputed_matrix.shape[1]):
-                if imputed_matrix[i, j] < imputed_matrix[i, j-1]:
-                    imputed_matrix[i, j] = imputed_matrix[i, j-1]
+        imputed_matrix = enforce_monotonic_rows(imputed_matrix)
     
     # Apply smoothing if requested (AFTER monotonicity, BEFORE final update)
     if apply_smoothing:
@@ -498,70 +633,231 @@ def _legacy_svd_imputation(df, value_columns, n_components=50, max_iterations=10
     return result_df
 
 
+def latc_tensor_imputation(df, value_columns, time_lags=DEFAULT_TIME_LAGS, theta=3, ar_weight=5.0,
+                           max_iterations=100, tolerance=1e-4, meters_per_block=128,
+                           enforce_monotonicity=True, verbose=True, progress_callback=None):
+    """
+    True LATC: low-rank autoregressive tensor completion on the
+    meters × days × hours tensor (see latc_tensor.py).
+    
+    Unlike latc_svd_imputation, meters of a block are completed jointly
+    (truncated nuclear norm on every unfolding) and each meter's hourly series
+    is regularized by its own AR model.
+    
+    Args:
+        df: Long (id, data, index_*) frame
+        value_columns: Hourly columns
+        time_lags: AR lags in hours
+        theta: Singular values left unpenalized per unfolding
+        ar_weight: Weight of the AR term
+        max_iterations: ADMM iterations cap per block
+        tolerance: ADMM convergence tolerance
+        meters_per_block: Meters coupled in one tensor
+        enforce_monotonicity: Per-meter global monotonicity afterwards
+        
+    Returns:
+        DataFrame with imputed values (same row order as `df`)
+    """
+    import time
+    
+    if verbose:
+        print("\n" + "="*70)
+        print("LATC TENSORIAL - Low-Rank Autoregressive Tensor Completion")
+        print("="*70)
+    
+    start_time = time.time()
+    tensor = frame_to_tensor(df, value_columns)
+    present = tensor['present']
+    if verbose:
+        print(f"\n📊 Tensor: {present.shape[0]:,} contadores × {present.shape[1]} dias × {len(value_columns)} horas")
+    
+    imputed_rows = _latc_tensor_rows(tensor['values'], present, time_lags, theta, ar_weight,
+                                     max_iterations, tolerance, meters_per_block,
+                                     enforce_monotonicity, verbose, progress_callback)
+    
+    # Long (meter, date) position of every input row
+    position = (np.cumsum(present.ravel()) - 1).reshape(present.shape)
+    result_df = df.copy()
+    result_df[value_columns] = imputed_rows[position[tensor['meter_index'], tensor['day_index']]]
+    
+    if verbose:
+        print(f"\n✅ Imputação Completa: {time.time() - start_time:.1f}s")
+    
+    return result_df
+
+
+def latc_tensor_imputation_cached(cache, time_lags=DEFAULT_TIME_LAGS, theta=3, ar_weight=5.0,
+                                  max_iterations=100, tolerance=1e-4, meters_per_block=128,
+                                  enforce_monotonicity=True, verbose=True, progress_callback=None):
+    """
+    latc_tensor_imputation reading the tensor straight from the tensor cache
+    (each block is sliced from the memmap).
+    
+    Returns:
+        DataFrame (id, data, index_*) ordered by meter then date
+    """
+    import time
+    
+    if verbose:
+        print("\n" + "="*70)
+        print("LATC TENSORIAL - Low-Rank Autoregressive Tensor Completion (Cache Tensorial)")
+        print("="*70)
+        print(f"\n📊 Processando {cache.n_meters:,} contadores a partir de {cache.cache_dir}")
+    
+    start_time = time.time()
+    imputed_rows = _latc_tensor_rows(cache.values, cache.present, time_lags, theta, ar_weight,
+                                     max_iterations, tolerance, meters_per_block,
+                                     enforce_monotonicity, verbose, progress_callback)
+    
+    if verbose:
+        print(f"\n✅ Imputação Completa: {time.time() - start_time:.1f}s")
+    
+    return cache.to_frame(imputed_rows)
+
+
+def _latc_tensor_rows(values, present, time_lags, theta, ar_weight, max_iterations, tolerance,
+                      meters_per_block, enforce_monotonicity, verbose, progress_callback):
+    """
+    Run LATC and post-process: known readings restored, per-meter monotonicity,
+    no negative values.
+    
+    Returns:
+        Imputed (rows, 24) array for all present days in (meter, date) order
+    """
+    present = np.asarray(present)
+    imputed_rows, known = latc_impute_tensor(
+        values, present, meters_per_block=meters_per_block, verbose=verbose,
+        progress_callback=progress_callback, time_lags=time_lags, theta=theta,
+        ar_weight=ar_weight, max_iterations=max_iterations, tolerance=tolerance
+    )
+    
+    meter_index, day_index = np.nonzero(present)
+    original_rows = np.asarray(values[meter_index, day_index], dtype=float)
+    imputed_rows[known] = original_rows[known]
+    
+    if enforce_monotonicity:
+        offsets = np.concatenate([[0], np.cumsum(present.sum(axis=1))])
+        imputed_rows = enforce_monotonic_segments(imputed_rows, offsets)
+    
+    return np.maximum(imputed_rows, 0)
+
+
 def latc_hybrid_imputation(df, value_columns, gap_threshold_hours=72,
                            n_components=20, max_iterations=3, apply_smoothing=False,
-                           smoothing_method='savgol', smoothing_window=11, verbose=True, progress_callback=None):
+                           smoothing_method='savgol', smoothing_window=11, verbose=True, progress_callback=None,
+                           gap_index=None):
     """
     Hybrid approach: Use linear interpolation for small gaps, SVD for large gaps
     
-    This balances speed and quality
+    Every meter's longest gap (across days) is measured in one vectorized pass
+    and the meter is routed to the cheapest adequate path:
+    - 'linear': longest gap ≤ gap_threshold_hours (or too few days for SVD) -
+      batched interpolation + ffill/bfill (same kernel as latc_simple)
+    - 'svd': longer gaps - batched per-meter SVD (same as latc_svd_imputation)
+    Both paths then get per-meter global monotonicity.
+    
+    Args:
+        gap_index: Optional GapIndex of the same data (gap_index.open_gap_index);
+            when given, the routing reuses its gap lengths instead of rescanning
+    
+    Returns:
+        DataFrame with imputed values (same row order as `df`); per-path meter
+        counts and timings in `result.attrs['routing']`, SVD meters that failed
+        (filled linearly instead) in `result.attrs['quarantine']`
     """
+    import time
+    
     if verbose:
         print("\n" + "="*70)
         print("LATC HÍBRIDO - Inteligente")
         print("="*70)
     
-    consumption_matrix = df[value_columns].values.astype(float)
-    mask = ~np.isnan(consumption_matrix)
-    
-    # Identify gap sizes
-    small_gaps = []
-    large_gaps = []
+    start_time = time.time()
+    ids = df['id'].values if 'id' in df.columns else np.zeros(len(df))
+    dates = df['data'].values if 'data' in df.columns else None
+    order, offsets = meter_date_order(ids, dates)
+    values = df[value_columns].values.astype(float)[order]
+    counts = np.diff(offsets)
+    
+    # Routing: longest gap per meter
+    positions = gap_index.lookup(pd.unique(ids)) if gap_index is not None else None
+    if positions is not None and (positions >= 0).all():
+        max_gap = gap_index.max_gap()[positions]
+    else:
+        max_gap = max_gap_per_meter(np.isnan(values), offsets)
+    ranks = meter_ranks(offsets, len(value_columns), n_components)
+    use_svd = (max_gap > gap_threshold_hours) & (ranks > 0)
     
-    for i in range(consumption_matrix.shape[0]):
-        row = consumption_matrix[i, :]
-        gaps = []
-        in_gap = False
-        gap_start = 0
-        
-        for j in range(len(row)):
-            if np.isnan(row[j]):
-                if not in_gap:
-                    gap_start = j
-                    in_gap = True
-            else:
-                if in_gap:
-                    gap_size = j - gap_start
-                    if gap_size <= gap_threshold_hours:
-                        small_gaps.append((i, gap_start, j))
-                    else:
-                        large_gaps.append((i, gap_start, j))
-                    in_gap = False
+    if verbose:
+        n_meters = len(counts)
+        print(f"\n📊 Roteamento por contador (maior gap contínuo, entre dias):")
+        print(f"   Sem gaps: {int(np.sum(max_gap == 0)):,} contadores")
+        print(f"   Interpolação linear (gap ≤{gap_threshold_hours}h): {n_meters - int(use_svd.sum()):,} contadores")
+        print(f"   SVD (gap >{gap_threshold_hours}h): {int(use_svd.sum()):,} contadores")
+    
+    imputed = np.empty_like(values)
+    routing = {}
+    quarantine = {}
+    for path, selected in (('linear', ~use_svd), ('svd', use_svd)):
+        if not selected.any():
+            continue
+        path_start = time.time()
+        rows = np.repeat(selected, counts)
+        sub_offsets = np.concatenate([[0], np.cumsum(counts[selected])])
+        if path == 'linear':
+            imputed[rows] = enforce_monotonic_rows(fill_gaps_batch(values[rows], sub_offsets))
+        else:
+            imputed[rows], failed = _batched_svd_imputation(
+                values[rows], sub_offsets, n_components, max_iterations,
+                apply_smoothing=apply_smoothing, smoothing_method=smoothing_method,
+                smoothing_window=smoothing_window, verbose=verbose, progress_callback=progress_callback
+            )
+            meters = np.flatnonzero(selected)
+            quarantine = {ids[order[offsets[meters[m]]]]: error for m, error in failed.items()}
+        routing[path] = {'meters': int(selected.sum()), 'rows': int(rows.sum()),
+                         'seconds': time.time() - path_start}
+    
+    # Global monotonicity per meter (rows are meter-grouped and date-sorted)
+    imputed = enforce_monotonic_segments(imputed, offsets)
     
-    total_gaps = len(small_gaps) + len(large_gaps)
+    result_df = df.copy()
+    result_values = np.empty_like(imputed)
+    result_values[order] = imputed
+    result_df[value_columns] = result_values
+    result_df.attrs['routing'] = routing
+    result_df.attrs['quarantine'] = quarantine
     
     if verbose:
-        print(f"\n📊 Classificação de Gaps:")
-        print(f"   Gaps pequenos (≤{gap_threshold_hours}h): {len(small_gaps)} ({100*len(small_gaps)/total_gaps:.1f}%)" if total_gaps > 0 else "   Sem gaps")
-        print(f"   Gaps grandes (>{gap_threshold_hours}h): {len(large_gaps)} ({100*len(large_gaps)/total_gaps:.1f}%)" if total_gaps > 0 else "")
-    
-    # Strategy decision
-    # Strategy decision
-    # FORCE SVD FOR TESTING USER HYPOTHESIS
-    # (Commented out optimization to valid SVD impact)
-    # if len(large_gaps) == 0:
-    #     if verbose:
-    #         print("\n💡 Decisão: Usar interpolação linear (sem gaps grandes)")
-    #     from latc_simple import simple_latc_imputation
-    #     return simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progress_callback=progress_callback)
-    # else:
+        for path, stats in routing.items():
+            print(f"   ⏱️  {path}: {stats['meters']:,} contadores, {stats['rows']:,} linhas em {stats['seconds']:.1f}s")
+        print(f"\n✅ Imputação Completa: {time.time() - start_time:.1f}s")
+        print(f"   NaN restantes: {int(np.isnan(result_values).sum())}")
     
-    if verbose:
-        print(f"\n🔬 Decisão: Forçando SVD (Modo Científico Completo)")
-    return latc_svd_imputation(df, value_columns, n_components=n_components,
-                                max_iterations=max_iterations, apply_smoothing=apply_smoothing,
-                                smoothing_method=smoothing_method, smoothing_window=smoothing_window,
-                                verbose=verbose, progress_callback=progress_callback)
+    return result_df
+
+
+def quarantine_frame(imputed_df):
+    """Quarantined meters of an engine result as a DataFrame (id, erro); empty when none"""
+    quarantine = imputed_df.attrs.get('quarantine') or {}
+    return pd.DataFrame({'id': list(quarantine.keys()), 'erro': list(quarantine.values())})
+
+
+def report_quarantine(imputed_df, output_file):
+    """
+    Print the quarantined meters of a result and save them next to it
+    (<output>_quarentena.csv). Returns the list's path, or None when no meter
+    was quarantined.
+    """
+    quarantined = quarantine_frame(imputed_df)
+    if quarantined.empty:
+        return None
+    report_file = Path(output_file).with_name(Path(output_file).stem + '_quarentena.csv')
+    quarantined.to_csv(report_file, index=False)
+    print(f"\n⚠️  {len(quarantined)} contadores em quarentena (preenchimento linear em vez de SVD):")
+    for meter_id, error in zip(quarantined['id'], quarantined['erro']):
+        print(f"   {meter_id}: {error}")
+    print(f"   Lista salva em: {report_file}")
+    return report_file
 
 
 def main():
@@ -569,39 +865,87 @@ def main():
     import sys
     import os
     
-    if len(sys.argv) > 1:
-        data_file = sys.argv[1]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if args:
+        data_file = args[0]
     else:
         data_file = "data/telemetria_consumos_202507281246.csv"
     
-    mode = sys.argv[2] if len(sys.argv) > 2 else "hybrid"
+    mode = args[1] if len(args) > 1 else "hybrid"
     
-    if not os.path.exists(data_file):
+    if not telemetry_exists(data_file):
         print(f"❌ Erro: Arquivo não encontrado: {data_file}")
         return
     
+    if mode == "svd-cache":
+        print("\n🧊 Modo: SVD Puro (Cache Tensorial)")
+        cache = open_tensor_cache(data_file)
+        imputed_df = latc_svd_imputation_cached(cache, n_components=50, max_iterations=10)
+        output_file = save_telemetry(imputed_df, "data/imputed_consumption_full.csv")
+        print(f"\n💾 Salvo: {output_file}")
+        report_quarantine(imputed_df, output_file)
+        return
+    
+    if mode == "latc-cache":
+        print("\n🧊 Modo: LATC Tensorial (Cache Tensorial)")
+        cache = open_tensor_cache(data_file)
+        imputed_df = latc_tensor_imputation_cached(cache)
+        output_file = save_telemetry(imputed_df, "data/imputed_consumption_full.csv")
+        print(f"\n💾 Salvo: {output_file}")
+        return
+    
     print(f"📂 Carregando: {data_file}")
-    df = pd.read_csv(data_file)
+    df = load_telemetry(data_file, verbose=True)
     
     value_columns = [col for col in df.columns if col.startswith('index_')]
     
     print(f"Colunas de valores: {len(value_columns)}")
     
+    # Per-meter modes run in shards saved to data/<arquivo>_runs/, so an
+    # interrupted run resumes with the shards it already finished
+    checkpoint = None
+    engines = {
+        'svd': lambda part, callback: latc_svd_imputation(part, value_columns, n_components=50,
+                                                          max_iterations=10, progress_callback=callback),
+        'hybrid': lambda part, callback: latc_hybrid_imputation(part, value_columns, gap_threshold_hours=72,
+                                                                progress_callback=callback),
+    }
+    if mode in engines and '--no-checkpoint' not in sys.argv:
+        checkpoint = open_run_checkpoint(data_file, {'engine': f'latc_advanced.{mode}', 'meters_per_shard': 5000})
+    
     # Choose mode
     if mode == "svd":
         print("\n🔬 Modo: SVD Puro")
-        imputed_df = latc_svd_imputation(df, value_columns, n_components=50, max_iterations=10)
+        if checkpoint is not None:
+            imputed_df = checkpointed_imputation(df, value_columns, engines[mode], checkpoint)
+        else:
+            imputed_df = engines[mode](df, None)
+    elif mode == "svd-network":
+        # One low-rank model for the whole network (all rows together),
+        # randomized range finder streamed over row blocks
+        print("\n🌐 Modo: SVD de Rede (Randomizado)")
+        imputed_df = _legacy_svd_imputation(df, value_columns, n_components=20, max_iterations=10,
+                                            solver='randomized')
+    elif mode == "latc":
+        print("\n🧮 Modo: LATC Tensorial (ADMM)")
+        imputed_df = latc_tensor_imputation(df, value_columns)
     elif mode == "hybrid":
         print("\n⚡ Modo: Híbrido Inteligente")
-        imputed_df = latc_hybrid_imputation(df, value_columns, gap_threshold_hours=72)
+        if checkpoint is not None:
+            imputed_df = checkpointed_imputation(df, value_columns, engines[mode], checkpoint)
+        else:
+            imputed_df = engines[mode](df, None)
     else:
         print(f"❌ Modo desconhecido: {mode}")
         return
     
     # Save
     output_file = "data/imputed_consumption_full.csv"
-    print(f"\n💾 Salvando: {output_file}")
-    imputed_df.to_csv(output_file, index=False)
+    output_file = save_telemetry(imputed_df, output_file)
+    print(f"\n💾 Salvo: {output_file}")
+    report_quarantine(imputed_df, output_file)
+    if checkpoint is not None:
+        checkpoint.clear()
     
     print("\n" + "="*70)
     print("✅ SUCESSO - LATC Científico")
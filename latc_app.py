@@ -11,6 +11,150 @@ import numpy as np
 import os
 from pathlib import Path
 
+from columnar_store import (load_telemetry, logical_fingerprint, save_telemetry, telemetry_exists,
+                            resolve_telemetry_path)
+
+
+def file_size_mb(path):
+    """Size of the file that will actually be read for `path` (CSV or Parquet store)"""
+    source = resolve_telemetry_path(path)
+    return source.stat().st_size / (1024*1024) if source else 0.0
+
+
+def set_imputed_df(df):
+    """
+    Store an imputation in the session with a new token: cached smoothing
+    inputs are keyed on the token, never on id(df), which CPython may reuse
+    once the previous frame is freed.
+    """
+    st.session_state['imputed_df'] = df
+    st.session_state['imputed_df_token'] = st.session_state.get('imputed_df_token', 0) + 1
+
+
+def find_original_file():
+    """Original dataset of the imputation (the file processed, else the defaults)"""
+    default_original_files = [
+        Path(st.session_state['current_file']) if st.session_state.get('current_file') else None,
+        Path("data/dataset_exemplo_70mb.csv"), # New default 70MB example
+        Path("data/web_upload.csv"),
+        Path("data/telemetria_consumos_202507281246.csv")
+    ]
+    
+    for p in default_original_files:
+        if p is not None and telemetry_exists(p):
+            return p
+    return None
+
+
+def smoothing_inputs_key(resultado_final, original_file):
+    """Identity of the imputed data (session token or file state) and the original file"""
+    if 'imputed_df' in st.session_state:
+        imputed = ('session', st.session_state.get('imputed_df_token', 0))
+    else:
+        imputed = ('file', tuple(sorted(logical_fingerprint(resultado_final).items())))
+    return imputed, tuple(sorted(logical_fingerprint(original_file).items()))
+
+
+def get_smoothing_inputs(resultado_final):
+    """
+    Imputed data in session (or RESULTADO_FINAL) and the original dataset
+    aligned with it row by row. Cached in st.session_state until the
+    imputation or the original file changes.
+    
+    Returns:
+        (df_to_smooth, df_aligned, value_columns, original_file); df_aligned
+        is None once get_post_smoother has built the smoother (its readings
+        are in smoother.original)
+    """
+    # CRITICAL: Load original dataset to identify gaps (the file that was imputed first)
+    original_file = find_original_file()
+    if original_file is None:
+        st.error("❌ Arquivo original não encontrado. Necessário para identificar gaps.")
+        st.stop()
+    
+    key = smoothing_inputs_key(resultado_final, original_file)
+    if st.session_state.get('post_smooth_inputs_key') == key and 'post_smooth_inputs' in st.session_state:
+        return st.session_state['post_smooth_inputs']
+    
+    # Load data
+    source = st.session_state.get('imputed_df')
+    if source is not None:
+        df_to_smooth = source.copy()
+    else:
+        df_to_smooth = load_telemetry(resultado_final)
+    
+    # Get value columns
+    value_columns = [col for col in df_to_smooth.columns if col.startswith('index_')]
+    
+    st.write("📂 Carregando dataset original para identificar gaps...")
+    df_original = load_telemetry(original_file)
+    
+    # Ensure date columns are datetime
+    if 'data' in df_to_smooth.columns:
+        df_to_smooth['data'] = pd.to_datetime(df_to_smooth['data'])
+    if 'data' in df_original.columns:
+        df_original['data'] = pd.to_datetime(df_original['data'])
+    
+    # The engines keep the input row order, so the imputation of this file
+    # lines up with it row by row; the (id, data) join is only a fallback
+    # (the smoothers order each meter's rows by date themselves)
+    same_rows = (
+        len(df_original) == len(df_to_smooth)
+        and np.array_equal(df_original['id'].values, df_to_smooth['id'].values)
+        and ('data' not in df_to_smooth.columns
+             or np.array_equal(df_original['data'].values, df_to_smooth['data'].values))
+    )
+    if same_rows:
+        df_aligned = df_original.reset_index(drop=True)
+        df_to_smooth = df_to_smooth.reset_index(drop=True)
+    else:
+        # Imputed rows differ from the original: align by id/data
+        st.write("🔄 Alinhando datasets (ID + Data)...")
+        
+        # Prepare original DF - drop duplicates to prevent row explosion
+        # Critical fix for "boolean index did not match indexed array" error
+        if 'id' in df_original.columns and 'data' in df_original.columns:
+            df_original_clean = df_original.drop_duplicates(subset=['id', 'data'])
+        else:
+            df_original_clean = df_original
+        
+        # Left join keeps the imputed structure/order and attaches original values
+        df_aligned = pd.merge(
+            df_to_smooth[['id', 'data']], 
+            df_original_clean, 
+            on=['id', 'data'], 
+            how='left',
+            suffixes=('', '_orig')
+        )
+    
+    inputs = (df_to_smooth, df_aligned, value_columns, original_file)
+    st.session_state['post_smooth_inputs'] = inputs
+    st.session_state['post_smooth_inputs_key'] = key
+    return inputs
+
+
+def get_post_smoother(resultado_final):
+    """
+    MovingAverageSmoother for the smoothing inputs (see get_smoothing_inputs).
+    Built once and cached in st.session_state, so previews and the final
+    smoothing reuse its prefix sums. The aligned original is dropped from the
+    cached inputs once the smoother holds its readings.
+    """
+    inputs = get_smoothing_inputs(resultado_final)
+    if st.session_state.get('post_smoother_inputs') is inputs and 'post_smoother' in st.session_state:
+        return st.session_state['post_smoother']
+    
+    from smooth_fast_numpy import MovingAverageSmoother
+    
+    df_to_smooth, df_aligned, value_columns, original_file = inputs
+    st.write("➕ Calculando somas acumuladas por contador...")
+    smoother = MovingAverageSmoother(df_to_smooth, value_columns, df_aligned)
+    inputs = (df_to_smooth, None, value_columns, original_file)
+    st.session_state['post_smooth_inputs'] = inputs
+    st.session_state['post_smoother'] = smoother
+    st.session_state['post_smoother_inputs'] = inputs
+    return smoother
+
 # ==============================================================================
 # CONFIGURAÇÃO DA PÁGINA
 # ==============================================================================
@@ -110,8 +254,8 @@ with st.sidebar:
         
         found_default = False
         for p in default_options:
-            if p.exists():
-                st.info(f"📂 Usando arquivo padrão (Demo): `{p.name}` ({p.stat().st_size / (1024*1024):.1f} MB)")
+            if telemetry_exists(p):
+                st.info(f"📂 Usando arquivo padrão (Demo): `{p.name}` ({file_size_mb(p):.1f} MB)")
                 st.session_state['current_file'] = str(p.absolute())
                 found_default = True
                 break
@@ -135,9 +279,9 @@ if page == "Dashboard":
     
     # Load basic stats if file exists
     current_file = st.session_state.get('current_file')
-    if current_file and os.path.exists(current_file):
+    if current_file and telemetry_exists(current_file):
         try:
-            df = pd.read_csv(current_file)
+            df = load_telemetry(current_file)
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -161,34 +305,53 @@ elif page == "Análise de Gaps":
     st.title("🔍 Análise de Falhas (Gaps)")
     
     current_file = st.session_state.get('current_file')
-    if not current_file or not os.path.exists(current_file):
+    if not current_file or not telemetry_exists(current_file):
         st.warning("⚠️ Nenhum arquivo carregado. Por favor, carregue um CSV na barra lateral.")
     else:
+        stream_mode = st.checkbox(
+            "🌊 Modo streaming (memória constante)",
+            help="Lê o arquivo em blocos e combina estatísticas parciais - para arquivos maiores que a RAM. Sem mapa de calor."
+        )
+        heatmap_sort = st.selectbox(
+            "Ordenar contadores no mapa de calor:",
+            options=["severity", "calibre", None],
+            format_func=lambda x: {"severity": "Por % de falta", "calibre": "Por calibre", None: "Ordem do arquivo"}[x]
+        )
+        
         if st.button("▶ Executar Análise de Gaps", type="primary"):
             with st.spinner("Analisando padrões de falha..."):
                 try:
                     import gap_analysis
                     
-                    df = pd.read_csv(current_file)
-                    value_columns = [col for col in df.columns if col.startswith('index_')]
-                    
-                    if not value_columns:
-                        st.error("Erro: Colunas 'index_*' não encontradas no arquivo.")
+                    stats = None
+                    heatmap_path = None
+                    if stream_mode:
+                        stats = gap_analysis.analyze_gaps_streaming(current_file)
                     else:
-                        # 1. Analyze
-                        stats = gap_analysis.analyze_gaps(df, value_columns)
-                        
-                        # 2. Generate Heatmap
-                        heatmap_path = "data/web_heatmap.png"
-                        Path("data").mkdir(exist_ok=True)
-                        gap_analysis.generate_gap_heatmap(df, value_columns, output_path=heatmap_path)
+                        df = load_telemetry(current_file)
+                        value_columns = [col for col in df.columns if col.startswith('index_')]
                         
+                        if not value_columns:
+                            st.error("Erro: Colunas 'index_*' não encontradas no arquivo.")
+                        else:
+                            # 1. Analyze (gap index persisted next to the data file)
+                            from gap_index import open_gap_index
+                            gap_index = open_gap_index(current_file, verbose=False, df=df)
+                            stats = gap_analysis.analyze_gaps(df, value_columns, gap_index=gap_index)
+                            
+                            # 2. Generate Heatmap
+                            heatmap_path = "data/web_heatmap.png"
+                            Path("data").mkdir(exist_ok=True)
+                            gap_analysis.generate_gap_heatmap(df, value_columns, output_path=heatmap_path, sort_by=heatmap_sort)
+                    
+                    if stats is not None:
                         # Display Results
                         st.success("Análise concluída!")
                         
                         # Heatmap
-                        st.subheader("Mapa de Calor de Disponibilidade")
-                        st.image(heatmap_path, caption="Vermelho=Falta, Verde=Presente", use_container_width=True)
+                        if heatmap_path:
+                            st.subheader("Mapa de Calor de Disponibilidade")
+                            st.image(heatmap_path, caption="Todos os contadores - Vermelho=Falta, Verde=Presente, Cinza=Sem registo", use_container_width=True)
                         
                         # Metrics Card
                         g_stats = stats['global']
@@ -197,6 +360,18 @@ elif page == "Análise de Gaps":
                         kpi2.metric("Dados Faltantes (%)", f"{g_stats['missing_pct']:.2f}%")
                         kpi3.metric("Total de Gaps", g_stats['missing_count'])
                         
+                        cross_day = stats.get('cross_day_gaps')
+                        if cross_day:
+                            kpi4, kpi5, kpi6 = st.columns(3)
+                            kpi4.metric("Gaps Contínuos", f"{cross_day['num_gaps']:,}")
+                            kpi5.metric("Maior Gap (h)", f"{cross_day['max_gap_hours']:,}")
+                            kpi6.metric("Contadores com Gap >72h", f"{cross_day['meters_over_72h']:,}")
+                        
+                        quantiles = stats.get('gap_quantiles')
+                        if quantiles:
+                            st.caption(f"Quantis de gap (sketch): p50={quantiles['p50']:.0f}h | "
+                                       f"p90={quantiles['p90']:.0f}h | p99={quantiles['p99']:.0f}h")
+                        
                         # Detailed Table (limit to avoid 200MB error)
                         # Only convert top meters to avoid huge dataframe
                         meter_stats_list = stats['meter_stats']
@@ -226,7 +401,7 @@ elif page == "Processamento":
     st.title("⚙️ Processamento de Imputação")
     
     current_file = st.session_state.get('current_file')
-    if not current_file or not os.path.exists(current_file):
+    if not current_file or not telemetry_exists(current_file):
         st.warning("⚠️ Nenhum arquivo carregado.")
     else:
         col1, col2 = st.columns(2)
@@ -275,40 +450,55 @@ elif page == "Processamento":
                 status_text.text(f"⏳ {msg}")
             
             try:
-                status_text.text("📂 Lendo arquivo CSV do disco (isso pode demorar para arquivos grandes)...")
-                df = pd.read_csv(current_file)
+                status_text.text("📂 Lendo dados (a primeira leitura converte o CSV para Parquet)...")
+                df = load_telemetry(current_file)
                 
                 status_text.text("⚡ Preparando dados...")
                 value_columns = [col for col in df.columns if col.startswith('index_')]
                 
+                # Shards finished by an interrupted run (closed tab, crash) with the
+                # same file and settings are reused from data/<arquivo>_runs/
+                from run_checkpoint import checkpointed_imputation, open_run_checkpoint
+                
                 if mode == "Rápido":
                     import latc_simple
                     import importlib
                     importlib.reload(latc_simple)
-                    imputed = latc_simple.simple_latc_imputation(df, value_columns, progress_callback=streamlit_progress)
+                    run_params = {'engine': 'latc_simple'}
+                    impute = lambda part, callback: latc_simple.simple_latc_imputation(
+                        part, value_columns, progress_callback=callback)
                 else:
                     import latc_advanced
                     import importlib
                     importlib.reload(latc_advanced)
                     
+                    # Router reuses the persisted gap index (built on first use)
+                    from gap_index import open_gap_index
+                    gap_index = open_gap_index(current_file, verbose=False, df=df)
+                    
                     # Normal production mode (verbose=False)
-                    imputed = latc_advanced.latc_hybrid_imputation(
-                        df, value_columns, 
-                        progress_callback=streamlit_progress,
+                    run_params = {'engine': 'latc_hybrid', 'apply_smoothing': enable_smoothing,
+                                  'smoothing_method': smoothing_method, 'smoothing_window': smoothing_window}
+                    impute = lambda part, callback: latc_advanced.latc_hybrid_imputation(
+                        part, value_columns, gap_index=gap_index,
+                        progress_callback=callback,
                         apply_smoothing=enable_smoothing,
                         smoothing_method=smoothing_method,
                         smoothing_window=smoothing_window,
                         verbose=False 
                     )
                 
+                checkpoint = open_run_checkpoint(current_file, run_params, verbose=False)
+                imputed = checkpointed_imputation(df, value_columns, impute, checkpoint,
+                                                  progress_callback=streamlit_progress, verbose=False)
+                
                 # FORCE SAVE LOCAL COPY FOR USER (ROBUST VERSION)
                 local_backup = Path("data/RESULTADO_FINAL.csv")
                 try:
-                    # Ensure data directory exists
-                    local_backup.parent.mkdir(exist_ok=True)
+                    # Columnar store (data/RESULTADO_FINAL.parquet)
+                    local_backup = save_telemetry(imputed, local_backup)
                     
-                    # Save with explicit encoding
-                    imputed.to_csv(local_backup, index=False, encoding='utf-8')
+                    checkpoint.clear()
                     
                     # Verify it was actually written
                     if local_backup.exists():
@@ -319,7 +509,7 @@ elif page == "Processamento":
                         st.warning(f"⚠️ Arquivo não foi criado em: {local_backup.absolute()}")
                         
                 except Exception as save_error:
-                    st.error(f"❌ Erro ao salvar CSV: {save_error}")
+                    st.error(f"❌ Erro ao salvar resultado: {save_error}")
                     st.info("Mas você ainda pode baixar via botão abaixo!")
                 
                 # Save temp for download
@@ -328,6 +518,30 @@ elif page == "Processamento":
                 imputed.to_csv(buffer, index=False)
                 
                 st.success("Imputação finalizada! Baixe o resultado abaixo:")
+
+                # Hybrid router: meters and time per path
+                routing = imputed.attrs.get('routing')
+                if routing:
+                    st.info(" | ".join(
+                        f"{'📏 Linear' if path == 'linear' else '🔬 SVD'}: {stats['meters']:,} contadores em {stats['seconds']:.1f}s"
+                        for path, stats in routing.items()
+                    ))
+
+                # Meters whose SVD failed or timed out: filled linearly instead
+                from latc_advanced import quarantine_frame
+                quarantined = quarantine_frame(imputed)
+                if not quarantined.empty:
+                    st.warning(f"⚠️ {len(quarantined)} contadores em quarentena "
+                               f"(falharam ou excederam o tempo; preenchidos por interpolação linear)")
+                    st.dataframe(quarantined, use_container_width=True, hide_index=True)
+                    st.download_button(
+                        label="⬇️ Baixar Lista de Quarentena",
+                        data=quarantined.to_csv(index=False),
+                        file_name="latc_quarentena.csv",
+                        mime="text/csv",
+                        key="download_quarantine"
+                    )
+
                 st.download_button(
                     label="⬇️ Baixar CSV Processado",
                     data=buffer.getvalue(),
@@ -336,7 +550,7 @@ elif page == "Processamento":
                 )
                 
                 # Store in session state for viz tab
-                st.session_state['imputed_df'] = imputed
+                set_imputed_df(imputed)
                 
             except Exception as e:
                 st.error(f"Erro no processamento: {str(e)}")
@@ -349,7 +563,7 @@ elif page == "Processamento":
         
         # Check if we have imputed data
         resultado_final = Path("data/RESULTADO_FINAL.csv")
-        if resultado_final.exists() or 'imputed_df' in st.session_state:
+        if telemetry_exists(resultado_final) or 'imputed_df' in st.session_state:
             
             col_smooth_1, col_smooth_2 = st.columns([2, 1])
             
@@ -357,9 +571,8 @@ elif page == "Processamento":
                 st.info("**Dados disponíveis para suavização.** Configure os parâmetros abaixo e clique em 'Aplicar Suavização'.")
             
             with col_smooth_2:
-                if resultado_final.exists():
-                    file_size = resultado_final.stat().st_size / (1024*1024)
-                    st.metric("Arquivo", f"{file_size:.1f} MB")
+                if telemetry_exists(resultado_final):
+                    st.metric("Arquivo", f"{file_size_mb(resultado_final):.1f} MB")
             
             # Smoothing parameters
             st.markdown("**⚡ Moving Average (único método - otimizado para velocidade)**")
@@ -374,105 +587,104 @@ elif page == "Processamento":
             
             post_smooth_method = 'moving_avg'  # Force moving average only
             
+            post_smooth_gaps_only = st.checkbox(
+                "🎯 Suavizar só nas janelas dos gaps (mais rápido)", value=False,
+                help="Calcula a média móvel apenas dentro dos gaps (mais meia janela de cada lado), "
+                     "usando o índice de gaps. Monotonicidade garantida entre as leituras que limitam cada gap.",
+                key="post_smooth_gaps_only"
+            )
+            
+            # Live preview: prefix sums computed once, any window evaluated on the selected meter
+            show_preview = st.checkbox("👁️ Pré-visualizar janelas num contador", value=False, key="post_smooth_preview")
+            if show_preview:
+                try:
+                    smoother = get_post_smoother(resultado_final)
+                    col_prev_1, col_prev_2 = st.columns([1, 2])
+                    with col_prev_1:
+                        preview_id = st.selectbox("Contador:", smoother.meter_ids, key="post_smooth_preview_id")
+                    with col_prev_2:
+                        preview_windows = st.multiselect(
+                            "Janelas a comparar:",
+                            list(range(11, 100, 2)),
+                            default=sorted({11, 25, 49, post_smooth_window}),
+                            key="post_smooth_preview_windows"
+                        )
+                    
+                    imputed_series, previews = smoother.meter_preview(preview_id, preview_windows)
+                    
+                    import plotly.graph_objects as go
+                    fig = go.Figure()
+                    fig.add_trace(go.Scatter(
+                        y=imputed_series, mode='lines', name='Imputado',
+                        line=dict(color='#95A5A6', width=1)
+                    ))
+                    for window, series in sorted(previews.items()):
+                        fig.add_trace(go.Scatter(
+                            y=series, mode='lines', name=f"Janela {window}",
+                            line=dict(width=2.5 if window == post_smooth_window else 1.2)
+                        ))
+                    fig.update_layout(
+                        title=f"Pré-visualização - Contador: {preview_id}",
+                        xaxis_title="Hora (série contínua)",
+                        yaxis_title="Leitura Acumulada (m³)",
+                        template="plotly_white",
+                        height=450,
+                        hovermode="x unified"
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                except Exception as e:
+                    st.error(f"❌ Erro na pré-visualização: {str(e)}")
+            
             if st.button("🌊 Aplicar Suavização Agora", type="secondary", key="apply_smoothing_btn"):
                 with st.spinner("Aplicando suavização..."):
                     try:
-                        # Load data
-                        if 'imputed_df' in st.session_state:
-                            df_to_smooth = st.session_state['imputed_df'].copy()
-                        else:
-                            df_to_smooth = pd.read_csv(resultado_final)
-                        
-                        # Get value columns
-                        value_columns = [col for col in df_to_smooth.columns if col.startswith('index_')]
-                        
-                        # CRITICAL: Load original dataset to identify gaps
-                        original_file = None
-                        default_original_files = [
-                            Path("data/dataset_exemplo_70mb.csv"), # New default 70MB example
-                            Path("data/web_upload.csv"),
-                            Path("data/telemetria_consumos_202507281246.csv")
-                        ]
-                        
-                        for p in default_original_files:
-                            if p.exists():
-                                original_file = p
-                                break
-                        
-                        if original_file is None:
-                            st.error("❌ Arquivo original não encontrado. Necessário para identificar gaps.")
-                            st.stop()
-                        
-                        st.write("📂 Carregando dataset original para identificar gaps...")
-                        df_original = pd.read_csv(original_file)
-                        
-                        # CRITICAL: Align original data to imputed data
-                        # Imputation process might sort or filter rows, so we MUST align by id/data
-                        st.write("🔄 Alinhando datasets (ID + Data)...")
-                        
-                        # Ensure date columns are datetime
-                        if 'data' in df_to_smooth.columns:
-                            df_to_smooth['data'] = pd.to_datetime(df_to_smooth['data'])
-                        if 'data' in df_original.columns:
-                            df_original['data'] = pd.to_datetime(df_original['data'])
-                            
-                        # Prepare original DF - drop duplicates to prevent row explosion
-                        # Critical fix for "boolean index did not match indexed array" error
-                        if 'id' in df_original.columns and 'data' in df_original.columns:
-                            df_original_clean = df_original.drop_duplicates(subset=['id', 'data'])
-                        else:
-                            df_original_clean = df_original
-                            
-                        # Create a merged version solely to get the aligned original values
-                        # Left join essentially keeps imputed structure and attaches original values
-                        df_aligned = pd.merge(
-                            df_to_smooth[['id', 'data']], 
-                            df_original_clean, 
-                            on=['id', 'data'], 
-                            how='left',
-                            suffixes=('', '_orig')
-                        )
-                        
-                        # Now df_aligned has the same rows/order as df_to_smooth
-                        # Use THIS as the original_df source
-                        
-                        # Sort by ID and Data is CRITICAL for inter-day smoothing
-                        st.write("🔄 Ordenando cronologicamente por contador...")
-                        df_to_smooth = df_to_smooth.sort_values(by=['id', 'data'])
-                        
-                        # Re-align original after sorting (simple merge left again or just re-sort aligned)
-                        # Let's re-merge to be absolutely safe and correctly ordered
-                        df_aligned = pd.merge(
-                            df_to_smooth[['id', 'data']], 
-                            df_original_clean, 
-                            on=['id', 'data'], 
-                            how='left',
-                            suffixes=('', '_orig')
-                        )
-                        
                         # Import FAST NUMPY smoothing (Inter-day capable)
                         import sys
                         sys.path.insert(0, str(Path(__file__).parent))
-                        from smooth_fast_numpy import smooth_time_series_numpy
-                        
-                        # Apply CONTINUOUS smoothing
-                        st.write(f"🚀 Aplicando suavização contínua (Numpy)...")
-                        st.info("💡 Suaviza transições entre dias e gaps, preservando originais.")
+                        from smooth_fast_numpy import smooth_gaps_numpy, smooth_time_series_numpy
                         
-                        df_smoothed = smooth_time_series_numpy(
-                            df=df_to_smooth,
-                            value_columns=value_columns,
-                            original_df=df_aligned,
-                            window_size=post_smooth_window,
-                            verbose=True
-                        )
+                        if post_smooth_gaps_only:
+                            # Only the gap windows are computed (cost ~ missing readings)
+                            df_to_smooth, df_aligned, value_columns, original_file = get_smoothing_inputs(resultado_final)
+                            if df_aligned is None:
+                                df_aligned = pd.DataFrame(get_post_smoother(resultado_final).original,
+                                                          columns=value_columns)
+                            st.write(f"🎯 Aplicando suavização nos gaps (Numpy)...")
+                            from gap_index import open_gap_index
+                            gap_index = open_gap_index(original_file, verbose=False)
+                            df_smoothed = smooth_gaps_numpy(
+                                df=df_to_smooth,
+                                value_columns=value_columns,
+                                original_df=df_aligned,
+                                window_size=post_smooth_window,
+                                gap_index=gap_index,
+                                verbose=True
+                            )
+                        else:
+                            smoother = get_post_smoother(resultado_final)
+                            
+                            # Apply CONTINUOUS smoothing
+                            st.write(f"🚀 Aplicando suavização contínua (Numpy)...")
+                            st.info("💡 Suaviza transições entre dias e gaps, preservando originais.")
+                            
+                            df_smoothed = smooth_time_series_numpy(
+                                df=smoother.df,
+                                value_columns=smoother.value_columns,
+                                original_df=None,
+                                window_size=post_smooth_window,
+                                verbose=True,
+                                smoother=smoother
+                            )
                         
                         # Save
-                        output_path = Path("data/RESULTADO_FINAL_SUAVIZADO.csv")
-                        df_smoothed.to_csv(output_path, index=False)
+                        output_path = save_telemetry(df_smoothed, "data/RESULTADO_FINAL_SUAVIZADO.csv")
                         
-                        # Update session
-                        st.session_state['imputed_df'] = df_smoothed
+                        # Update session (the cached inputs and prefix sums stay on the
+                        # unsmoothed imputation, so another window replaces this result
+                        # instead of smoothing it again)
+                        set_imputed_df(df_smoothed)
+                        st.session_state['post_smooth_inputs_key'] = smoothing_inputs_key(
+                            resultado_final, st.session_state['post_smooth_inputs'][3])
                         
                         st.success(f"✅ Suavização aplicada com sucesso!")
                         st.info(f"📁 Salvo em: `{output_path.absolute()}`")
@@ -511,15 +723,15 @@ elif page == "Visualização":
     resultado_final = Path("data/RESULTADO_FINAL.csv")
     resultado_antigo = Path("data/imputed_consumption_full.csv")
     
-    if resultado_suavizado.exists():
+    if telemetry_exists(resultado_suavizado):
         file_options.append("🌊 Dados Suavizados (Recomendado)")
         file_paths["🌊 Dados Suavizados (Recomendado)"] = resultado_suavizado
     
-    if resultado_final.exists():
+    if telemetry_exists(resultado_final):
         file_options.append("⚙️ Dados Imputados (Original)")
         file_paths["⚙️ Dados Imputados (Original)"] = resultado_final
     
-    if resultado_antigo.exists():
+    if telemetry_exists(resultado_antigo):
         file_options.append("📦 Processamento Antigo")
         file_paths["📦 Processamento Antigo"] = resultado_antigo
     
@@ -547,8 +759,8 @@ elif page == "Visualização":
         else:
             file_path = file_paths[selected_file]
             with st.spinner(f"Carregando {file_path.name}..."):
-                df = pd.read_csv(file_path)
-                st.success(f"✅ Carregado: `{file_path.name}` ({file_path.stat().st_size / (1024*1024):.1f} MB)")
+                df = load_telemetry(file_path)
+                st.success(f"✅ Carregado: `{file_path.name}` ({file_size_mb(file_path):.1f} MB)")
     else:
         # No files available
         st.warning("⚠️ Nenhum arquivo de dados encontrado. Execute o processamento primeiro na aba 'Processamento'.")
@@ -652,7 +864,7 @@ elif page == "Visualização":
             original_file = None
             
             # Check session state first (Matches Tab 4 Logic)
-            if st.session_state.get('current_file') and os.path.exists(st.session_state['current_file']):
+            if st.session_state.get('current_file') and telemetry_exists(st.session_state['current_file']):
                 original_file = Path(st.session_state['current_file'])
             else:
                 # Fallback priority: Upload > Demo > Legacy
@@ -663,18 +875,19 @@ elif page == "Visualização":
                 ]
                 
                 for p in default_original_files:
-                    if p.exists():
+                    if telemetry_exists(p):
                         original_file = p
                         break
             
-            if original_file and original_file.exists():
-                with st.spinner("Carregando dados originais..."):
-                    df_original = pd.read_csv(original_file)
-                
+            if original_file and telemetry_exists(original_file):
                 # Selector
                 meter_ids_comp = df[id_col].astype(str).unique()
                 selected_id_comp = st.selectbox("Selecione o Contador para Comparar:", meter_ids_comp, key="comp_selector")
                 
+                # Only this meter's rows are read from the columnar store
+                with st.spinner("Carregando dados originais..."):
+                    df_original = load_telemetry(original_file, meter_ids=[selected_id_comp])
+                
                 # Get both versions - ALL rows
                 mask_imp = df[id_col].astype(str) == selected_id_comp
                 mask_orig = df_original[id_col].astype(str) == selected_id_comp
@@ -846,7 +1059,7 @@ elif page == "Visualização":
                     original_file_path = None
                     
                     # Check session state first
-                    if st.session_state.get('current_file') and os.path.exists(st.session_state['current_file']):
+                    if st.session_state.get('current_file') and telemetry_exists(st.session_state['current_file']):
                         original_file_path = Path(st.session_state['current_file'])
                     else:
                         # Fallback priority: Upload > Demo > Legacy
@@ -857,20 +1070,14 @@ elif page == "Visualização":
                         ]
                         
                         for p in default_original_files:
-                            if p.exists():
+                            if telemetry_exists(p):
                                 original_file_path = p
                                 break
                     
-                    if original_file_path and original_file_path.exists():
-                         # We need to read it efficiently. 
-                         # Assuming it's already read in tab3 context? 
-                         # Actually, st.session_state is best, but let's re-read or use df_original if available in scope
-                         # df_original is defined inside tab3 block... scope issue?
-                         # Let's re-read to be safe (cached by st.cache_data if we used it, but we didn't). 
-                         # For performance, we should have loaded it once.
-                         # Quick fix: Re-read (Streamlit caches file IO a bit)
+                    if original_file_path and telemetry_exists(original_file_path):
+                         # Read only this meter's rows from the columnar store
                          try:
-                             df_orig_temp = pd.read_csv(original_file_path)
+                             df_orig_temp = load_telemetry(original_file_path, meter_ids=[selected_profile_id])
                              mask_orig = df_orig_temp[id_col].astype(str) == selected_profile_id
                              rows_orig = df_orig_temp[mask_orig].copy()
                              
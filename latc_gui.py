@@ -13,6 +13,8 @@ import threading
 from pathlib import Path
 from datetime import datetime
 
+from columnar_store import telemetry_exists
+
 # ==============================================================================
 # IMPORTAÇÕES MATPLOTLIB PARA GUI
 # ==============================================================================
@@ -219,7 +221,7 @@ class LATCApp:
     def run_gap_analysis(self):
         """Run gap analysis on dataset"""
         orig_path = self.original_file_path.get()
-        if not os.path.exists(orig_path):
+        if not telemetry_exists(orig_path):
             messagebox.showerror("Erro", "Arquivo original não encontrado!")
             return
         
@@ -237,12 +239,12 @@ class LATCApp:
     
     def run_imputation_logic(self):
         orig_path = self.original_file_path.get()
-        if not os.path.exists(orig_path):
+        if not telemetry_exists(orig_path):
             messagebox.showerror("Erro", "Arquivo original não encontrado!")
             return
 
         out_path = Path("data/imputed_consumption_full.csv")
-        if out_path.exists():
+        if telemetry_exists(out_path):
             if not messagebox.askyesno("Confirmar", "Arquivo já existe. Sobrescrever?"): return
         
         # Get selected mode
@@ -375,7 +377,7 @@ class LATCApp:
 
     def _generic_plot_worker(self, label, module_name, data_func, fig_func, has_view_controls=False):
         file_path = self.original_file_path.get()
-        if not os.path.exists(file_path):
+        if not telemetry_exists(file_path):
             messagebox.showwarning("Aviso", "Arquivo original inválido!")
             return
             
@@ -497,10 +499,10 @@ class LATCApp:
         orig = Path(self.original_file_path.get())
         imp = Path("data/imputed_consumption_full.csv")
         
-        if orig.exists(): self.lbl_orig.config(text="[OK] Original OK", fg="green"); self.has_orig=True
+        if telemetry_exists(orig): self.lbl_orig.config(text="[OK] Original OK", fg="green"); self.has_orig=True
         else: self.lbl_orig.config(text="[X] Original Faltando", fg="red"); self.has_orig=False
         
-        if imp.exists(): self.lbl_imp.config(text="[OK] Imputado OK", fg="green"); self.has_imp=True
+        if telemetry_exists(imp): self.lbl_imp.config(text="[OK] Imputado OK", fg="green"); self.has_imp=True
         else: self.lbl_imp.config(text="[!] Imputado Pendente", fg="orange"); self.has_imp=False
 
     def log(self, msg, level="INFO"):
@@ -15,46 +15,189 @@ import os
 warnings.filterwarnings('ignore')
 
 from progress_tracker import ProgressTracker
+from columnar_store import (iter_telemetry_chunks, save_telemetry, telemetry_exists,
+                            telemetry_num_rows, TelemetryWriter)
+from tensor_cache import TensorCache, open_tensor_cache
+from gap_fill import fill_gaps_batch
+from monotonic import enforce_monotonic_rows
+from shared_matrix import SharedMeterMatrix, attach_worker, group_rows_by_meter, worker_views
+from meter_scheduler import bounded_pool_imap, cost_balanced_batches, meter_costs, missing_per_meter
+from run_checkpoint import open_run_checkpoint
 
 
-def _process_single_meter(args):
-    """Worker function to process a single meter (for multiprocessing)"""
-    meter_id, meter_data, value_columns, enforce_monotonicity = args
+def _impute_meter_matrix(meter_matrix, enforce_monotonicity=True):
+    """Impute one meter's (days, 24) matrix; returns a new float array"""
+    # 1. Within-day interpolation, cross-day fill and final zero fill (vectorized,
+    #    bit-identical to the former pandas interpolate/ffill/bfill chain)
+    imputed_matrix = fill_gaps_batch(meter_matrix)
     
-    meter_matrix = meter_data[value_columns].values.astype(float)
+    # 2. Enforce monotonicity (within day only)
+    if enforce_monotonicity:
+        imputed_matrix = enforce_monotonic_rows(imputed_matrix)
     
-    # 1. Horizontal interpolation (within day)
-    temp_df = pd.DataFrame(meter_matrix, columns=[f'col_{j}' for j in range(meter_matrix.shape[1])])
+    return imputed_matrix
+
+
+def _process_meter_batch(args):
+    """Worker for a cost-balanced batch: list of (meter, matrix) -> list of (meter, imputed matrix)"""
+    batch, enforce_monotonicity = args
+    return [(meter, _impute_meter_matrix(matrix, enforce_monotonicity)) for meter, matrix in batch]
+
+
+def _process_cached_meters(args):
+    """Worker for the tensor cache: opens the memmap itself and imputes meters [start, stop)"""
+    cache_dir, start, stop, enforce_monotonicity = args
     
-    if np.any(np.isnan(meter_matrix)):
-        temp_df = temp_df.interpolate(method='linear', axis=1, limit_direction='both')
+    cache = TensorCache(cache_dir)
+    return start, [_impute_meter_matrix(matrix, enforce_monotonicity)
+                   for _, _, _, matrix in cache.iter_meters(start, stop)]
+
+
+def simple_latc_imputation_cached(cache, enforce_monotonicity=True, progress_callback=None,
+                                  n_workers=None, meters_per_task=200):
+    """
+    Per-meter imputation reading straight from the memory-mapped tensor cache.
     
-    temp_df = temp_df.ffill(axis=1).bfill(axis=1)
+    Workers receive only (cache_dir, start, stop) and slice their meters from
+    the OS page cache - no groupby, no per-meter DataFrame pickling.
     
-    # 2. Vertical fill (across days) - SAFE because it's only this meter
-    if temp_df.isnull().values.any():
-        temp_df = temp_df.ffill(axis=0)
-        temp_df = temp_df.bfill(axis=0)
+    Args:
+        cache: TensorCache (see tensor_cache.open_tensor_cache)
+        enforce_monotonicity: Whether to enforce non-decreasing values
+        progress_callback: Optional callback for progress updates
+        n_workers: Number of parallel workers (default: cpu_count - 1)
+        meters_per_task: Meters handled per worker task
+        
+    Returns:
+        DataFrame (id, data, index_*) ordered by meter then date
+    """
+    import time
+    from multiprocessing import Pool, cpu_count
     
-    # 3. Final cleanup
-    temp_df = temp_df.fillna(0)
+    n_meters = cache.n_meters
+    print(f"Starting robust imputation from tensor cache ({n_meters:,} meters)...")
     
-    imputed_matrix = temp_df.values
+    if n_workers is None:
+        n_workers = max(1, cpu_count() - 1)
     
-    # 4. Enforce monotonicity (within day only)
-    if enforce_monotonicity:
-        for i in range(len(imputed_matrix)):
-            for j in range(1, imputed_matrix.shape[1]):
-                if imputed_matrix[i, j] < imputed_matrix[i, j-1]:
-                    imputed_matrix[i, j] = imputed_matrix[i, j-1]
-    
-    # Update this meter's data
-    result = meter_data.copy()
-    result[value_columns] = imputed_matrix
-    return result
+    offsets = cache.row_offsets()
+    imputed_rows = np.empty((offsets[-1], len(cache.value_columns)))
+    
+    args_list = [(str(cache.cache_dir), start, min(start + meters_per_task, n_meters), enforce_monotonicity)
+                 for start in range(0, n_meters, meters_per_task)]
+    
+    start_time = time.time()
+    
+    def _store(result, done):
+        first, matrices = result
+        for i, matrix in enumerate(matrices, start=first):
+            imputed_rows[offsets[i]:offsets[i + 1]] = matrix
+        if progress_callback:
+            progress_callback(int(100 * done / len(args_list)), f"Imputando bloco {done}/{len(args_list)}")
+    
+    if n_workers > 1:
+        with Pool(n_workers) as pool:
+            for done, result in enumerate(pool.imap_unordered(_process_cached_meters, args_list), start=1):
+                _store(result, done)
+    else:
+        for done, args in enumerate(args_list, start=1):
+            _store(_process_cached_meters(args), done)
+    
+    elapsed_total = time.time() - start_time
+    print(f"✅ Completed in {elapsed_total:.1f}s ({n_meters/max(elapsed_total, 1e-9):.1f} meters/s)")
+    
+    return cache.to_frame(imputed_rows)
+
+
+def _process_shared_meters(args):
+    """Shared-memory worker: imputes the given meters in place"""
+    meters, enforce_monotonicity = args
+    values, offsets, out = worker_views()
+    for i in meters:
+        rows = slice(offsets[i], offsets[i + 1])
+        out[rows] = _impute_meter_matrix(values[rows], enforce_monotonicity)
+    return len(meters)
+
+
+def _shared_memory_imputation(df, value_columns, enforce_monotonicity, progress_callback,
+                              n_workers, batches_per_worker=8):
+    """
+    Shared-memory execution of simple_latc_imputation.
+    
+    The (rows, 24) matrix is reordered so each meter is contiguous and placed
+    once in shared memory; workers get only cost-balanced batches of meter
+    indices (longest first, see meter_scheduler) and write their results in
+    place. Output keeps the input row order.
+    """
+    import time
+    from multiprocessing import Pool
+    
+    order, offsets = group_rows_by_meter(df['id'].values)
+    n_meters = len(offsets) - 1
+    start_time = time.time()
+    
+    values = df[value_columns].values[order]
+    costs = meter_costs(offsets, missing_per_meter(values, offsets), n_cols=len(value_columns))
+    batches = cost_balanced_batches(costs, n_workers, batches_per_worker)
+    
+    with SharedMeterMatrix(values, offsets) as shared:
+        tasks = [(batch, enforce_monotonicity) for batch in batches]
+        done = 0
+        with Pool(n_workers, initializer=attach_worker, initargs=(shared.specs,)) as pool:
+            for count in pool.imap_unordered(_process_shared_meters, tasks):
+                done += count
+                elapsed = time.time() - start_time
+                print(f"  Processed {done}/{n_meters} ({100*done/n_meters:.1f}%) | "
+                      f"Speed: {done/max(elapsed, 1e-9):.1f} meters/s")
+                if progress_callback:
+                    progress_callback(int(100 * done / n_meters), f"Imputando contador {done}/{n_meters}")
+        imputed = np.empty_like(shared.view('out'))
+        imputed[order] = shared.view('out')
+    
+    result_df = df.copy()
+    result_df[value_columns] = imputed
+    return result_df
+
+
+def _vectorized_imputation(df, value_columns, enforce_monotonicity, progress_callback, meters_per_batch=2000):
+    """
+    Vectorized execution of simple_latc_imputation.
+    
+    Meters are made contiguous and gap-filled in batches of `meters_per_batch`
+    with one NumPy call each (no per-meter DataFrame). Same rows, order and
+    values as the pool execution; output keeps the input row order.
+    """
+    import time
+    
+    order, offsets = group_rows_by_meter(df['id'].values)
+    n_meters = len(offsets) - 1
+    values = df[value_columns].values.astype(float)[order]
+    start_time = time.time()
+    
+    for first in range(0, n_meters, meters_per_batch):
+        last = min(first + meters_per_batch, n_meters)
+        rows = slice(offsets[first], offsets[last])
+        batch = fill_gaps_batch(values[rows], offsets[first:last + 1] - offsets[first])
+        if enforce_monotonicity:
+            batch = enforce_monotonic_rows(batch)
+        values[rows] = batch
+        
+        elapsed = time.time() - start_time
+        print(f"  Processed {last}/{n_meters} ({100*last/n_meters:.1f}%) | "
+              f"Speed: {last/max(elapsed, 1e-9):.1f} meters/s")
+        if progress_callback:
+            progress_callback(int(100 * last / n_meters), f"Imputando contador {last}/{n_meters}")
+    
+    # Back to the input row order
+    imputed = np.empty_like(values)
+    imputed[order] = values
+    result_df = df.copy()
+    result_df[value_columns] = imputed
+    return result_df
 
 
-def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progress_callback=None, n_workers=None):
+def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progress_callback=None, n_workers=None,
+                           execution='vectorized'):
     """
     LATC-inspired imputation with PER-METER processing to avoid cross-contamination
     NOW WITH PARALLEL PROCESSING for 3-7x speedup!
@@ -65,9 +208,12 @@ def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progres
         enforce_monotonicity: Whether to enforce non-decreasing values
         progress_callback: Optional callback for progress updates
         n_workers: Number of parallel workers (default: cpu_count - 1)
+        execution: 'vectorized' (batched NumPy kernel, single process), 'pool'
+            (cost-balanced batches of meter matrices pickled to workers) or
+            'shared_memory' (value matrix shared once, workers write in place)
         
     Returns:
-        DataFrame with imputed values
+        DataFrame with imputed values (same rows and row order as `df`)
     """
     print("Starting robust imputation (per-meter mode with parallelization)...")
     
@@ -88,6 +234,10 @@ def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progres
     
     # Process each meter in parallel
     unique_ids = df['id'].unique()
+    if execution == 'vectorized':
+        print(f"Processing {len(unique_ids):,} unique meters in vectorized batches...")
+        return _vectorized_imputation(df, value_columns, enforce_monotonicity, progress_callback)
+    
     print(f"Processing {len(unique_ids):,} unique meters in parallel...")
     
     # Determine number of workers
@@ -97,47 +247,60 @@ def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progres
     
     print(f"Using {n_workers} parallel workers")
     
+    if execution == 'shared_memory' and n_workers > 1:
+        return _shared_memory_imputation(df, value_columns, enforce_monotonicity, progress_callback, n_workers)
+    
     # Prepare arguments for each meter
     import time
     start_time = time.time()
     
-    # Group data by meter_id for faster access
-    grouped = df.groupby('id', sort=False)
+    # Group rows by meter (indices only; each meter's matrix is sliced when
+    # its task is generated) and write every result at its own rows
+    order, offsets = group_rows_by_meter(df['id'].values)
+    n_meters = len(offsets) - 1
+    imputed = np.empty_like(consumption_matrix)
+    
+    def meter_matrix(m):
+        return consumption_matrix[order[offsets[m]:offsets[m + 1]]]
     
-    # Create arguments list
-    args_list = [
-        (meter_id, group.copy(), value_columns, enforce_monotonicity)
-        for meter_id, group in grouped
-    ]
+    def store(m, matrix):
+        imputed[order[offsets[m]:offsets[m + 1]]] = matrix
     
     # Process in parallel
     from multiprocessing import Pool
     
-    processed_batches = []
-    
     if n_workers > 1:
+        # Cost-balanced batches, longest first; idle workers take the next one
+        missing = missing_per_meter(consumption_matrix, offsets, order)
+        costs = meter_costs(offsets, missing, n_cols=len(value_columns))
+        batches = cost_balanced_batches(costs, n_workers, batches_per_worker=8)
+        
+        # Tasks built lazily, at most 2 batches per worker in flight
+        tasks = (([(int(m), meter_matrix(m)) for m in batch], enforce_monotonicity) for batch in batches)
+        
         with Pool(n_workers) as pool:
-            # Use imap for progress tracking
-            for idx, result in enumerate(pool.imap(_process_single_meter, args_list)):
-                processed_batches.append(result)
+            idx = 0
+            for batch_results in bounded_pool_imap(pool, _process_meter_batch, tasks, 2 * n_workers):
+                for m, matrix in batch_results:
+                    store(m, matrix)
+                idx += len(batch_results)
                 
                 # Progress updates
-                if idx % 100 == 0 and idx > 0:
+                if idx > 0:
                     elapsed = time.time() - start_time
                     throughput = idx / elapsed
                     eta = (len(unique_ids) - idx) / throughput if throughput > 0 else 0
                     
-                    print(f"  Processed {idx+1}/{len(unique_ids)} ({100*idx/len(unique_ids):.1f}%) | "
+                    print(f"  Processed {idx}/{len(unique_ids)} ({100*idx/len(unique_ids):.1f}%) | "
                           f"Speed: {throughput:.1f} meters/s | ETA: {eta:.0f}s")
                     
                     if progress_callback:
                         progress = int(100 * idx / len(unique_ids))
-                        progress_callback(progress, f"Imputando contador {idx+1}/{len(unique_ids)}")
+                        progress_callback(progress, f"Imputando contador {idx}/{len(unique_ids)}")
     else:
         # Sequential fallback
-        for idx, args in enumerate(args_list):
-            result = _process_single_meter(args)
-            processed_batches.append(result)
+        for idx in range(n_meters):
+            store(idx, _impute_meter_matrix(meter_matrix(idx), enforce_monotonicity))
             
             if idx % 100 == 0:
                 print(f"  Processing meter {idx+1}/{len(unique_ids)}...")
@@ -145,12 +308,12 @@ def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progres
                     progress = int(100 * idx / len(unique_ids))
                     progress_callback(progress, f"Imputando contador {idx+1}/{len(unique_ids)}")
     
-    # Combine all meters back
-    result_df = pd.concat(processed_batches, ignore_index=True)
+    # Same rows and order as the input
+    result_df = df.copy()
+    result_df[value_columns] = imputed
     
     # Verify no NaN remaining
-    final_matrix = result_df[value_columns].values.astype(float)
-    remaining_nan = np.sum(np.isnan(final_matrix))
+    remaining_nan = np.sum(np.isnan(imputed))
     
     elapsed_total = time.time() - start_time
     print(f"Remaining NaN values: {remaining_nan}")
@@ -159,6 +322,98 @@ def simple_latc_imputation(df, value_columns, enforce_monotonicity=True, progres
     return result_df
 
 
+def _split_complete_meters(buffer):
+    """
+    Split buffered rows into (complete, pending).
+    
+    The trailing block of the last meter may continue in the next chunk, so it
+    is held back; everything before it belongs to meters whose rows are all in.
+    """
+    ids = buffer['id'].values
+    other = np.flatnonzero(ids != ids[-1])
+    cut = other[-1] + 1 if len(other) else 0
+    return buffer.iloc[:cut], buffer.iloc[cut:]
+
+
+def stream_latc_imputation(data_file, output_file, chunksize=100000, enforce_monotonicity=True,
+                           progress_callback=None, n_workers=None, checkpoint=None):
+    """
+    Streaming per-meter imputation with bounded memory.
+    
+    Reads the input in chunks, buffers rows until a meter's block is complete
+    (the export is grouped by meter), imputes the complete meters and appends
+    them to the output. A meter is never split across imputation calls, so the
+    cross-day fill sees all of its days. Peak memory is about one chunk plus
+    the largest single meter.
+    
+    With a checkpoint (run_checkpoint.RunCheckpoint), each imputed block is also
+    saved as a shard; on a restart with the same input and parameters the
+    blocks already done are read back instead of imputed again.
+    
+    Args:
+        data_file: Input telemetry (CSV or columnar store)
+        output_file: Output path (written as columnar store when available)
+        chunksize: Rows read per chunk
+        enforce_monotonicity: Whether to enforce non-decreasing values
+        progress_callback: Optional callback for progress updates
+        n_workers: Number of parallel workers per block
+        checkpoint: Optional RunCheckpoint (shard = block number)
+        
+    Returns:
+        (output path, rows written)
+    """
+    total_rows = telemetry_num_rows(data_file)
+    seen_ids = set()
+    rows_read = 0
+    value_columns = None
+    pending = None
+    n_blocks = 0
+    
+    def impute_block(block):
+        nonlocal n_blocks
+        if block.empty:
+            return
+        block_ids = block['id'].unique()
+        repeated = seen_ids.intersection(block_ids)
+        if repeated:
+            print(f"WARNING: {len(repeated)} meter(s) reappear later in the file "
+                  f"(input not grouped by meter); they are imputed per contiguous block")
+        seen_ids.update(block_ids)
+        
+        # Blocks depend only on the input and chunksize, so block k of a
+        # restarted run is the same rows as in the interrupted one
+        shard, n_blocks = n_blocks, n_blocks + 1
+        if checkpoint is not None and checkpoint.completed(shard, len(block)):
+            imputed = block.copy()
+            imputed[value_columns] = checkpoint.load(shard)[0]
+        else:
+            imputed = simple_latc_imputation(block, value_columns, enforce_monotonicity=enforce_monotonicity,
+                                             n_workers=n_workers)
+            if checkpoint is not None:
+                checkpoint.save(shard, imputed[value_columns].values)
+        writer.write(imputed)
+    
+    with TelemetryWriter(output_file) as writer:
+        for chunk in iter_telemetry_chunks(data_file, chunksize):
+            if value_columns is None:
+                value_columns = [col for col in chunk.columns if col.startswith('index_')]
+            rows_read += len(chunk)
+            
+            buffer = chunk if pending is None or pending.empty else pd.concat([pending, chunk], ignore_index=True)
+            complete, pending = _split_complete_meters(buffer)
+            impute_block(complete)
+            
+            if progress_callback:
+                pct = int(100 * rows_read / total_rows) if total_rows else 0
+                progress_callback(pct, f"Imputando em streaming ({rows_read:,} linhas lidas)")
+        
+        # Last meter of the file
+        if pending is not None:
+            impute_block(pending)
+    
+    return writer.path, writer.rows_written
+
+
 def _legacy_imputation(df, value_columns, enforce_monotonicity):
     """Legacy imputation method (processes all rows together - may cause spikes)"""
     print("WARNING: Using legacy mode without per-meter grouping")
@@ -167,25 +422,11 @@ def _legacy_imputation(df, value_columns, enforce_monotonicity):
     consumption_matrix = df[value_columns].values.astype(float)
     imputed_matrix = consumption_matrix.copy()
     
-    temp_df = pd.DataFrame(imputed_matrix, columns=[f'col_{j}' for j in range(imputed_matrix.shape[1])])
-    
-    if np.any(np.isnan(imputed_matrix)):
-        temp_df = temp_df.interpolate(method='linear', axis=1, limit_direction='both')
-    
-    temp_df = temp_df.ffill(axis=1).bfill(axis=1)
-    
-    if temp_df.isnull().values.any():
-        temp_df = temp_df.ffill(axis=0)
-        temp_df = temp_df.bfill(axis=0)
-    
-    temp_df = temp_df.fillna(0)
-    imputed_matrix = temp_df.values
+    # Single segment: the cross-day fill runs over all rows together
+    imputed_matrix = fill_gaps_batch(imputed_matrix)
     
     if enforce_monotonicity:
-        for i in range(len(imputed_matrix)):
-            for j in range(1, imputed_matrix.shape[1]):
-                if imputed_matrix[i, j] < imputed_matrix[i, j-1]:
-                    imputed_matrix[i, j] = imputed_matrix[i, j-1]
+        imputed_matrix = enforce_monotonic_rows(imputed_matrix)
     
     result_df[value_columns] = imputed_matrix
     return result_df
@@ -200,66 +441,52 @@ def main():
     
     # Load data
     import sys
-    if len(sys.argv) > 1:
-        data_file = sys.argv[1]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if args:
+        data_file = args[0]
     else:
         data_file = "data/telemetria_consumos_202507281246.csv"
         
     print(f"\nLoading data from: {data_file}")
     
-    if not os.path.exists(data_file):
+    if not telemetry_exists(data_file):
         print(f"Error: File not found: {data_file}")
         return
+    
+    if '--cache' in sys.argv:
+        # Memory-mapped meters × days × 24 tensor (built once, reused across runs)
+        cache = open_tensor_cache(data_file)
+        full_imputed_df = simple_latc_imputation_cached(cache, enforce_monotonicity=True)
+        output_file = save_telemetry(full_imputed_df, "data/imputed_consumption_full.csv")
+        print(f"Saved results to: {output_file}")
+        return
 
     # Initialize progress tracker
     progress = ProgressTracker("Interpolação Linear", 100)
     progress.update("Carregando dados...", 0)
-
-    df = pd.read_csv(data_file)
-    progress.update("Dados carregados", 10)
-    
-    print(f"Loaded {len(df):,} records")
-    
-    # Identify value columns
-    value_columns = [col for col in df.columns if col.startswith('index_')]
-    print(f"Value columns: {len(value_columns)} hourly readings")
-    
-    # Process in batches
-    batch_size = 10000
-    print(f"\nProcessing in batches of {batch_size:,} meters...")
-    
-    imputed_batches = []
-    
-    for i in range(0, len(df), batch_size):
-        batch_num = i // batch_size + 1
-        total_batches = (len(df) - 1) // batch_size + 1
-        
-        batch = df.iloc[i:i+batch_size].copy()
-        print(f"\n{'='*70}")
-        print(f"Batch {batch_num}/{total_batches} (rows {i:,} to {min(i+batch_size, len(df)):,})")
-        print(f"{'='*70}")
-        
-        imputed_batch = simple_latc_imputation(batch, value_columns, enforce_monotonicity=True)
-        imputed_batches.append(imputed_batch)
-        
-        # Update progress (processing batches = 60% of total work)
-        batch_progress = 20 + int(60 * (batch_num / total_batches))
-        progress.set_progress(batch_progress, f"Processando lote {batch_num}/{total_batches}...")
-        if progress_callback:
-            progress_callback(batch_progress, f"Processando dados (Lote {batch_num}/{total_batches})")
-    
-    # Combine all batches
-    print(f"\n{'='*70}")
-    print("Combining batches...")
-    full_imputed_df = pd.concat(imputed_batches, ignore_index=True)
     
-    # Save results
-    output_file = "data/imputed_consumption_full.csv"
-    progress.update("Salvando resultados...", 10)
-    if progress_callback:
-        progress_callback(90, "Finalizando e salvando...")
-    print(f"Saving results to: {output_file}")
-    full_imputed_df.to_csv(output_file, index=False)
+    # Stream the input: meters are imputed as soon as their block is complete
+    # and appended to the output, so memory is bounded by the chunk size
+    chunksize = 100000
+    print(f"\nStreaming in chunks of {chunksize:,} rows...")
+    
+    def tracker_callback(pct, msg):
+        progress.set_progress(10 + int(0.85 * pct), msg)
+    
+    # Completed blocks are kept in data/<arquivo>_runs/ until the output is
+    # written, so an interrupted run resumes where it stopped
+    checkpoint = None
+    if '--no-checkpoint' not in sys.argv:
+        checkpoint = open_run_checkpoint(data_file, {'engine': 'latc_simple.stream', 'chunksize': chunksize,
+                                                     'enforce_monotonicity': True})
+    
+    output_file, total_rows = stream_latc_imputation(
+        data_file, "data/imputed_consumption_full.csv",
+        chunksize=chunksize, enforce_monotonicity=True,
+        progress_callback=tracker_callback, checkpoint=checkpoint
+    )
+    if checkpoint is not None:
+        checkpoint.clear()
     
     progress.complete()
     progress.cleanup()
@@ -267,7 +494,7 @@ def main():
     print(f"\n{'='*70}")
     print("SUCCESS!")
     print(f"{'='*70}")
-    print(f"Total records processed: {len(full_imputed_df):,}")
+    print(f"Total records processed: {total_rows:,}")
     print(f"Output file: {output_file}")
     print(f"{'='*70}")
 
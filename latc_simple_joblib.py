@@ -6,42 +6,45 @@ Joblib tem melhor serialização e funciona bem com NumPy/Pandas
 import numpy as np
 import pandas as pd
 import warnings
+from multiprocessing import TimeoutError as MultiprocessingTimeoutError
 warnings.filterwarnings('ignore')
 
 from progress_tracker import ProgressTracker
+from gap_fill import fill_gaps_batch
+from monotonic import enforce_monotonic_rows
+from shared_matrix import group_rows_by_meter
+from meter_scheduler import guarded
 
 
 def _process_meter_joblib(meter_data_tuple):
-    """Worker para joblib - recebe tupla (meter_id, meter_matrix, value_columns, enforce_mono)"""
-    meter_id, meter_matrix, value_columns, enforce_monotonicity = meter_data_tuple
+    """Worker para joblib - recebe tupla (posição do contador, meter_matrix, value_columns, enforce_mono)"""
+    meter, meter_matrix, value_columns, enforce_monotonicity = meter_data_tuple
     
-    # 1. Horizontal interpolation
-    temp_df = pd.DataFrame(meter_matrix)
-    if np.any(np.isnan(meter_matrix)):
-        temp_df = temp_df.interpolate(method='linear', axis=1, limit_direction='both')
-    temp_df = temp_df.ffill(axis=1).bfill(axis=1)
-    
-    # 2. Vertical fill
-    if temp_df.isnull().values.any():
-        temp_df = temp_df.ffill(axis=0).bfill(axis=0)
-    temp_df = temp_df.fillna(0)
-    
-    imputed_matrix = temp_df.values
+    # 1-2. Horizontal interpolation + vertical fill (vectorized kernel)
+    imputed_matrix = fill_gaps_batch(meter_matrix)
     
     # 3. Monotonicity
     if enforce_monotonicity:
-        for i in range(len(imputed_matrix)):
-            for j in range(1, imputed_matrix.shape[1]):
-                if imputed_matrix[i, j] < imputed_matrix[i, j-1]:
-                    imputed_matrix[i, j] = imputed_matrix[i, j-1]
+        imputed_matrix = enforce_monotonic_rows(imputed_matrix)
     
-    return (meter_id, imputed_matrix)
+    return (meter, imputed_matrix)
 
 
 def simple_latc_imputation_joblib(df, value_columns, enforce_monotonicity=True, 
-                                   progress_callback=None, n_workers=None):
+                                   progress_callback=None, n_workers=None,
+                                   retries=1, meter_timeout=None):
     """
     Versão com JOBLIB para melhor paralelização no Windows
+    
+    Cada contador é isolado: um contador que falha é repetido `retries` vezes
+    e depois posto em quarentena (preenchido neste processo, fora do pool;
+    linhas mantidas como na entrada só se falhar de novo); com
+    `meter_timeout` (segundos), um contador que excede o tempo também. Os
+    restantes contadores continuam em paralelo.
+    
+    Returns:
+        DataFrame imputado (mesma ordem de linhas); result_df.attrs['quarantine']
+        mapeia cada contador em quarentena ao seu erro
     """
     print("🚀 LATC Imputation (JOBLIB backend - Windows optimized)")
     
@@ -64,16 +67,17 @@ def simple_latc_imputation_joblib(df, value_columns, enforce_monotonicity=True,
     
     print(f"Workers: {n_workers}")
     
-    # Prepare data tuples (pre-group to avoid repeated filtering)
-    print("Preparing batches...")
-    grouped = df.groupby('id', sort=False)
+    # Group rows by meter once (indices only); each meter's matrix is sliced
+    # when its task is generated, so the task list never duplicates the data
+    order, offsets = group_rows_by_meter(df['id'].values)
+    n_tasks = len(offsets) - 1
     
-    tasks = []
-    for meter_id, group in grouped:
-        meter_matrix = group[value_columns].values.astype(float)
-        tasks.append((meter_id, meter_matrix, value_columns, enforce_monotonicity))
+    def iter_tasks(meters):
+        for m in meters:
+            rows = order[offsets[m]:offsets[m + 1]]
+            yield (m, consumption_matrix[rows], value_columns, enforce_monotonicity)
     
-    print(f"Created {len(tasks)} tasks")
+    print(f"{n_tasks} tasks (geradas sob demanda)")
     
     # Process with joblib
     from joblib import Parallel, delayed
@@ -83,38 +87,78 @@ def simple_latc_imputation_joblib(df, value_columns, enforce_monotonicity=True,
     
     print(f"\n⚙️ Processing in parallel (joblib)...")
     
-    try:
-        # Use prefer="processes" for true parallelism (não threads!)
-        results = Parallel(n_jobs=n_workers, prefer="processes", verbose=10)(
-            delayed(_process_meter_joblib)(task) for task in tasks
-        )
-        
-        elapsed = time.time() - start
-        print(f"\n✅ Completed in {elapsed:.1f}s ({len(tasks)/elapsed:.1f} meters/s)")
+    imputed = consumption_matrix.copy()
+    handled = np.zeros(n_tasks, dtype=bool)
+    failures = np.zeros(n_tasks, dtype=np.int64)
+    quarantine = {}
+    
+    def record(m, result, error):
+        rows = order[offsets[m]:offsets[m + 1]]
+        if error is None:
+            imputed[rows] = result[1]
+        else:
+            # Quarantined: the same kernel once more in this process, outside
+            # the pool (input values kept only if it fails here too)
+            result, _ = guarded(_process_meter_joblib, next(iter_tasks([m])), 0)
+            if result is not None:
+                imputed[rows] = result[1]
+            quarantine[df['id'].values[rows[0]]] = error
+            print(f"⚠️ Meter {df['id'].values[rows[0]]} quarantined: {error}")
+        handled[m] = True
+    
+    # Exceptions are caught (and retried) inside each task. A timeout or a
+    # dead worker aborts the Parallel call instead: the results already
+    # collected are kept, the meter being waited on is charged with the
+    # failure, and only the meters still pending are resubmitted
+    remaining = np.arange(n_tasks)
+    while len(remaining):
+        try:
+            # Use prefer="processes" for true parallelism (não threads!)
+            # pre_dispatch bounds the tasks taken from the generator ahead of the workers
+            results = Parallel(n_jobs=n_workers, prefer="processes", verbose=10,
+                               pre_dispatch=2 * n_workers, return_as="generator",
+                               timeout=meter_timeout)(
+                delayed(guarded)(_process_meter_joblib, task, retries) for task in iter_tasks(remaining)
+            )
+            for m, (result, error) in zip(remaining, results):
+                record(m, result, error)
+            remaining = remaining[:0]
         
-    except Exception as e:
-        print(f"❌ Parallel error: {e}")
-        print("Falling back to sequential...")
-        
-        results = []
-        for i, task in enumerate(tasks):
-            result = _process_meter_joblib(task)
-            results.append(result)
-            if i % 100 == 0:
-                print(f"  {i}/{len(tasks)}")
-    
-    # Reconstruct DataFrame
-    print("Reconstructing DataFrame...")
+        except Exception as e:
+            # joblib raises multiprocessing.TimeoutError, not the builtin one
+            timed_out = isinstance(e, (TimeoutError, MultiprocessingTimeoutError))
+            reason = f"timeout ({meter_timeout:g}s)" if timed_out else f"{type(e).__name__}: {e}"
+            pending = remaining[~handled[remaining]]
+            if not handled.any() and not timed_out:
+                # Nothing ran at all: the process pool itself is unusable here
+                print(f"❌ Parallel error: {e}")
+                print("Falling back to sequential...")
+                for i, task in enumerate(iter_tasks(pending)):
+                    result, error = guarded(_process_meter_joblib, task, retries)
+                    record(task[0], result, error)
+                    if i % 100 == 0:
+                        print(f"  {i}/{len(pending)}")
+                remaining = remaining[:0]
+                continue
+            
+            m = pending[0]
+            failures[m] += 1
+            print(f"⚠️ Parallel call aborted at meter {df['id'].values[order[offsets[m]]]}: {reason}")
+            if failures[m] > retries:
+                record(m, None, reason)
+            remaining = pending[~handled[pending]]
     
-    # Create dict for fast lookup
-    imputed_dict = {meter_id: matrix for meter_id, matrix in results}
+    elapsed = time.time() - start
+    print(f"\n✅ Completed in {elapsed:.1f}s ({n_tasks/elapsed:.1f} meters/s)")
+    if quarantine:
+        print(f"⚠️ {len(quarantine)} meters quarantined (filled outside the pool)")
     
-    # Update original df
+    # Reconstruct DataFrame: each meter's result written at its own rows
+    # (input order kept, no per-meter masking)
+    print("Reconstructing DataFrame...")
     result_df = df.copy()
-    
-    for meter_id in unique_ids:
-        mask = result_df['id'] == meter_id
-        result_df.loc[mask, value_columns] = imputed_dict[meter_id]
+    result_df[value_columns] = imputed
+    result_df.attrs['quarantine'] = quarantine
     
     print("✅ Done!")
     return result_df
@@ -4,51 +4,39 @@ Corrige problemas de CPU underutilization
 """
 
 import numpy as np
-import pandas as pd
 from concurrent.futures import ProcessPoolExecutor
 import warnings
-import os
 warnings.filterwarnings('ignore')
 
 from progress_tracker import ProgressTracker
+from gap_fill import fill_gaps_batch
+from monotonic import enforce_monotonic_rows
+from shared_matrix import (SharedMeterMatrix, attach_worker, detach_worker,
+                           group_rows_by_meter, worker_views)
+from meter_scheduler import cost_balanced_batches, meter_costs, missing_per_meter
 
 
 def _process_meter_chunk_optimized(args):
-    """Worker otimizado - recebe apenas IDs e carrega dados internamente"""
-    meter_ids, df_path, value_columns, enforce_monotonicity = args
+    """Worker otimizado - recebe apenas os índices dos contadores e lê/escreve na memória compartilhada"""
+    meters, enforce_monotonicity = args
     
-    # Cada worker carrega apenas seus dados (evita serialização pesada)
-    df = pd.read_csv(df_path)
+    # Matriz de valores, offsets e saída já anexados pelo initializer (zero-copy)
+    values, offsets, out = worker_views()
     
-    results = []
-    for meter_id in meter_ids:
-        meter_data = df[df['id'] == meter_id].copy()
-        meter_matrix = meter_data[value_columns].values.astype(float)
+    for m in meters:
+        rows = slice(offsets[m], offsets[m + 1])
+        meter_matrix = values[rows]
         
-        # 1. Horizontal interpolation
-        temp_df = pd.DataFrame(meter_matrix)
-        if np.any(np.isnan(meter_matrix)):
-            temp_df = temp_df.interpolate(method='linear', axis=1, limit_direction='both')
-        temp_df = temp_df.ffill(axis=1).bfill(axis=1)
-        
-        # 2. Vertical fill
-        if temp_df.isnull().values.any():
-            temp_df = temp_df.ffill(axis=0).bfill(axis=0)
-        temp_df = temp_df.fillna(0)
-        
-        imputed_matrix = temp_df.values
+        # 1-2. Horizontal interpolation + vertical fill (vectorized kernel)
+        imputed_matrix = fill_gaps_batch(meter_matrix)
         
         # 3. Monotonicity
         if enforce_monotonicity:
-            for i in range(len(imputed_matrix)):
-                for j in range(1, imputed_matrix.shape[1]):
-                    if imputed_matrix[i, j] < imputed_matrix[i, j-1]:
-                        imputed_matrix[i, j] = imputed_matrix[i, j-1]
+            imputed_matrix = enforce_monotonic_rows(imputed_matrix)
         
-        meter_data[value_columns] = imputed_matrix
-        results.append(meter_data)
+        out[rows] = imputed_matrix
     
-    return pd.concat(results, ignore_index=True)
+    return len(meters)
 
 
 def simple_latc_imputation_optimized(df, value_columns, enforce_monotonicity=True, 
@@ -78,62 +66,56 @@ def simple_latc_imputation_optimized(df, value_columns, enforce_monotonicity=Tru
     
     print(f"Using {n_workers} parallel workers")
     
-    # Save temp file for workers to load
-    import tempfile
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv', mode='w')
-    temp_path = temp_file.name
-    temp_file.close()
-    df.to_csv(temp_path, index=False)
-    
-    print(f"Temp file: {temp_path}")
-    
-    # Split IDs into chunks
-    chunk_size = max(1, len(unique_ids) // (n_workers * 4))  # 4 chunks per worker
-    id_chunks = [unique_ids[i:i+chunk_size] for i in range(0, len(unique_ids), chunk_size)]
+    # Matriz de valores agrupada por contador em memória compartilhada (uma única vez)
+    order, offsets = group_rows_by_meter(df['id'].values)
     
-    print(f"Created {len(id_chunks)} chunks ({chunk_size} meters/chunk)")
-    
-    # Prepare args
-    args_list = [
-        (chunk, temp_path, value_columns, enforce_monotonicity)
-        for chunk in id_chunks
-    ]
-    
-    # Process in parallel
     import time
     start = time.time()
-    results = []
     
-    print(f"\n⚙️ Processing chunks in parallel...")
-    
-    if n_workers > 1:
-        with ProcessPoolExecutor(max_workers=n_workers) as executor:
-            futures = [executor.submit(_process_meter_chunk_optimized, args) for args in args_list]
-            
-            for idx, future in enumerate(futures):
-                result = future.result()
-                results.append(result)
-                
-                elapsed = time.time() - start
-                progress = (idx + 1) / len(futures) * 100
-                
-                print(f"  [{idx+1}/{len(futures)}] {progress:.1f}% | {elapsed:.1f}s elapsed")
+    values = consumption_matrix[order]
+    with SharedMeterMatrix(values, offsets) as shared:
+        print(f"Shared memory: {shared.view('values').nbytes / (1024 * 1024):.1f} MB")
+        
+        # Cost-balanced batches (rows + missing values per meter), longest first
+        costs = meter_costs(offsets, missing_per_meter(values, offsets), n_cols=len(value_columns))
+        batches = cost_balanced_batches(costs, n_workers, batches_per_worker=4)
+        args_list = [(batch, enforce_monotonicity) for batch in batches]
+        
+        print(f"Created {len(args_list)} chunks (custo equilibrado, maiores primeiro)")
+        
+        print(f"\n⚙️ Processing chunks in parallel...")
+        
+        if n_workers > 1:
+            from concurrent.futures import as_completed
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=attach_worker,
+                                     initargs=(shared.specs,)) as executor:
+                # Submitted longest first; a free worker takes the next pending chunk
+                futures = [executor.submit(_process_meter_chunk_optimized, args) for args in args_list]
                 
-                if progress_callback:
-                    progress_callback(int(progress), f"Chunk {idx+1}/{len(futures)}")
-    else:
-        for idx, args in enumerate(args_list):
-            result = _process_meter_chunk_optimized(args)
-            results.append(result)
-    
-    # Cleanup
-    try:
-        os.remove(temp_path)
-    except:
-        pass
+                for idx, future in enumerate(as_completed(futures)):
+                    future.result()
+                    
+                    elapsed = time.time() - start
+                    progress = (idx + 1) / len(futures) * 100
+                    
+                    print(f"  [{idx+1}/{len(futures)}] {progress:.1f}% | {elapsed:.1f}s elapsed")
+                    
+                    if progress_callback:
+                        progress_callback(int(progress), f"Chunk {idx+1}/{len(futures)}")
+        else:
+            attach_worker(shared.specs)
+            try:
+                for args in args_list:
+                    _process_meter_chunk_optimized(args)
+            finally:
+                detach_worker()
+        
+        imputed = np.empty_like(consumption_matrix)
+        imputed[order] = shared.result()
     
-    # Combine
-    final_df = pd.concat(results, ignore_index=True)
+    # Each meter's rows back at their input positions (same order as df)
+    final_df = df.copy()
+    final_df[value_columns] = imputed
     
     elapsed = time.time() - start
     throughput = len(unique_ids) / elapsed
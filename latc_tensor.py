@@ -0,0 +1,273 @@
+"""
+Low-rank autoregressive tensor completion (LATC) over meters × days × hours
+ADMM solver for
+
+    min  sum_k alpha_k ||X_(k)||_theta  +  lambda/2 sum_m ||AR residual of meter m||^2
+    s.t. X = Z,  Z matches the observed readings
+
+where ||.||_theta is the truncated nuclear norm (the top `theta` singular
+values are not penalized) of each mode unfolding - meters, days and hours -
+and the AR term fits each meter's flattened hourly series on its own lags
+(default 1 h, 2 h, 24 h). The mode-0 / mode-1 unfoldings couple the meters
+of a block, the AR term couples neighbouring hours and days.
+
+Meters are processed in blocks (meters with similar date spans together, the
+day axis trimmed to the block's span). Every update is vectorized over the
+block: singular value thresholding via the Gram matrix of the short side of
+each unfolding, AR coefficients from batched lag × lag normal equations built
+on shifted views of the series.
+"""
+
+import numpy as np
+
+from gap_fill import fill_gaps_batch
+from lowrank_svd import clean_readings
+
+
+DEFAULT_TIME_LAGS = (1, 2, 24)
+
+
+def unfold(tensor, mode):
+    """Mode-k unfolding: (shape[mode], product of the other dims)"""
+    return np.moveaxis(tensor, mode, 0).reshape(tensor.shape[mode], -1)
+
+
+def fold(matrix, shape, mode):
+    """Inverse of unfold"""
+    moved = [shape[mode]] + [size for axis, size in enumerate(shape) if axis != mode]
+    return np.moveaxis(matrix.reshape(moved), 0, mode)
+
+
+def svt_tnn(matrix, tau, theta):
+    """
+    Proximal step of the truncated nuclear norm: singular values above `tau`
+    are kept, the top `theta` of them unshrunk and the rest soft-thresholded
+    by `tau`. Computed from the eigendecomposition of the Gram matrix of the
+    short side (unfoldings here are very wide).
+    """
+    if matrix.shape[0] > matrix.shape[1]:
+        return svt_tnn(matrix.T, tau, theta).T
+    eigvals, u = np.linalg.eigh(matrix @ matrix.T)
+    s = np.sqrt(np.clip(eigvals[::-1], 0, None))
+    u = u[:, ::-1]
+    idx = int(np.sum(s > tau))
+    if idx == 0:
+        return np.zeros_like(matrix)
+    scale = np.ones(idx)
+    scale[theta:] = (s[theta:idx] - tau) / s[theta:idx]
+    u = u[:, :idx]
+    return (u * scale) @ (u.T @ matrix)
+
+
+def ar_fit(series, target, time_lags):
+    """
+    Per-meter least-squares AR fit of `target[:, max_lag:]` on lagged copies of
+    `series`, all meters at once.
+
+    Args:
+        series: (meters, T) series the lags are taken from
+        target: (meters, T) series to explain
+        time_lags: Lags (in samples)
+
+    Returns:
+        (predictions (meters, T - max_lag), coefficients (meters, len(time_lags)))
+    """
+    max_lag = max(time_lags)
+    n = series.shape[1] - max_lag
+    lagged = np.stack([series[:, max_lag - lag:max_lag - lag + n] for lag in time_lags], axis=1)
+    gram = np.einsum('bin,bjn->bij', lagged, lagged)
+    rhs = np.einsum('bin,bn->bi', lagged, target[:, max_lag:])
+    coefficients = np.einsum('bij,bj->bi', np.linalg.pinv(gram), rhs)
+    return np.einsum('bin,bi->bn', lagged, coefficients), coefficients
+
+
+def latc_complete(tensor, time_lags=DEFAULT_TIME_LAGS, alpha=None, rho=0.1, ar_weight=5.0,
+                  theta=3, max_iterations=100, tolerance=1e-4, max_rho=1e5):
+    """
+    Complete one (meters, days, hours) block with LATC/ADMM.
+
+    The tensor is completed on per-meter residuals: a least-squares line over
+    each meter's observed readings is removed (cumulative readings grow with
+    time and differ by orders of magnitude between meters) and the residual is
+    scaled to unit RMS. Meters without any reading are returned as NaN.
+
+    Args:
+        tensor: (meters, days, hours) readings, NaN = missing
+        time_lags: AR lags in hours along each meter's flattened series
+        alpha: Weights of the three mode unfoldings (default: equal)
+        rho: Initial ADMM penalty (grows ×1.05 per iteration up to `max_rho`)
+        ar_weight: AR regularization, lambda = ar_weight × initial rho
+        theta: Singular values left unpenalized per unfolding
+        max_iterations: ADMM iterations cap
+        tolerance: Stop when the relative change of the estimate drops below this
+
+    Returns:
+        (completed tensor, iterations)
+    """
+    tensor = np.asarray(tensor, dtype=float)
+    completed = np.full(tensor.shape, np.nan)
+    observed = ~np.isnan(tensor)
+    active = observed.any(axis=(1, 2))
+    if not active.any():
+        return completed, 0
+
+    data = tensor[active]
+    observed = observed[active]
+    shape = data.shape
+    n_meters, n_steps = shape[0], shape[1] * shape[2]
+    alpha = np.full(3, 1 / 3) if alpha is None else np.asarray(alpha, dtype=float)
+    time_lags = tuple(lag for lag in time_lags if lag < n_steps)
+    max_lag = max(time_lags) if time_lags else 0
+    lambda_ar = ar_weight * rho
+
+    # Per-meter detrending (least-squares line over the observed readings)
+    # and standardization of the residual
+    series = data.reshape(n_meters, n_steps)
+    steps = np.arange(n_steps, dtype=float)
+    weights = (~np.isnan(series)).astype(float)
+    count = weights.sum(axis=1, keepdims=True)
+    t_mean = (weights * steps).sum(axis=1, keepdims=True) / count
+    mean = np.nanmean(series, axis=1, keepdims=True)
+    t_var = (weights * (steps - t_mean) ** 2).sum(axis=1, keepdims=True)
+    cov = np.nansum((steps - t_mean) * (series - mean), axis=1, keepdims=True)
+    slope = np.divide(cov, t_var, out=np.zeros_like(cov), where=t_var > 0)
+    trend = mean + slope * (steps - t_mean)
+    series = series - trend
+    scale = np.sqrt(np.nanmean(series ** 2, axis=1, keepdims=True))
+    scale[~(scale > 0)] = 1.0
+    series = series / scale
+
+    # Start from linear interpolation along each meter's series
+    Z = fill_gaps_batch(series, np.arange(n_meters + 1))
+    missing = ~observed.reshape(n_meters, n_steps)
+    snorm = np.linalg.norm(series[~missing])
+    snorm = snorm if snorm > 0 else 1.0
+
+    X = np.zeros((3,) + shape)
+    T = np.zeros((3,) + shape)
+    last = Z.copy()
+    iterations = 0
+    while iterations < max_iterations:
+        Zt = Z.reshape(shape)
+        for k in range(3):
+            X[k] = fold(svt_tnn(unfold(Zt - T[k] / rho, k), alpha[k] / rho, theta), shape, k)
+        estimate = np.einsum('k,kmdh->mdh', alpha, X).reshape(n_meters, n_steps)
+
+        # Z update: ADMM average, pulled toward the AR fit of the estimate
+        average = np.mean(rho * X + T, axis=0).reshape(n_meters, n_steps)
+        update = average / rho
+        if time_lags and lambda_ar > 0:
+            predicted, _ = ar_fit(estimate, Z, time_lags)
+            update[:, max_lag:] = (average[:, max_lag:] + lambda_ar * predicted) / (rho + lambda_ar)
+        Z[missing] = update[missing]
+
+        T += rho * (X - Z.reshape(shape)[None])
+        iterations += 1
+        change = np.linalg.norm(estimate - last) / snorm
+        last = estimate
+        if change < tolerance:
+            break
+        rho = min(rho * 1.05, max_rho)
+
+    result = np.where(missing, last, series) * scale + trend
+    completed[active] = result.reshape(shape)
+    return completed, iterations
+
+
+def span_sorted_blocks(present, meters_per_block):
+    """Meter index blocks with similar (first day, last day) spans"""
+    present = np.asarray(present)
+    has_days = present.any(axis=1)
+    first = np.where(has_days, present.argmax(axis=1), 0)
+    last = np.where(has_days, present.shape[1] - present[:, ::-1].argmax(axis=1), 0)
+    order = np.lexsort((last, first))
+    return [order[i:i + meters_per_block] for i in range(0, len(order), meters_per_block)]
+
+
+def complete_meter_block(values, present, meters, **latc_kwargs):
+    """
+    Clean and complete the meters of one block.
+
+    Args:
+        values: (n_meters, n_days, hours) readings (array or memmap), NaN = missing
+        present: (n_meters, n_days) True where the day exists in the source
+        meters: Meter indices of the block (sorted)
+        **latc_kwargs: Passed to latc_complete
+
+    Returns:
+        (cleaned, completed, iterations): (rows, hours) arrays for the block's
+        present days in (meter, date) order
+    """
+    block_present = np.asarray(present[meters])
+    days = np.flatnonzero(block_present.any(axis=0))
+    if len(days) == 0:
+        empty = np.empty((0, values.shape[2]))
+        return empty, empty, 0
+    lo, hi = days[0], days[-1] + 1
+    block_present = block_present[:, lo:hi]
+    meter_index, day_index = np.nonzero(block_present)
+    rows = np.asarray(values[meters, lo:hi])[meter_index, day_index]
+
+    # Same pre-cleaning as the SVD engines (zeros, spikes, drops)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(meter_index, minlength=len(meters)))])
+    cleaned = clean_readings(rows, offsets)
+
+    tensor = np.full((len(meters), hi - lo, values.shape[2]), np.nan)
+    tensor[meter_index, day_index] = cleaned
+    completed, iterations = latc_complete(tensor, **latc_kwargs)
+    return cleaned, completed[meter_index, day_index], iterations
+
+
+def latc_impute_tensor(values, present, meters_per_block=128, n_workers=None,
+                       verbose=True, progress_callback=None, **latc_kwargs):
+    """
+    LATC over the whole network, one block of meters at a time (blocks run in
+    threads; the linear algebra releases the GIL).
+
+    Args:
+        values: (n_meters, n_days, hours) readings (array or memmap), NaN = missing
+        present: (n_meters, n_days) True where the day exists in the source
+        meters_per_block: Meters coupled in one tensor
+        n_workers: Threads (default: min(cpu_count(), 16))
+        **latc_kwargs: Passed to latc_complete
+
+    Returns:
+        (imputed, known): (rows, hours) arrays for all present days in
+        (meter, date) order - imputed readings (NaN for meters without any
+        reading) and the mask of readings kept by the cleaning
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from multiprocessing import cpu_count
+
+    present = np.asarray(present)
+    offsets = np.concatenate([[0], np.cumsum(present.sum(axis=1))])
+    imputed = np.full((offsets[-1], values.shape[2]), np.nan)
+    known = np.zeros(imputed.shape, dtype=bool)
+    blocks = [np.sort(meters) for meters in span_sorted_blocks(present, meters_per_block)]
+
+    def process_block(meters):
+        cleaned, completed, iterations = complete_meter_block(values, present, meters, **latc_kwargs)
+        rows = np.concatenate([np.arange(offsets[m], offsets[m + 1]) for m in meters])
+        imputed[rows] = completed
+        known[rows] = ~np.isnan(cleaned)
+        return iterations
+
+    start_time = time.time()
+    total_iterations = 0
+    n_workers = n_workers or min(cpu_count(), 16)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        for done, iterations in enumerate(executor.map(process_block, blocks), start=1):
+            total_iterations += iterations
+            if progress_callback:
+                progress_callback(int(80 * done / len(blocks)), f"Processando bloco {done}/{len(blocks)}")
+            if verbose and done % 10 == 0:
+                print(f"   Bloco {done}/{len(blocks)} ({time.time() - start_time:.1f}s)")
+
+    if verbose:
+        elapsed = time.time() - start_time
+        n_meters = len(present)
+        print(f"   ✅ LATC tensorial: {elapsed:.1f}s ({n_meters / max(elapsed, 1e-9):.1f} meters/s, "
+              f"{len(blocks)} blocos, {total_iterations / max(len(blocks), 1):.1f} iterações/bloco)")
+
+    return imputed, known
@@ -0,0 +1,319 @@
+"""
+Batched low-rank completion for many small (days, 24) meter matrices
+With only 24 columns, a meter's rank-k SVD reconstruction is X V_k V_k^T,
+where V_k are the top-k eigenvectors of the 24 × 24 Gram matrix X^T X. Meters
+are stacked into (meters, days, 24) blocks (sorted by length, zero-padded -
+zero rows leave X^T X unchanged) and every refinement step runs for the whole
+block at once: one batched matmul for the Gram matrices, one batched eigh,
+one batched projection. No per-meter ARPACK (svds) calls.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _segment_starts(offsets, n_rows):
+    starts = np.zeros(n_rows, dtype=bool)
+    first_rows = np.asarray(offsets[:-1])
+    starts[first_rows[first_rows < n_rows]] = True
+    return starts
+
+
+def _rolling_nanmedian(matrix, window):
+    """
+    Centered rolling median along rows ignoring NaN (pandas
+    rolling(window, center=True, min_periods=1).median() along axis=1)
+    """
+    half = window // 2
+    padded = np.pad(matrix, ((0, 0), (half, half)), constant_values=np.nan)
+    windows = np.sort(sliding_window_view(padded, window, axis=1), axis=2)   # NaN sorted last
+    count = window - np.isnan(windows).sum(axis=2)
+    low = np.take_along_axis(windows, np.maximum((count - 1) // 2, 0)[..., None], axis=2)[..., 0]
+    high = np.take_along_axis(windows, (count // 2)[..., None], axis=2)[..., 0]
+    median = (low + high) / 2
+    median[count == 0] = np.nan
+    return median
+
+
+def clean_readings(values, offsets):
+    """
+    Vectorized, meter-aware version of the SVD pre-cleaning:
+    - zeros become missing (sensor errors in accumulated readings)
+    - spikes above 1.25 × the centered 5-hour rolling median (median > 10)
+    - drops versus the same hour of the previous day of the same meter
+      (ratio > 0.1, i.e. not a full reset)
+
+    Returns:
+        New (rows, 24) array with removed readings set to NaN
+    """
+    cleaned = np.array(values, dtype=float)
+    cleaned[cleaned == 0] = np.nan
+    if len(cleaned) == 0:
+        return cleaned
+
+    # Anti-spike: centered rolling median over hours (min_periods=1)
+    median = _rolling_nanmedian(cleaned, 5)
+    is_spike = (cleaned > median * 1.25) & (median > 10)
+    cleaned[is_spike] = np.nan
+
+    # Drops between consecutive days (never across meters)
+    prev_values = np.vstack([cleaned[0:1], cleaned[:-1]])
+    valid = ~np.isnan(cleaned)
+    prev_valid = np.vstack([np.zeros((1, cleaned.shape[1]), dtype=bool), valid[:-1]])
+    prev_valid[_segment_starts(offsets, len(cleaned))] = False
+    ratios = np.divide(cleaned, prev_values, out=np.ones_like(cleaned), where=prev_values > 0)
+    invalid_drops = valid & prev_valid & (cleaned - prev_values < 0) & (ratios > 0.1)
+    cleaned[invalid_drops] = np.nan
+    return cleaned
+
+
+def meter_ranks(offsets, n_cols, n_components):
+    """Rank per meter as in the svds path: min(n_components, min(days, 24) - 1)"""
+    lengths = np.diff(offsets)
+    return np.minimum(n_components, np.minimum(lengths, n_cols) - 1)
+
+
+def length_sorted_blocks(offsets, meters_per_block):
+    """Meter index blocks of similar row counts (keeps zero padding small)"""
+    order = np.argsort(np.diff(offsets), kind='stable')
+    return [order[i:i + meters_per_block] for i in range(0, len(order), meters_per_block)]
+
+
+def stack_block(values, offsets, meters):
+    """
+    Gather meters into a zero-padded (len(meters), max_days, cols) block.
+
+    Returns:
+        (block, row_index, row_valid): `row_index[b, d]` is the source row of
+        block[b, d] where `row_valid[b, d]` is True
+    """
+    starts = np.asarray(offsets[meters])
+    lengths = np.asarray(offsets[meters + 1]) - starts
+    n_days = int(lengths.max()) if len(meters) else 0
+    row_valid = np.arange(n_days) < lengths[:, None]
+    row_index = starts[:, None] + np.arange(n_days)
+    block = np.zeros((len(meters), n_days, values.shape[1]))
+    block[row_valid] = values[row_index[row_valid]]
+    return block, row_index, row_valid
+
+
+def top_k_projectors(block, ranks):
+    """
+    Batched rank-k projectors V_k V_k^T from the Gram matrices of a block.
+
+    Args:
+        block: (meters, days, cols) stacked matrices
+        ranks: (meters,) number of components per meter
+
+    Returns:
+        (meters, cols, cols) projectors
+    """
+    gram = np.matmul(np.swapaxes(block, 1, 2), block)
+    _, vectors = np.linalg.eigh(gram)                   # eigenvalues ascending
+    n_cols = block.shape[2]
+    keep = np.arange(n_cols) >= (n_cols - ranks[:, None])
+    vectors = vectors * keep[:, None, :]
+    return np.matmul(vectors, np.swapaxes(vectors, 1, 2))
+
+
+def complete_block(block, missing, ranks, max_iterations=3, tolerance=1e-4):
+    """
+    Iterative rank-k refinement of the missing entries for a whole block.
+
+    Each meter stops when its relative change falls below `tolerance`
+    (checked from the second iteration on, like the per-meter loop).
+
+    Returns:
+        (block, iterations): refined block and iterations run per meter
+    """
+    active = ranks >= 1
+    iterations = np.zeros(len(block), dtype=int)
+    prev = None
+    for iteration in range(max_iterations):
+        if not active.any():
+            break
+        projectors = top_k_projectors(block[active], ranks[active])
+        reconstructed = np.matmul(block[active], projectors)
+        sub = block[active]
+        update = missing[active]
+        sub[update] = reconstructed[update]
+        block[active] = sub
+        iterations[active] += 1
+
+        if iteration > 0:
+            change = np.linalg.norm((block - prev).reshape(len(block), -1), axis=1)
+            scale = np.linalg.norm(block.reshape(len(block), -1), axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                converged = change / scale < tolerance
+            active &= ~converged
+        prev = block.copy()
+    return block, iterations
+
+
+def _row_blocks(n_rows, block_rows):
+    for start in range(0, n_rows, block_rows):
+        yield start, min(start + block_rows, n_rows)
+
+
+def gram_matrix(matrix, block_rows=100_000):
+    """X^T X accumulated over row blocks"""
+    gram = np.zeros((matrix.shape[1], matrix.shape[1]))
+    for start, stop in _row_blocks(len(matrix), block_rows):
+        block = matrix[start:stop]
+        gram += block.T @ block
+    return gram
+
+
+def ritz_factors(gram, basis, rank):
+    """
+    Rank-k right singular vectors and values from the Gram matrix restricted
+    to the column subspace spanned by the orthonormal `basis` (Rayleigh-Ritz).
+
+    Returns:
+        (V_k, s): (cols, rank) right factors and (rank,) singular values, descending
+    """
+    values, vectors = np.linalg.eigh(basis.T @ gram @ basis)
+    top = vectors[:, ::-1][:, :rank]
+    s = np.sqrt(np.maximum(values[::-1][:rank], 0))
+    return basis @ top, s
+
+
+def top_right_factors(matrix, basis, rank, block_rows=100_000):
+    """
+    Same as ritz_factors for wide matrices, without forming X^T X: the small
+    l × l Gram of matrix @ basis is accumulated over row blocks.
+    """
+    gram = np.zeros((basis.shape[1], basis.shape[1]))
+    for start, stop in _row_blocks(len(matrix), block_rows):
+        projected = matrix[start:stop] @ basis
+        gram += projected.T @ projected
+    values, vectors = np.linalg.eigh(gram)
+    top = vectors[:, ::-1][:, :rank]
+    s = np.sqrt(np.maximum(values[::-1][:rank], 0))
+    return basis @ top, s
+
+
+def subspace_step(matrix, basis, block_rows=100_000):
+    """One block power step on the column space: orth(X^T X V), accumulated over row blocks"""
+    z = np.zeros_like(basis)
+    for start, stop in _row_blocks(len(matrix), block_rows):
+        block = matrix[start:stop]
+        z += block.T @ (block @ basis)
+    q, _ = np.linalg.qr(z)
+    return q
+
+
+def randomized_svd(matrix, rank, oversampling=10, power_iterations=2, block_rows=100_000,
+                   start=None, random_state=0):
+    """
+    Randomized range-finder SVD (right factors), streamed over row blocks.
+
+    The column space is sketched with rank + oversampling random directions
+    (the first columns replaced by `start`, e.g. the previous factors, when
+    given), sharpened with `power_iterations` block power steps and reduced
+    by Rayleigh-Ritz. Only cols × (rank + oversampling) matrices are kept;
+    no rows × rank factor is ever materialized.
+
+    Returns:
+        (V_k, s): (cols, rank) right factors and (rank,) singular values, descending
+    """
+    n_cols = matrix.shape[1]
+    width = min(rank + oversampling, n_cols)
+    sketch = np.random.default_rng(random_state).standard_normal((n_cols, width))
+    if start is not None:
+        sketch[:, :start.shape[1]] = start[:, :width]
+    basis = subspace_step(matrix, sketch, block_rows)
+    for _ in range(power_iterations):
+        basis = subspace_step(matrix, basis, block_rows)
+    return top_right_factors(matrix, basis, rank, block_rows)
+
+
+def soft_impute(filled, missing, rank, max_iterations=10, tolerance=1e-4, shrinkage=0.0,
+                factorization='auto', oversampling=10, power_iterations=2, block_rows=100_000,
+                verbose=False):
+    """
+    Iterative low-rank completion.
+
+    Each iteration computes the rank-k right factors of the current matrix,
+    then rewrites only the missing entries from the rank-k reconstruction
+    X V_k diag(w) V_k^T, evaluated at those entries only - the dense
+    reconstruction is never formed. `shrinkage`
+    soft-thresholds the singular values (w = max(s - shrinkage, 0) / s);
+    0 gives the hard rank-k update of the svds loop.
+
+    Convergence is ||ΔX|| / ||X||, computed from the changed entries and a
+    running norm of the known ones, and reported every iteration.
+
+    Factors come from an exact eigendecomposition of the cols × cols Gram
+    matrix ('gram', one pass over the rows per iteration - the same factors
+    as a dense SVD) or from the row-blocked randomized range finder
+    ('randomized', bounded memory for any width, warm-started from the
+    previous factors after the first iteration). 'auto' picks 'gram' up to
+    512 columns.
+
+    Args:
+        filled: (rows, cols) matrix with an initial fill (no NaN)
+        missing: (rows, cols) bool, True where entries are to be refined
+        rank: Number of components (>= 1)
+        max_iterations: Maximum refinement iterations
+        tolerance: Stop when the relative change falls below this (from the 2nd iteration)
+        shrinkage: Singular value soft-threshold
+        factorization: 'auto', 'gram' or 'randomized'
+        oversampling: Extra sketch directions (randomized)
+        power_iterations: Power steps of the first randomized sketch
+            (later iterations are warm-started from the previous factors)
+        block_rows: Rows processed per block
+        verbose: Print convergence per iteration
+
+    Returns:
+        (completed matrix, list of per-iteration convergence values)
+    """
+    matrix = np.array(filled, dtype=float)
+    n_rows, n_cols = matrix.shape
+    flat = np.flatnonzero(missing)                        # row-major order
+    rows, cols = np.divmod(flat, n_cols)
+    values = matrix.ravel()
+    known_sq = float(np.sum(matrix ** 2) - np.sum(values[flat] ** 2))
+
+    if factorization == 'auto':
+        factorization = 'gram' if n_cols <= 512 else 'randomized'
+    factors = None
+
+    history = []
+    for iteration in range(max_iterations):
+        # 'gram': exact eigh of the cols × cols Gram every iteration (cheap
+        # next to the pass over the rows). 'randomized': warm start - refine
+        # the previous factors instead of a fresh full sketch
+        if factorization == 'gram':
+            factors, s = ritz_factors(gram_matrix(matrix, block_rows), np.eye(n_cols), rank)
+        else:
+            factors, s = randomized_svd(matrix, rank, oversampling,
+                                        power_iterations if factors is None else 0,
+                                        block_rows, start=factors)
+        weights = np.divide(np.maximum(s - shrinkage, 0), s, out=np.zeros_like(s), where=s > 0)
+
+        # Reconstruct at the missing entries only, block by block
+        new_values = np.empty(len(rows))
+        for start, stop in _row_blocks(n_rows, block_rows):
+            lo, hi = np.searchsorted(rows, [start, stop])
+            if lo == hi:
+                continue
+            scores = (matrix[start:stop] @ factors) * weights
+            if (stop - start) * n_cols <= 2 * (hi - lo) * rank:
+                # Dense gaps in a narrow block: one BLAS product beats gathering factor rows
+                new_values[lo:hi] = (scores @ factors.T).ravel()[flat[lo:hi] - start * n_cols]
+            else:
+                new_values[lo:hi] = np.einsum('ij,ij->i', scores[rows[lo:hi] - start], factors[cols[lo:hi]])
+
+        change = np.linalg.norm(new_values - values[flat])
+        values[flat] = new_values
+        scale = np.sqrt(known_sq + np.sum(new_values ** 2))
+        convergence = change / scale if scale > 0 else 0.0
+        history.append(convergence)
+
+        if verbose:
+            print(f"   Iteração {iteration+1}/{max_iterations}: convergência = {convergence:.6f}")
+        if iteration > 0 and convergence < tolerance:
+            break
+
+    return matrix, history
@@ -0,0 +1,201 @@
+"""
+Cost-balanced scheduling of meters across workers
+Meters range from a few days to a full year of readings, so equal-count
+chunks leave a few workers straggling on the long meters while the other
+cores sit idle. Each meter's cost is estimated from its row count and missing
+count, meters are packed longest-first into batches of roughly equal cost,
+and the batches are handed out one at a time (imap_unordered / submit with
+chunksize 1): a worker that finishes early takes the next remaining batch,
+so the run ends with small batches instead of one long meter.
+
+Tasks are generated lazily and only a bounded number is in flight
+(bounded_pool_imap / isolated_executor_map), so the per-meter copies handed
+to workers never add up to a second copy of the dataset.
+
+Failures are isolated per task (guarded / isolated_executor_map): a meter that
+raises is retried a bounded number of times and then reported with its error,
+a meter that runs past a time limit is abandoned, and the rest of the run
+carries on - the caller keeps such meters on a quarantine list and fills
+them with the cheap gap-fill kernel instead.
+"""
+
+import numpy as np
+
+
+def meter_costs(offsets, missing=None, n_cols=24, missing_weight=1.0):
+    """
+    Estimated cost of each meter (in value slots).
+
+    Args:
+        offsets: Meter boundaries (n_meters + 1,) in rows
+        missing: Optional missing values per meter (n_meters,)
+        n_cols: Values per row
+        missing_weight: Extra cost of a missing value relative to a present one
+
+    Returns:
+        (n_meters,) float array
+    """
+    costs = np.diff(np.asarray(offsets, dtype=np.int64)) * float(n_cols)
+    if missing is not None:
+        costs = costs + missing_weight * np.asarray(missing, dtype=float)
+    return costs
+
+
+def missing_per_meter(values, offsets, order=None):
+    """
+    Missing values per meter of a (rows, cols) matrix grouped by meter
+    (`order`: optional row order that groups it, see group_rows_by_meter)
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    row_missing = np.isnan(values).sum(axis=1)
+    if order is not None:
+        row_missing = row_missing[order]
+    cumulative = np.concatenate([[0], np.cumsum(row_missing)])
+    return cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+
+
+def cost_balanced_batches(costs, n_workers, batches_per_worker=4):
+    """
+    Pack meters longest-first into batches of about equal cost.
+
+    Meters are taken in decreasing cost and appended to the current batch
+    until it reaches total / (n_workers × batches_per_worker); a meter larger
+    than that target gets a batch of its own. Batches are returned in
+    decreasing cost, the order they should be submitted in.
+
+    Args:
+        costs: (n_meters,) estimated cost per meter
+        n_workers: Parallel workers
+        batches_per_worker: Batches per worker (more = finer stealing at the end)
+
+    Returns:
+        List of meter index arrays (each sorted ascending)
+    """
+    costs = np.asarray(costs, dtype=float)
+    if len(costs) == 0:
+        return []
+    order = np.argsort(-costs, kind='stable')
+    n_batches = max(1, min(len(costs), n_workers * batches_per_worker))
+    target = costs.sum() / n_batches
+
+    # Batch boundaries where the running cost crosses a multiple of the target
+    # (vectorized greedy: a new batch starts once the current one is full)
+    running = np.cumsum(costs[order])
+    batch_id = np.floor((running - costs[order]) / max(target, 1e-12) + 1e-9).astype(np.int64)
+    batch_id = np.concatenate([[0], np.cumsum(np.diff(batch_id) > 0)])
+    bounds = np.flatnonzero(np.diff(batch_id)) + 1
+    batches = np.split(order, bounds)
+
+    batch_costs = np.array([costs[batch].sum() for batch in batches])
+    return [np.sort(batches[i]) for i in np.argsort(-batch_costs, kind='stable')]
+
+
+def guarded(func, task, retries=1):
+    """
+    func(task) with its exceptions captured, retried up to `retries` times.
+
+    Returns:
+        (result, None) on success, (None, error message) after the last attempt
+    """
+    error = None
+    for attempt in range(retries + 1):
+        try:
+            return func(task), None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    return None, error
+
+
+def bounded_pool_imap(pool, func, tasks, max_in_flight):
+    """
+    Lazy Pool.imap_unordered: tasks are pulled from the iterable only while
+    fewer than `max_in_flight` are pending (Pool.imap would consume the whole
+    iterable up front). Results are yielded in completion order, so one long
+    task does not hold back the results (and the next submissions) behind it.
+    A task that raises re-raises its exception here.
+    """
+    import queue
+
+    finished = queue.SimpleQueue()
+    tasks = iter(tasks)
+    in_flight = 0
+
+    def submit_more():
+        nonlocal in_flight
+        while in_flight < max_in_flight:
+            task = next(tasks, None)
+            if task is None:
+                return
+            pool.apply_async(func, (task,), callback=lambda result: finished.put((True, result)),
+                             error_callback=lambda error: finished.put((False, error)))
+            in_flight += 1
+
+    submit_more()
+    while in_flight:
+        ok, value = finished.get()
+        in_flight -= 1
+        if not ok:
+            raise value
+        yield value
+        submit_more()
+
+
+def isolated_executor_map(executor, func, tasks, max_in_flight, retries=1, timeout=None):
+    """
+    Lazy executor.map for concurrent.futures executors with per-task fault
+    isolation: at most `max_in_flight` tasks submitted and not yet finished;
+    the next task is generated when one finishes.
+
+    Tasks are tuples whose first item is the task key (e.g. meter position).
+    A task that raises is retried `retries` times (guarded); a task still
+    running `timeout` seconds after it started is abandoned - a thread cannot
+    be interrupted, so it keeps its worker until it returns, counts against
+    `max_in_flight` until then, and its late result is discarded.
+
+    Yields:
+        (key, result, error) in completion order; error is None on success,
+        otherwise the message of the last failure or the timeout
+    """
+    import time
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    started = {}
+
+    def run(task):
+        started[task[0]] = time.monotonic()
+        return guarded(func, task, retries)
+
+    tasks = iter(tasks)
+    pending = {}
+    abandoned = set()
+    exhausted = False
+
+    def submit_more():
+        nonlocal exhausted
+        while not exhausted and len(pending) + len(abandoned) < max_in_flight:
+            task = next(tasks, None)
+            if task is None:
+                exhausted = True
+                return
+            pending[executor.submit(run, task)] = task[0]
+
+    submit_more()
+    # Abandoned tasks are only waited for while they hold back new submissions
+    while pending or (abandoned and not exhausted):
+        poll = None if timeout is None else min(timeout, 1.0)
+        done, _ = wait(set(pending) | abandoned, timeout=poll, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in abandoned:
+                abandoned.discard(future)
+                continue
+            key = pending.pop(future)
+            result, error = future.result()
+            yield key, result, error
+        if timeout is not None:
+            now = time.monotonic()
+            for future, key in list(pending.items()):
+                if key in started and now - started[key] > timeout:
+                    del pending[future]
+                    abandoned.add(future)
+                    yield key, None, f"timeout ({timeout:g}s)"
+        submit_more()
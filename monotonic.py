@@ -0,0 +1,131 @@
+"""
+Monotonic projection for cumulative meter readings
+Vectorized replacement for the per-value loop used by every engine:
+
+    if values[j] < values[j - 1]:
+        values[j] = values[j - 1]
+
+i.e. a running maximum. As in the loop, a NaN is left untouched and restarts
+the running maximum after it (NaN never compares smaller). Two forms:
+- within each row (hours of one day)
+- along each meter's flattened series (days × hours), meters given as
+  contiguous row segments
+"""
+
+import numpy as np
+import pandas as pd
+
+from shared_matrix import group_rows_by_meter
+
+
+def _sweep_columns(matrix):
+    """Column-by-column running max over all rows at once (exact loop semantics, NaN-safe)"""
+    for j in range(1, matrix.shape[1]):
+        drop = matrix[:, j] < matrix[:, j - 1]
+        matrix[drop, j] = matrix[drop, j - 1]
+
+
+def enforce_monotonic_rows(matrix):
+    """
+    Make every row non-decreasing.
+
+    Args:
+        matrix: (rows, hours) array (a 1-D array is treated as one row)
+
+    Returns:
+        New float array with the same shape
+    """
+    result = np.array(matrix, dtype=float)
+    if result.size == 0:
+        return result
+    rows = result.reshape(-1, result.shape[-1]) if result.ndim > 1 else result.reshape(1, -1)
+
+    has_nan = np.isnan(rows).any(axis=1)
+    if not has_nan.any():
+        np.maximum.accumulate(rows, axis=1, out=rows)
+    else:
+        clean = ~has_nan
+        rows[clean] = np.maximum.accumulate(rows[clean], axis=1)
+        nan_rows = rows[has_nan]
+        _sweep_columns(nan_rows)
+        rows[has_nan] = nan_rows
+    return result
+
+
+def enforce_monotonic_segments(matrix, offsets=None):
+    """
+    Make each meter's flattened series (row after row) non-decreasing.
+
+    Args:
+        matrix: (rows, hours) array; rows of each meter contiguous and in date order
+        offsets: Meter boundaries (n_meters + 1,); meter m is rows
+            offsets[m]:offsets[m + 1]. None = a single meter
+
+    Returns:
+        New float array with the same shape
+    """
+    result = np.array(matrix, dtype=float)
+    n_rows = len(result)
+    if result.size == 0:
+        return result
+    if offsets is None:
+        offsets = np.array([0, n_rows])
+    offsets = np.asarray(offsets, dtype=np.int64)
+    segment = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    if not np.isnan(result).any():
+        # Running max inside each row, then carry the max of the meter's
+        # previous rows into the row (segmented cummax of row maxima)
+        np.maximum.accumulate(result, axis=1, out=result)
+        running = pd.Series(result[:, -1]).groupby(segment).cummax().values
+        carry = np.full(n_rows, -np.inf)
+        carry[1:] = running[:-1]
+        carry[offsets[:-1][offsets[:-1] < n_rows]] = -np.inf
+        np.maximum(result, carry[:, None], out=result)
+        return result
+
+    # With NaN: a run restarts at each meter start and right after each NaN
+    flat = result.ravel()
+    restart = np.zeros(len(flat), dtype=bool)
+    restart[offsets[:-1][offsets[:-1] < n_rows] * result.shape[1]] = True
+    restart[1:] |= np.isnan(flat[:-1])
+    run = np.cumsum(restart)
+    flat[:] = pd.Series(flat).groupby(run).cummax().values
+    return result
+
+
+def meter_date_order(ids, dates=None):
+    """
+    Row order that makes each meter contiguous and date-sorted.
+
+    Args:
+        ids: Meter id per row
+        dates: Optional date per row (sortable, e.g. 'YYYY-MM-DD' strings)
+
+    Returns:
+        (order, offsets): `order[k]` is the row placed at position k; meter m
+        occupies positions offsets[m]:offsets[m + 1] (meters in first-appearance order)
+    """
+    if dates is None:
+        return group_rows_by_meter(ids)
+    codes, uniques = pd.factorize(np.asarray(ids), sort=False)
+    day_codes = pd.factorize(np.asarray(dates), sort=True)[0]
+    order = np.lexsort((day_codes, codes))
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))])
+    return order, offsets
+
+
+def enforce_monotonic_frame(df, value_columns, id_column='id', date_column='data'):
+    """
+    Per-meter global monotonicity on a long (id, data, index_*) frame, in one
+    segmented pass over the (id, date)-sorted values.
+
+    Returns:
+        Corrected (rows, hours) array in the frame's own row order
+    """
+    dates = df[date_column].values if date_column in df.columns else None
+    order, offsets = meter_date_order(df[id_column].values, dates)
+    values = df[value_columns].values.astype(float)
+    corrected = np.empty_like(values)
+    corrected[order] = enforce_monotonic_segments(values[order], offsets)
+    return corrected
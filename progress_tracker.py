@@ -22,7 +22,7 @@ class ProgressTracker:
             self.progress_file = Path("data/progress.json")
             
         self.progress_file.parent.mkdir(exist_ok=True)
-        self._update()
+        self._write_progress("Iniciando...")
     
     def update(self, step_name, increment=1):
         """Update progress with step name"""
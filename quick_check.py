@@ -1,11 +1,12 @@
-import pandas as pd
 import numpy as np
 
+from columnar_store import load_telemetry
+
 # Quick check
 meter = "C15FA157523"
 
 print("Checando arquivo SUAVIZADO...")
-df = pd.read_csv("c:/Users/Utilizador/Downloads/LATC/data/RESULTADO_FINAL_SUAVIZADO.csv")
+df = load_telemetry("c:/Users/Utilizador/Downloads/LATC/data/RESULTADO_FINAL_SUAVIZADO.csv")
 cols = [c for c in df.columns if c.startswith('index_')]
 
 mask = df['id'].astype(str) == meter
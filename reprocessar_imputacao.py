@@ -40,7 +40,7 @@ if resposta.lower() == 's':
     
     if result.returncode == 0:
         print("\n✅ Imputação concluída com sucesso!")
-        print("Arquivo atualizado: data/imputed_consumption_full.csv")
+        print("Arquivo atualizado: data/imputed_consumption_full.parquet")
     else:
         print("\n❌ Erro durante a execução")
 else:
@@ -0,0 +1,220 @@
+"""
+Checkpoint / resume of long imputation runs
+A run is split into shards of whole meters; each shard's imputed values are
+written to the run directory as soon as they are ready and recorded in its
+manifest. The directory is keyed by the input file's fingerprint and the run
+parameters, so a restart with the same input and parameters finds the
+finished shards, skips them and imputes only what is left. Opening a run
+removes the other runs of the same input (another input version or other
+parameters), so at most one run directory is kept per input file.
+
+Run layout (data/<arquivo>_runs/<chave>/):
+    manifest.json    fingerprint, parameters and completed shards
+    shard_00000.npy  float64 (rows, 24) - imputed values of the shard's rows
+
+Shard files and the manifest are replaced atomically, so a run killed at any
+point leaves at most one unfinished shard, which is simply redone.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from columnar_store import logical_fingerprint
+from shared_matrix import group_rows_by_meter
+
+
+MANIFEST_VERSION = 1
+
+
+def default_runs_dir(data_file):
+    """data/telemetria.csv -> data/telemetria_runs/"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.stem + '_runs')
+
+
+def run_key(fingerprint, params):
+    """Short hash identifying (input, parameters)"""
+    blob = json.dumps({'fingerprint': fingerprint, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:12]
+
+
+class RunCheckpoint:
+    """
+    Completed shards of one run.
+
+    Args:
+        run_dir: Run directory (created if missing)
+        fingerprint: Input identity (columnar_store.logical_fingerprint)
+        params: JSON-serializable run parameters
+        verbose: Print resume information
+    """
+
+    def __init__(self, run_dir, fingerprint, params, verbose=True):
+        self.run_dir = Path(run_dir)
+        self.manifest = {
+            'version': MANIFEST_VERSION,
+            'fingerprint': fingerprint,
+            'params': json.loads(json.dumps(params, default=str)),
+            'shards': {},
+        }
+        existing = self._read_manifest()
+        if existing is not None and all(existing.get(k) == self.manifest[k]
+                                        for k in ('version', 'fingerprint', 'params')):
+            self.manifest['shards'] = existing.get('shards', {})
+            if verbose and self.manifest['shards']:
+                print(f"♻️  Retomando execução: {len(self.manifest['shards'])} shards já concluídos ({self.run_dir})")
+        elif existing is not None:
+            # Another manifest version: start over
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def manifest_path(self):
+        return self.run_dir / 'manifest.json'
+
+    def _read_manifest(self):
+        if not self.manifest_path.exists():
+            return None
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self):
+        tmp_path = self.manifest_path.with_name('manifest.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _shard_path(self, shard):
+        return self.run_dir / f'shard_{shard:05d}.npy'
+
+    def completed(self, shard, n_rows=None):
+        """True if `shard` is recorded (with `n_rows` rows, when given) and its file exists"""
+        info = self.manifest['shards'].get(str(shard))
+        if info is None or not self._shard_path(shard).exists():
+            return False
+        return n_rows is None or info['rows'] == n_rows
+
+    def load(self, shard):
+        """Imputed values of a completed shard, and its recorded info"""
+        return np.load(self._shard_path(shard)), self.manifest['shards'][str(shard)]
+
+    def save(self, shard, values, **info):
+        """Persist a shard's imputed values, then record it in the manifest"""
+        path = self._shard_path(shard)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.asarray(values, dtype=float))
+        os.replace(tmp_path, path)
+        self.manifest['shards'][str(shard)] = {'rows': int(len(values)), **info}
+        self._write_manifest()
+
+    def clear(self):
+        """Remove the run directory (after the final output is written)"""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        try:
+            self.run_dir.parent.rmdir()   # runs dir, once no run is left
+        except OSError:
+            pass
+
+
+def open_run_checkpoint(data_file, params, runs_dir=None, verbose=True):
+    """
+    Checkpoint of the run of `params` over `data_file` (resumed if a previous
+    run with the same input and parameters left completed shards).
+
+    The input is identified by the file given (the CSV, not the columnar store
+    created from it on first read), so the key is the same before and after
+    the conversion. Runs left by another version of the input or by other
+    parameters are removed.
+    """
+    fingerprint = logical_fingerprint(data_file)
+    runs_dir = Path(runs_dir) if runs_dir else default_runs_dir(data_file)
+    run_dir = runs_dir / run_key(fingerprint, params)
+    if runs_dir.is_dir():
+        for stale in runs_dir.iterdir():
+            if stale.is_dir() and stale != run_dir:
+                if verbose:
+                    print(f"🗑️  Removendo execução anterior (outra entrada/parâmetros): {stale}")
+                shutil.rmtree(stale, ignore_errors=True)
+    return RunCheckpoint(run_dir, fingerprint, params, verbose=verbose)
+
+
+def _merge_attrs(total, part):
+    """Accumulate engine attrs of one shard (counts and timings summed, the rest updated)"""
+    for key, value in part.items():
+        if isinstance(value, dict):
+            _merge_attrs(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and isinstance(total.get(key), (int, float)):
+            total[key] += value
+        else:
+            total[key] = value
+    return total
+
+
+def checkpointed_imputation(df, value_columns, impute, checkpoint, meters_per_shard=5000,
+                            progress_callback=None, verbose=True):
+    """
+    Run a per-meter engine shard by shard, persisting each shard.
+
+    Shards are consecutive groups of `meters_per_shard` meters (first-appearance
+    order); `impute(shard_df, progress_callback)` must return the shard's rows
+    in their input order, as the engines do. Completed shards are read back
+    instead of recomputed. Per-meter engines give the same values whatever the
+    shard boundaries, so a resumed run matches an uninterrupted one.
+
+    Args:
+        df: Input DataFrame ('id' column)
+        value_columns: Value columns (index_0..index_23)
+        impute: Callable (shard_df, progress_callback) -> imputed shard_df
+        checkpoint: RunCheckpoint
+        meters_per_shard: Meters per shard
+        progress_callback: Optional callback(pct, msg) for the whole run
+
+    Returns:
+        DataFrame with the imputed values (same rows and row order as `df`);
+        the engine's attrs (quarantine, routing) of every shard, merged
+    """
+    order, offsets = group_rows_by_meter(df['id'].values)
+    n_meters = len(offsets) - 1
+    n_shards = max(1, -(-n_meters // meters_per_shard))
+    result_values = df[value_columns].values.astype(float)
+    attrs = {}
+
+    for shard in range(n_shards):
+        first = offsets[min(shard * meters_per_shard, n_meters)]
+        last = offsets[min((shard + 1) * meters_per_shard, n_meters)]
+        rows = np.sort(order[first:last])
+
+        def shard_progress(pct, msg, shard=shard):
+            if progress_callback:
+                progress_callback(int((100 * shard + pct) / n_shards), f"[{shard + 1}/{n_shards}] {msg}")
+
+        if checkpoint.completed(shard, len(rows)):
+            values, info = checkpoint.load(shard)
+            _merge_attrs(attrs, info.get('attrs', {}))
+            if verbose:
+                print(f"   ✓ Shard {shard + 1}/{n_shards} já concluído ({len(rows):,} linhas)")
+        else:
+            imputed = impute(df.iloc[rows], shard_progress)
+            values = imputed[value_columns].values.astype(float)
+            # attrs kept in the manifest (JSON: meter ids as strings)
+            shard_attrs = json.loads(json.dumps(imputed.attrs, default=str))
+            _merge_attrs(attrs, shard_attrs)
+            checkpoint.save(shard, values, attrs=shard_attrs)
+            if verbose:
+                print(f"   💾 Shard {shard + 1}/{n_shards} salvo ({len(rows):,} linhas)")
+        result_values[rows] = values
+        shard_progress(100, "Shard concluído")
+
+    result_df = df.copy()
+    result_df[value_columns] = result_values
+    result_df.attrs.update(attrs)
+    return result_df
@@ -10,6 +10,7 @@ import seaborn as sns
 from matplotlib.gridspec import GridSpec
 from datetime import datetime, timedelta
 from progress_tracker import ProgressTracker
+from columnar_store import iter_telemetry_chunks, telemetry_exists
 
 # Configuração
 sns.set_style("whitegrid")
@@ -29,7 +30,7 @@ else:
 
 imputed_file = "data/imputed_consumption_full.csv"
 
-if not os.path.exists(original_file):
+if not telemetry_exists(original_file):
     print(f"Erro: Arquivo original não encontrado: {original_file}")
     sys.exit(1)
 
@@ -51,12 +52,13 @@ def get_data_arrays(original_file, imputed_file="data/imputed_consumption_full.c
     from datetime import timedelta
     
     value_cols = [f'index_{i}' for i in range(24)]
+    read_cols = ['data'] + value_cols
     
     # 1. Carregar Original
     dados_horarios_orig = {}
     chunk_size = 100000
     
-    for chunk in pd.read_csv(original_file, chunksize=chunk_size):
+    for chunk in iter_telemetry_chunks(original_file, chunk_size, columns=read_cols):
         for data in chunk['data'].unique():
             if data not in dados_horarios_orig:
                 dados_horarios_orig[data] = np.zeros(23)
@@ -70,7 +72,7 @@ def get_data_arrays(original_file, imputed_file="data/imputed_consumption_full.c
 
     # 2. Carregar Imputado
     dados_horarios_imp = {}
-    for chunk in pd.read_csv(imputed_file, chunksize=chunk_size):
+    for chunk in iter_telemetry_chunks(imputed_file, chunk_size, columns=read_cols):
         for data in chunk['data'].unique():
             if data not in dados_horarios_imp:
                 dados_horarios_imp[data] = np.zeros(23)
@@ -241,7 +243,7 @@ if __name__ == "__main__":
         
     imputed_file = "data/imputed_consumption_full.csv"
     
-    if not os.path.exists(original_file):
+    if not telemetry_exists(original_file):
         print(f"Erro: Arquivo não encontrado: {original_file}")
         sys.exit(1)
 
@@ -0,0 +1,110 @@
+"""
+Shared-memory work distribution for the multiprocessing engines
+The value matrix (rows grouped by meter), the meter offsets and the output
+buffer are placed once in multiprocessing.shared_memory. Workers attach to
+them in their initializer, receive only arrays of meter positions (see
+meter_scheduler.cost_balanced_batches), read their rows zero-copy and write
+results in place - no per-meter DataFrame pickling, no temp files, no
+per-worker re-parse of the input.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+# Views attached in each worker process (filled by attach_worker)
+_WORKER_SHARED = {}
+
+
+def group_rows_by_meter(ids):
+    """
+    Order rows so each meter is contiguous (meters in first-appearance order,
+    rows of a meter in their original order).
+
+    Returns:
+        (order, offsets): `order[k]` is the input row placed at position k;
+        meter m occupies positions offsets[m]:offsets[m + 1]
+    """
+    codes, uniques = pd.factorize(np.asarray(ids), sort=False)
+    order = np.argsort(codes, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))])
+    return order, offsets
+
+
+def _create(array):
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+class SharedMeterMatrix:
+    """
+    Owner (parent process) of the shared blocks for one run.
+
+    Use as a context manager; blocks are unlinked on exit.
+    """
+
+    def __init__(self, values, offsets):
+        values = np.asarray(values, dtype=np.float64)
+        self._blocks = {}
+        self.specs = {}
+        for key, array in (('values', values),
+                           ('offsets', np.asarray(offsets, dtype=np.int64)),
+                           ('out', np.zeros_like(values))):
+            shm, spec = _create(array)
+            self._blocks[key] = shm
+            self.specs[key] = spec
+        self.n_meters = len(offsets) - 1
+
+    def view(self, key):
+        _, shape, dtype = self.specs[key]
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._blocks[key].buf)
+
+    def result(self):
+        """Copy of the output buffer (safe to use after close())"""
+        return self.view('out').copy()
+
+    def close(self):
+        for shm in self._blocks.values():
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def attach_worker(specs):
+    """Pool initializer: attach the shared blocks once per worker process"""
+    for key, spec in specs.items():
+        _WORKER_SHARED[key] = _attach(spec)
+
+
+def detach_worker():
+    """Release the handles opened by attach_worker (in-process / sequential use)"""
+    while _WORKER_SHARED:
+        _, (shm, view) = _WORKER_SHARED.popitem()
+        del view
+        shm.close()
+
+
+def worker_views():
+    """(values, offsets, out) arrays inside a worker"""
+    return tuple(_WORKER_SHARED[key][1] for key in ('values', 'offsets', 'out'))
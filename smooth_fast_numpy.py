@@ -1,145 +1,438 @@
 """
 FAST NUMPY SMOOTHING that handles FULL TIME SERIES (Inter-day smoothing)
 Solves the "staircase" issue across day boundaries while remaining extremely fast.
+
+All meters are smoothed at once: each meter's rows are flattened into one
+continuous hourly series, and the centered moving average of every point is
+read from segmented cumulative sums (reset at meter boundaries) - two lookups
+per point whatever the window size. MovingAverageSmoother keeps those sums, so
+several windows can be tried without recomputing them.
 """
 
 import numpy as np
 import pandas as pd
 
-def smooth_time_series_numpy(df, value_columns, original_df, window_size=25, verbose=True):
+from gap_index import gap_runs
+from monotonic import enforce_monotonic_segments, meter_date_order
+
+
+def segment_prefix_sums(flat, flat_offsets):
     """
-    Apply smoothing to the FULL concatenated time series for each meter using fast generic numpy operations.
-    
-    This works by:
-    1. Flattening the 2D matrix (days x hours) into a 1D array (continuous time)
-    2. Applying correlation/convolution smoothing per meter
-    3. Reshaping back
-    
+    Cumulative sums of a flat series that restart at each segment start.
+
+    NaN values are skipped (they add nothing and are not counted). Each
+    segment is shifted by its smallest value before summing, which keeps the
+    sums small for cumulative readings.
+
     Args:
-        df: DataFrame with IMPUTED data (must check 'id' column)
+        flat: 1-D series, segments contiguous
+        flat_offsets: Segment boundaries (n_segments + 1,)
+
+    Returns:
+        (sums, counts, base): inclusive prefix sums and int32 prefix counts
+        of valid values inside each segment, and the (n_segments,) shifts
+    """
+    flat = np.asarray(flat, dtype=float)
+    flat_offsets = np.asarray(flat_offsets, dtype=np.int64)
+    lengths = np.diff(flat_offsets)
+    segment = np.repeat(np.arange(len(lengths)), lengths)
+
+    valid = ~np.isnan(flat)
+    starts = flat_offsets[:-1][lengths > 0]
+    base = np.zeros(len(lengths))
+    if len(starts):
+        base[lengths > 0] = np.fmin.reduceat(flat, starts)
+    base[np.isnan(base)] = 0.0
+
+    grouped = pd.DataFrame({'sums': np.where(valid, flat - base[segment], 0.0), 'counts': valid.astype(np.int32)})
+    prefix = grouped.groupby(segment).cumsum()
+    return prefix['sums'].values, prefix['counts'].values.astype(np.int32, copy=False), base
+
+
+def centered_mean(sums, counts, base, flat_offsets, window):
+    """
+    Centered moving average (pandas `rolling(window, center=True,
+    min_periods=1).mean()` per segment) from segment_prefix_sums output.
+
+    The window around point p spans p - window // 2 .. p + (window - 1) // 2,
+    clipped to the point's segment. Points whose window holds no valid value
+    are NaN.
+    """
+    flat_offsets = np.asarray(flat_offsets, dtype=np.int64)
+    lengths = np.diff(flat_offsets)
+    n = len(sums)
+    if n == 0:
+        return np.empty(0)
+    segment = np.repeat(np.arange(len(lengths)), lengths)
+    start = flat_offsets[:-1][segment]
+    end = flat_offsets[1:][segment]
+
+    position = np.arange(n)
+    lo = np.maximum(position - window // 2, start)
+    hi = np.minimum(position + (window - 1) // 2 + 1, end)
+
+    # Sum over [lo, hi) = S[hi - 1] - S[lo - 1], with S[start - 1] = 0
+    before = lo > start
+    window_sum = sums[hi - 1] - np.where(before, sums[lo - 1], 0.0)
+    window_count = counts[hi - 1] - np.where(before, counts[lo - 1], 0)
+    mean = np.divide(window_sum, window_count, out=np.full(n, np.nan), where=window_count > 0)
+    return mean + base[segment]
+
+
+def moving_average_segments(matrix, offsets, window):
+    """
+    Centered moving average of each meter's flattened (rows × hours) series.
+
+    Args:
+        matrix: (rows, hours) array; rows of each meter contiguous and in date order
+        offsets: Meter boundaries (n_meters + 1,)
+        window: Window size (points)
+
+    Returns:
+        (rows, hours) float array
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    n_cols = matrix.shape[1]
+    flat_offsets = np.asarray(offsets, dtype=np.int64) * n_cols
+    sums, counts, base = segment_prefix_sums(matrix.ravel(), flat_offsets)
+    return centered_mean(sums, counts, base, flat_offsets, window).reshape(matrix.shape)
+
+
+def whittaker_lambda(window_size):
+    """
+    Whittaker penalty whose half-power period is `window_size` points: the
+    2nd-order filter response is 1 / (1 + lambda * omega^4), so
+    lambda = (window_size / 2 pi)^4.
+    """
+    return (window_size / (2 * np.pi)) ** 4
+
+
+def whittaker_smooth(rows, lam, weights=None):
+    """
+    Whittaker smoother of many rows: z minimizes
+    sum w (y - z)^2 + lam * sum (second differences of z)^2 for each row.
+
+    Rows without missing weights share one pentadiagonal system, solved once
+    with a banded Cholesky for all of them; the others (NaN / zero weights)
+    are solved as a batch of small dense systems.
+
+    Args:
+        rows: (k, n) series (NaN allowed where the weight is 0)
+        lam: Smoothing penalty
+        weights: Optional (k, n) weights (bool or float); default: ~isnan(rows)
+
+    Returns:
+        (k, n) smoothed rows
+    """
+    from scipy.linalg import solveh_banded
+
+    rows = np.asarray(rows, dtype=float)
+    n = rows.shape[1]
+    weights = ~np.isnan(rows) if weights is None else np.asarray(weights)
+    weights = weights.astype(float)
+    values = np.where(weights > 0, rows, 0.0)
+    if n < 3:
+        return rows.copy()
+
+    diff = np.diff(np.eye(n), 2, axis=0)
+    penalty = lam * diff.T @ diff
+    result = np.empty_like(values)
+
+    full = (weights == 1).all(axis=1)
+    if full.any():
+        system = penalty + np.eye(n)
+        banded = np.zeros((3, n))
+        for d in range(3):
+            banded[2 - d, d:] = np.diagonal(system, d)
+        result[full] = solveh_banded(banded, values[full].T).T
+
+    partial = ~full
+    if partial.any():
+        w = weights[partial]
+        systems = penalty[None] + w[:, :, None] * np.eye(n)[None]
+        result[partial] = np.linalg.solve(systems, (w * values[partial])[:, :, None])[:, :, 0]
+    return result
+
+
+def _row_dates(df):
+    """Date per row for meter_date_order (None when df has no 'data' column)"""
+    if 'data' not in df.columns:
+        return None
+    return pd.to_datetime(df['data']).values
+
+
+class MovingAverageSmoother:
+    """
+    Prefix sums of every meter's flattened series, computed once.
+
+    Any window is then evaluated in O(1) per point, so several window sizes
+    can be previewed on one meter (meter_preview) before the chosen one is
+    applied to the whole dataset (smooth).
+
+    Args:
+        df: DataFrame with IMPUTED data ('id' column)
+        value_columns: List of column names (index_0..index_23)
+        original_df: DataFrame with ORIGINAL data (aligned with df)
+    """
+
+    def __init__(self, df, value_columns, original_df):
+        self.df = df
+        self.value_columns = list(value_columns)
+        # Kept in df's row order; the sorted order is applied where needed
+        self.imputed = df[self.value_columns].values.astype(float)
+        self.original = original_df[self.value_columns].values.astype(float)
+        self.n_cols = self.imputed.shape[1]
+
+        # Meters contiguous, rows of each meter in date order ('data' column;
+        # without it, in their order in df)
+        self.order, self.offsets = meter_date_order(df['id'].values, _row_dates(df))
+        self.meter_ids = pd.unique(df['id'].values)
+        self.flat_offsets = self.offsets * self.n_cols
+        self.sums, self.counts, self.base = segment_prefix_sums(self.imputed[self.order].ravel(), self.flat_offsets)
+        self._id_lookup = None
+
+    @property
+    def n_meters(self):
+        return len(self.offsets) - 1
+
+    def _meter_index(self, meter_id):
+        if self._id_lookup is None:
+            self._id_lookup = pd.Index(np.asarray(self.meter_ids).astype(str))
+        m = self._id_lookup.get_indexer([str(meter_id)])[0]
+        if m < 0:
+            raise KeyError(meter_id)
+        return m
+
+    def meter_preview(self, meter_id, windows):
+        """
+        Smoothed series of one meter for several windows.
+
+        Returns:
+            (imputed, previews): the meter's flattened imputed series and
+            {window: flattened smoothed series (originals kept)}
+        """
+        m = self._meter_index(meter_id)
+        lo, hi = self.flat_offsets[m], self.flat_offsets[m + 1]
+        local_offsets = np.array([0, hi - lo])
+        rows = self.order[self.offsets[m]:self.offsets[m + 1]]
+        imputed = self.imputed[rows].ravel()
+        original = self.original[rows].ravel()
+
+        previews = {}
+        for window in windows:
+            if hi - lo >= window:
+                averaged = centered_mean(self.sums[lo:hi], self.counts[lo:hi], self.base[m:m + 1],
+                                         local_offsets, window)
+                smoothed = enforce_monotonic_segments(averaged[None], [0, 1])[0]
+            else:
+                smoothed = imputed
+            previews[window] = np.where(np.isnan(original), smoothed, original)
+        return imputed, previews
+
+    def smooth(self, window_size):
+        """
+        Smooth the whole dataset with one window (meters shorter than the
+        window are left unsmoothed).
+
+        Returns:
+            DataFrame with smoothed values (original values preserved)
+        """
+        meter_rows = np.diff(self.offsets)
+        long_meters = meter_rows * self.n_cols >= window_size
+        long_rows = np.repeat(long_meters, meter_rows)
+        long_offsets = np.concatenate([[0], np.cumsum(meter_rows[long_meters])])
+
+        # Where the original exists use it, elsewhere the smoothed value
+        # (the imputed one for meters shorter than the window)
+        final_matrix = np.where(np.isnan(self.original), self.imputed, self.original)
+        if long_rows.any():
+            averaged = centered_mean(self.sums, self.counts, self.base, self.flat_offsets, window_size)
+            averaged = averaged.reshape(-1, self.n_cols)[long_rows]
+            # Cumulative readings never decrease along the meter's series
+            smoothed = enforce_monotonic_segments(averaged, long_offsets)
+            rows = self.order[long_rows]
+            original = self.original[rows]
+            final_matrix[rows] = np.where(np.isnan(original), smoothed, original)
+
+        result_df = self.df.copy()
+        result_df[self.value_columns] = final_matrix
+        return result_df
+
+
+def _index_gap_runs(gap_index, ids, dates, order, offsets, n_cols):
+    """
+    Gap runs of a GapIndex in the (meter, position) coordinates of
+    meter_date_order(ids). None when the index does not describe these rows
+    (unknown meters, different row counts, rows not date-sorted).
+    """
+    meter_index = gap_index.lookup(pd.unique(np.asarray(ids)))
+    meter_rows = np.diff(offsets)
+    if (meter_index < 0).any() or not np.array_equal(gap_index.hours[meter_index], meter_rows * n_cols):
+        return None
+
+    # Gaps of each meter, meters in local order
+    counts = np.diff(gap_index.gap_offsets)[meter_index]
+    meters = np.repeat(np.arange(len(meter_index)), counts)
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    gaps = np.repeat(gap_index.gap_offsets[meter_index] - first, counts) + np.arange(counts.sum())
+    gap_start = gap_index.gap_start[gaps]
+    gap_day = gap_start.astype('datetime64[D]')
+    gap_hour = (gap_start - gap_day.astype('datetime64[h]')).astype(np.int64)
+
+    # Row of each gap's first day: search (meter, day) keys of the rows
+    days = pd.to_datetime(pd.Series(np.asarray(dates)[order])).values.astype('datetime64[D]').astype(np.int64)
+    codes = np.repeat(np.arange(len(meter_rows)), meter_rows)
+    keys = (codes << 32) + days
+    if len(keys) > 1 and not (np.diff(keys) > 0).all():
+        return None
+    wanted = (meters.astype(np.int64) << 32) + gap_day.astype(np.int64)
+    rows = np.minimum(np.searchsorted(keys, wanted), max(len(keys) - 1, 0))
+    if len(wanted) and not np.array_equal(keys[rows], wanted):
+        return None
+    positions = (rows - offsets[meters]) * n_cols + gap_hour
+    return meters, positions, gap_index.gap_length[gaps].astype(np.int64)
+
+
+def smooth_gaps_numpy(df, value_columns, original_df, window_size=25, gap_index=None, verbose=True):
+    """
+    Moving-average smoothing computed only where it is kept: inside the gaps.
+
+    Same centered moving average as smooth_time_series_numpy, evaluated from
+    prefix sums over each gap plus a half-window margin on both sides (gaps
+    whose windows overlap share one region). The work scales with the number
+    of missing readings, not the dataset size.
+
+    Monotonicity is enforced locally: a running max inside each gap, clipped
+    between the observed readings that bound it. Meters shorter than the
+    window are left unsmoothed.
+
+    Args:
+        df: DataFrame with IMPUTED data ('id' column, and 'data' to use gap_index)
         value_columns: List of column names (index_0..index_23)
         original_df: DataFrame with ORIGINAL data (aligned)
         window_size: Window size for smoothing
+        gap_index: Optional GapIndex of the original file (used when it matches
+            the rows of df, each meter date-sorted; otherwise the gaps are
+            taken from original_df)
         verbose: Print progress
-        
+
     Returns:
         DataFrame with smoothed values (original values preserved)
     """
     if verbose:
-        print(f"\n🌊 Suavização Contínua (Numpy Convolution, janela={window_size})...")
-        print(f"   Tratando transições entre dias (Evita degraus nas viradas de dia)")
-    
-    # 1. Prepare Data
-    # Sort by ID and Date to ensure continuous time
-    if verbose: print("   Ordenando dados...")
-    
-    # We work on copies to be safe
-    df_work = df.copy()
-    
-    # Align sorting of both dataframes
-    # Assume df and original_df are already aligned by the caller (latc_app.py logic)
-    # But just to be sure we are working on the internal df structure
-    
-    # Extract values: (N_rows, 24)
-    imputed_vals = df_work[value_columns].values.astype(float)
+        print(f"\n🎯 Suavização nos gaps (Numpy, janela={window_size})...")
+
+    imputed_vals = df[value_columns].values.astype(float)
     original_vals = original_df[value_columns].values.astype(float)
-    ids = df_work['id'].values
-    
     n_rows, n_cols = imputed_vals.shape
-    
-    if verbose: print(f"   Processando {n_rows:,} dias x {n_cols} horas...")
-    
-    # 2. Identify Meter Boundaries
-    # changing_ids is True where id changes from previous row
-    # We need to loop over meters. 
-    # Fast way: identify start/end indices for each meter
-    
-    # Get unique IDs and their counts (assuming sorted by ID!)
-    # Ideally should sort first, but let's assume the alignment step did it. 
-    # To be safe, let's use the ID grouping approach which is robust.
-    
-    # Efficient iteration using numpy unique with counts
-    unique_ids, counts = np.unique(ids, return_counts=True)
-    # The ids might not be contiguous blocks if not sorted, so let's rely on pandas groupby indices
-    # which is safer and quite fast.
-    
-    # Group indices by ID
-    grouped_indices = df_work.groupby('id').indices # Dict {id: array_of_indices}
-    
-    total_meters = len(grouped_indices)
-    processed_count = 0
-    
-    # Output arrays
-    smoothed_flat = np.zeros(imputed_vals.size)
-    
-    # Flatten the input matrices for easier indexing
-    # But wait, groupby indices refer to ROW indices.
-    # We want to smooth the FLATTENED sequence of rows for each meter.
-    
-    # Let's create a Result Matrix of same shape
-    final_matrix = imputed_vals.copy()
-    
-    # Pre-calculate window for convolution
-    window = np.ones(window_size) / window_size
-    
-    # Iterate over meters
-    for i, (meter_id, row_indices) in enumerate(grouped_indices.items()):
-        
-        # Sort indices (groupby might not guarantee order if data wasn't sorted)
-        # We need strict chronological order
-        # Assuming df was sorted by date, row_indices should be monotonic.
-        # But let's act on the Safe side: Get sorting order of these rows by 'data' if possible?
-        # The latc_app passes 'df_to_smooth' which might NOT be sorted by ID/Data completely?
-        # Let's trust row_indices are in order if input DF was sorted.
-        
-        # Extract the block for this meter: (M_days, 24)
-        meter_imputed = imputed_vals[row_indices]
-        meter_original = original_vals[row_indices]
-        
-        # Flatten to 1D (M_days * 24)
-        meter_flat_imp = meter_imputed.ravel()
-        meter_flat_orig = meter_original.ravel()
-        
-        # Smooth (Convolution)
-        # mode='same' keeps size same
-        if len(meter_flat_imp) >= window_size:
-            # Handle edge effects better? mirror padding?
-            # Simple 'same' convolution pads with zero, which is bad for series.
-            # Use data reflection or edge value extension.
-            # np.convolve doesn't support 'valid' without size change.
-            
-            # Use pandas rolling on this 1D chunk - it handles edges better (NaNs then min_periods)
-            # It's fast enough for 1D arrays
-            s_smooth = pd.Series(meter_flat_imp).rolling(
-                window=window_size, center=True, min_periods=1
-            ).mean().values
-            
-            # Monotonicity check (Cumulative reading shouldn't decrease)
-            # Vectorized enforce: maximum.accumulate
-            # But only enforce if it was monotonic to begin with? 
-            # Imputed data usually preserves it. Smoothing might oscillate.
-            s_smooth = np.maximum.accumulate(s_smooth)
-            
-        else:
-            s_smooth = meter_flat_imp # Too short
-        
-        # Masking: Put back original values
-        mask_nan = np.isnan(meter_flat_orig)
-        # Where NOT NaN (Original exists), use Original. Where NaN, use Smooth.
-        final_flat = meter_flat_orig.copy()
-        final_flat[mask_nan] = s_smooth[mask_nan]
-        
-        # Reshape back to (M_days, 24) and assign to result matrix
-        final_matrix[row_indices] = final_flat.reshape(meter_imputed.shape)
-        
-        processed_count += 1
-        if verbose and processed_count % 2000 == 0:
-             print(f"   Progresso: {processed_count}/{total_meters}")
-
-    if verbose: print(f"   ✅ Concluído! {total_meters} contadores processados.")
-    
-    # Write back to DF
+    order, offsets = meter_date_order(df['id'].values, _row_dates(df))
+
+    runs = None
+    if gap_index is not None and 'data' in df.columns:
+        runs = _index_gap_runs(gap_index, df['id'].values, df['data'].values, order, offsets, n_cols)
+        if verbose and runs is None:
+            print("   ⚠️ Índice de gaps não corresponde aos dados - gaps lidos do original")
+    if runs is None:
+        runs = gap_runs(np.isnan(original_vals)[order], offsets)
+    meters, positions, lengths = runs
+
+    # Gaps of meters shorter than the window keep the imputed values
+    meter_length = np.diff(offsets) * n_cols
+    keep = meter_length[meters] >= window_size
+    meters, positions, lengths = meters[keep], positions[keep], lengths[keep]
+
+    final_matrix = np.where(np.isnan(original_vals), imputed_vals, original_vals)
+    if len(meters):
+        # Region read for each gap: the gap plus half a window each side,
+        # clipped to the meter; overlapping regions are merged
+        lo = np.maximum(positions - window_size // 2, 0)
+        hi = np.minimum(positions + lengths + (window_size - 1) // 2, meter_length[meters])
+        new_region = np.ones(len(meters), dtype=bool)
+        new_region[1:] = (meters[1:] != meters[:-1]) | (lo[1:] >= hi[:-1])
+        region = np.cumsum(new_region) - 1
+        region_first = np.flatnonzero(new_region)
+        region_last = np.append(region_first[1:], len(meters)) - 1
+        region_meter = meters[region_first]
+        region_lo = lo[region_first]
+        region_length = hi[region_last] - region_lo
+        region_offsets = np.concatenate([[0], np.cumsum(region_length)])
+
+        # Source (row, hour) of every region point
+        n_points = region_offsets[-1]
+        local = np.repeat(region_lo - region_offsets[:-1], region_length) + np.arange(n_points)
+        flat = np.repeat(offsets[region_meter] * n_cols, region_length) + local
+        rows = order[flat // n_cols]
+        cols = flat % n_cols
+
+        sums, counts, base = segment_prefix_sums(imputed_vals[rows, cols], region_offsets)
+        averaged = centered_mean(sums, counts, base, region_offsets, window_size)
+
+        # Gap points inside their region
+        gap_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        run = np.repeat(np.arange(len(meters)), lengths)
+        inside = (np.repeat(region_offsets[region] + positions - region_lo[region] - gap_offsets[:-1], lengths)
+                  + np.arange(gap_offsets[-1]))
+        smoothed = pd.Series(averaged[inside]).groupby(run).cummax().values
+
+        # Cumulative readings: not below the reading before the gap,
+        # not above the reading after it
+        gap_flat = offsets[meters] * n_cols + positions
+        before = np.full(len(meters), -np.inf)
+        has_before = positions > 0
+        prev = gap_flat[has_before] - 1
+        before[has_before] = original_vals[order[prev // n_cols], prev % n_cols]
+        after = np.full(len(meters), np.inf)
+        has_after = positions + lengths < meter_length[meters]
+        nxt = gap_flat[has_after] + lengths[has_after]
+        after[has_after] = original_vals[order[nxt // n_cols], nxt % n_cols]
+        smoothed = np.maximum(np.minimum(smoothed, after[run]), before[run])
+
+        final_matrix[rows[inside], cols[inside]] = smoothed
+
+        if verbose:
+            print(f"   {gap_offsets[-1]:,} valores em {len(meters):,} gaps "
+                  f"({n_points:,} pontos lidos de {imputed_vals.size:,})")
+
+    if verbose: print(f"   ✅ Concluído! {len(offsets) - 1} contadores processados.")
+
     result_df = df.copy()
     result_df[value_columns] = final_matrix
-    
+    return result_df
+
+
+def smooth_time_series_numpy(df, value_columns, original_df, window_size=25, verbose=True, smoother=None):
+    """
+    Apply smoothing to the FULL concatenated time series of every meter at once.
+
+    This works by:
+    1. Grouping each meter's rows and flattening them (days x hours -> continuous time)
+    2. Centered moving average from segmented cumulative sums (all meters together)
+    3. Segmented monotonic projection, then original values written back
+
+    Meters shorter than the window are left unsmoothed.
+
+    Args:
+        df: DataFrame with IMPUTED data (must check 'id' column)
+        value_columns: List of column names (index_0..index_23)
+        original_df: DataFrame with ORIGINAL data (aligned)
+        window_size: Window size for smoothing
+        verbose: Print progress
+        smoother: Optional MovingAverageSmoother already built for df and
+            original_df (its prefix sums are reused; original_df may be None)
+
+    Returns:
+        DataFrame with smoothed values (original values preserved)
+    """
+    if verbose:
+        print(f"\n🌊 Suavização Contínua (Numpy, somas acumuladas segmentadas, janela={window_size})...")
+        print(f"   Tratando transições entre dias (Evita degraus nas viradas de dia)")
+        print(f"   Processando {len(df):,} dias x {len(value_columns)} horas...")
+
+    # df and original_df are aligned row by row by the caller (any row order)
+    if smoother is None:
+        smoother = MovingAverageSmoother(df, value_columns, original_df)
+    result_df = smoother.smooth(window_size)
+
+    if verbose: print(f"   ✅ Concluído! {smoother.n_meters} contadores processados.")
+
     return result_df
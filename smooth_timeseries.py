@@ -6,6 +6,8 @@ Uses only moving average for speed (savgol/spline too slow for 18k+ meters)
 import numpy as np
 import pandas as pd
 
+from monotonic import enforce_monotonic_rows
+
 
 def smooth_time_series_per_meter(df, value_columns, method='moving_avg', window_size=25, 
                                    preserve_monotonicity=True, verbose=True):
@@ -73,9 +75,7 @@ def smooth_time_series_per_meter(df, value_columns, method='moving_avg', window_
             
             # Preserve monotonicity if requested
             if preserve_monotonicity:
-                for i in range(1, len(smoothed)):
-                    if smoothed[i] < smoothed[i-1]:
-                        smoothed[i] = smoothed[i-1]
+                smoothed = enforce_monotonic_rows(smoothed)
             
             # Write back to dataframe (split into daily rows)
             idx_counter = 0
@@ -6,6 +6,8 @@ CRITICAL: Only smooths imputed values, preserves original data intact
 import numpy as np
 import pandas as pd
 
+from monotonic import enforce_monotonic_rows
+
 
 def smooth_time_series_vectorized(df, value_columns, original_df, window_size=25, verbose=True):
     """
@@ -59,10 +61,7 @@ def smooth_time_series_vectorized(df, value_columns, original_df, window_size=25
     if verbose:
         print(f"   Aplicando monotonicidade...")
     
-    for j in range(1, smoothed_matrix.shape[1]):
-        # Vectorized: for all rows at once
-        mask = smoothed_matrix[:, j] < smoothed_matrix[:, j-1]
-        smoothed_matrix[mask, j] = smoothed_matrix[mask, j-1]
+    smoothed_matrix = enforce_monotonic_rows(smoothed_matrix)
     
     # Write back to dataframe
     result_df[value_columns] = smoothed_matrix
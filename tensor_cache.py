@@ -0,0 +1,298 @@
+"""
+Dense meters × days × 24 tensor cache (memory-mapped)
+Built once from the telemetry file. Engines then slice a meter's (days, 24)
+matrix straight from the OS page cache instead of re-parsing the file and
+regrouping millions of rows with groupby('id') on every run.
+
+Cache layout (one directory per source file):
+    values.npy     float64 (n_meters, n_days, 24) - readings, NaN = missing
+    missing.npy    bool    (n_meters, n_days, 24) - True where reading is missing
+    present.npy    bool    (n_meters, n_days)     - True where the day exists in the source
+    meter_ids.npy  str     (n_meters,)            - meter ids (first-appearance order)
+    dates.npy      datetime64[D] (n_days,)        - calendar of the day axis
+    attributes.parquet  other source columns (calibre, contact_id, ...) per
+                   present (meter, day), keyed by cell = meter * n_days + day
+    meta.json      source fingerprint + shape + source column order
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from columnar_store import (TelemetryWriter, iter_telemetry_chunks, load_telemetry, resolve_telemetry_path,
+                            source_fingerprint)
+
+
+CACHE_VERSION = 2
+
+
+def default_cache_dir(data_file):
+    """data/telemetria.csv -> data/telemetria_tensor/"""
+    data_file = Path(data_file)
+    return data_file.with_name(data_file.stem + '_tensor')
+
+
+def _to_days(dates):
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]')
+
+
+def frame_to_tensor(df, value_columns):
+    """
+    In-memory version of the cache: reshape a (rows, 24) telemetry frame into
+    a dense (n_meters, n_days, 24) tensor.
+
+    Returns:
+        dict with 'values', 'present', 'meter_ids', 'dates',
+        'meter_index' and 'day_index' (row -> tensor coordinates)
+    """
+    meter_codes, meter_ids = pd.factorize(df['id'], sort=False)
+    days = _to_days(df['data'].values)
+    start, end = days.min(), days.max()
+    n_days = int((end - start).astype(int)) + 1
+    day_index = (days - start).astype(np.int64)
+
+    values = np.full((len(meter_ids), n_days, len(value_columns)), np.nan)
+    present = np.zeros((len(meter_ids), n_days), dtype=bool)
+    values[meter_codes, day_index] = df[value_columns].values.astype(float)
+    present[meter_codes, day_index] = True
+
+    return {
+        'values': values,
+        'present': present,
+        'meter_ids': np.asarray(meter_ids),
+        'dates': np.arange(start, end + 1),
+        'meter_index': meter_codes,
+        'day_index': day_index,
+    }
+
+
+def build_tensor_cache(data_file, cache_dir=None, chunksize=200_000, verbose=True):
+    """
+    Build the memory-mapped tensor cache for a telemetry file.
+
+    Two streaming passes over the (columnar) source, so memory stays bounded
+    by `chunksize` rows: the first collects meter ids and the date range, the
+    second scatters each chunk into the on-disk tensor.
+
+    Returns:
+        TensorCache opened read-only
+    """
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir(data_file)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    # meta.json is written last: a missing one marks an incomplete build
+    (cache_dir / 'meta.json').unlink(missing_ok=True)
+
+    if verbose:
+        print(f"🧊 Construindo cache tensorial: {cache_dir}")
+
+    # Pass 1: meter ids (first-appearance order) and calendar range
+    meter_ids = pd.Index([])
+    first_day, last_day = None, None
+    value_columns = None
+    for chunk in iter_telemetry_chunks(data_file, chunksize):
+        if value_columns is None:
+            columns = list(chunk.columns)
+            value_columns = [col for col in columns if col.startswith('index_')]
+            attribute_columns = [col for col in columns if col not in value_columns and col not in ('id', 'data')]
+        new_ids = pd.Index(chunk['id'].astype(str).unique())
+        meter_ids = meter_ids.append(new_ids.difference(meter_ids, sort=False))
+        days = _to_days(chunk['data'].values)
+        first_day = days.min() if first_day is None else min(first_day, days.min())
+        last_day = days.max() if last_day is None else max(last_day, days.max())
+
+    if value_columns is None:
+        raise ValueError(f"Arquivo vazio: {data_file}")
+
+    dates = np.arange(first_day, last_day + 1)
+    shape = (len(meter_ids), len(dates), len(value_columns))
+
+    if verbose:
+        print(f"   Shape: {shape[0]:,} contadores × {shape[1]} dias × {shape[2]} horas")
+
+    # Pass 2: scatter readings into the memmap
+    values = open_memmap(cache_dir / 'values.npy', mode='w+', dtype=np.float64, shape=shape)
+    present = open_memmap(cache_dir / 'present.npy', mode='w+', dtype=bool, shape=shape[:2])
+    values[:] = np.nan
+    present[:] = False
+
+    # Other columns (calibre, contact_id, ...) are kept per (meter, day) so
+    # to_frame can restore them next to the imputed readings
+    rows = 0
+    attributes = TelemetryWriter(cache_dir / 'attributes.parquet') if attribute_columns else None
+    try:
+        for chunk in iter_telemetry_chunks(data_file, chunksize):
+            meter_index = meter_ids.get_indexer(chunk['id'].astype(str))
+            day_index = (_to_days(chunk['data'].values) - first_day).astype(np.int64)
+            values[meter_index, day_index] = chunk[value_columns].values.astype(float)
+            present[meter_index, day_index] = True
+            if attributes is not None:
+                cells = pd.DataFrame({'cell': meter_index * shape[1] + day_index})
+                attributes.write(pd.concat([cells, chunk[attribute_columns].reset_index(drop=True)], axis=1))
+            rows += len(chunk)
+            if verbose:
+                print(f"   {rows:,} linhas processadas...")
+    except BaseException:
+        if attributes is not None:
+            attributes.abort()
+        raise
+    attributes_file = attributes.close().name if attributes is not None else None
+
+    # Missing mask, written per meter block to keep memory bounded
+    missing = open_memmap(cache_dir / 'missing.npy', mode='w+', dtype=bool, shape=shape)
+    block = max(1, chunksize // max(1, shape[1]))
+    for start in range(0, shape[0], block):
+        missing[start:start + block] = np.isnan(values[start:start + block])
+
+    for arr in (values, present, missing):
+        arr.flush()
+    del values, present, missing
+
+    np.save(cache_dir / 'meter_ids.npy', np.asarray(meter_ids, dtype=str))
+    np.save(cache_dir / 'dates.npy', dates)
+
+    meta = {
+        'version': CACHE_VERSION,
+        'shape': list(shape),
+        'value_columns': value_columns,
+        'columns': columns,
+        'attributes_file': attributes_file,
+        'fingerprint': source_fingerprint(data_file),
+    }
+    with open(cache_dir / 'meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    if verbose:
+        print(f"   ✓ Cache pronto ({rows:,} linhas)")
+
+    return TensorCache(cache_dir)
+
+
+def cache_is_fresh(data_file, cache_dir=None):
+    """True if the cache exists and was built from the current source file"""
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir(data_file)
+    meta_file = cache_dir / 'meta.json'
+    if not meta_file.exists():
+        return False
+    with open(meta_file, encoding='utf-8') as f:
+        meta = json.load(f)
+    try:
+        return meta.get('version') == CACHE_VERSION and meta.get('fingerprint') == source_fingerprint(data_file)
+    except FileNotFoundError:
+        return False
+
+
+def open_tensor_cache(data_file, cache_dir=None, rebuild=False, verbose=True):
+    """Open the cache for `data_file`, (re)building it if missing or stale"""
+    cache_dir = Path(cache_dir) if cache_dir else default_cache_dir(data_file)
+    if rebuild or not cache_is_fresh(data_file, cache_dir):
+        return build_tensor_cache(data_file, cache_dir, verbose=verbose)
+    if verbose:
+        print(f"🧊 Usando cache tensorial: {cache_dir}")
+    return TensorCache(cache_dir)
+
+
+class TensorCache:
+    """Read-only view of a tensor cache directory (all arrays memory-mapped)"""
+
+    def __init__(self, cache_dir, mmap_mode='r'):
+        self.cache_dir = Path(cache_dir)
+        with open(self.cache_dir / 'meta.json', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.values = np.load(self.cache_dir / 'values.npy', mmap_mode=mmap_mode)
+        self.missing = np.load(self.cache_dir / 'missing.npy', mmap_mode=mmap_mode)
+        self.present = np.load(self.cache_dir / 'present.npy', mmap_mode=mmap_mode)
+        self.meter_ids = np.load(self.cache_dir / 'meter_ids.npy')
+        self.dates = np.load(self.cache_dir / 'dates.npy')
+        self.value_columns = self.meta['value_columns']
+        self._id_lookup = None
+
+    @property
+    def n_meters(self):
+        return self.values.shape[0]
+
+    def meter_index(self, meter_id):
+        if self._id_lookup is None:
+            self._id_lookup = pd.Index(self.meter_ids)
+        return self._id_lookup.get_loc(str(meter_id))
+
+    def meter_matrix(self, i):
+        """
+        (days, 24) matrix of meter `i` for the days present in the source.
+
+        Zero-copy memmap view when the meter's days are contiguous on the
+        calendar (the usual case); a copy otherwise.
+
+        Returns:
+            (dates, matrix)
+        """
+        present = np.asarray(self.present[i])
+        days = np.flatnonzero(present)
+        if len(days) == 0:
+            return self.dates[:0], self.values[i, :0]
+        first, last = days[0], days[-1] + 1
+        if len(days) == last - first:
+            return self.dates[first:last], self.values[i, first:last]
+        return self.dates[days], self.values[i, days]
+
+    def iter_meters(self, start=0, stop=None):
+        """Yield (meter_index, meter_id, dates, matrix) for meters in [start, stop)"""
+        stop = self.n_meters if stop is None else min(stop, self.n_meters)
+        for i in range(start, stop):
+            dates, matrix = self.meter_matrix(i)
+            yield i, self.meter_ids[i], dates, matrix
+
+    def rows_per_meter(self):
+        return np.asarray(self.present).sum(axis=1)
+
+    def row_offsets(self):
+        """Start row of each meter in the long (meter, date)-ordered layout (n_meters + 1,)"""
+        return np.concatenate([[0], np.cumsum(self.rows_per_meter())])
+
+    def to_frame(self, rows=None):
+        """
+        Long frame of all present rows with the source's columns (id, data,
+        index_* and the other columns kept in the cache), ordered by meter
+        then date. `rows` may be an imputed (n_rows, 24) matrix in that same
+        order (see `row_offsets`); defaults to the cached readings.
+        """
+        present = np.asarray(self.present)
+        meter_index, day_index = np.nonzero(present)
+        if rows is None:
+            rows = self.values[meter_index, day_index]
+        df = pd.DataFrame(rows, columns=self.value_columns)
+        df.insert(0, 'data', np.datetime_as_string(self.dates[day_index], unit='D'))
+        df.insert(0, 'id', self.meter_ids[meter_index])
+
+        attributes_file = self.meta.get('attributes_file')
+        if attributes_file:
+            # Last row wins for a repeated (meter, day), as in values.npy
+            attributes = load_telemetry(self.cache_dir / attributes_file)
+            attributes['cell'] = attributes['cell'].astype(np.int64)
+            attributes = attributes.drop_duplicates('cell', keep='last').set_index('cell')
+            cells = meter_index.astype(np.int64) * present.shape[1] + day_index
+            attributes = attributes.reindex(cells).reset_index(drop=True)
+            for col in attributes.columns:
+                df[col] = attributes[col].values
+            df = df[[col for col in self.meta['columns'] if col in df.columns]]
+        return df
+
+
+def main():
+    """Build the tensor cache for a telemetry file"""
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    data_file = args[0] if args else "data/telemetria_consumos_202507281246.csv"
+    cache_dir = args[1] if len(args) > 1 else None
+
+    if resolve_telemetry_path(data_file) is None:
+        print(f"❌ Erro: Arquivo não encontrado: {data_file}")
+        return
+
+    open_tensor_cache(data_file, cache_dir, rebuild='--rebuild' in sys.argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Test script for the batched Gram-eigh SVD engine
+Checks the batched rank-k projectors against numpy's SVD and compares
+latc_svd_imputation's batched engine with the per-meter svds ('threads')
+engine on synthetic meters of different lengths
+"""
+
+import pandas as pd
+import numpy as np
+from latc_advanced import latc_svd_imputation
+from lowrank_svd import stack_block, top_k_projectors
+
+print("=" * 70)
+print("Testing Batched SVD Engine")
+print("=" * 70)
+
+np.random.seed(3)
+value_columns = [f'index_{h}' for h in range(24)]
+
+# Projectors: zero-padded rows must not change a meter's top-k subspace
+lengths = [5, 12, 30]
+offsets = np.concatenate([[0], np.cumsum(lengths)])
+values = np.random.random((offsets[-1], 24))
+block, _, _ = stack_block(values, offsets, np.arange(3))
+ranks = np.array([3, 5, 8])
+projectors = top_k_projectors(block, ranks)
+projectors_ok = True
+for m in range(3):
+    _, _, vt = np.linalg.svd(values[offsets[m]:offsets[m + 1]], full_matrices=False)
+    reference = vt[:ranks[m]].T @ vt[:ranks[m]]
+    if not np.allclose(projectors[m], reference, atol=1e-8):
+        projectors_ok = False
+
+# Engines: 25 meters of cumulative readings, 3 to 40 days, 25% missing
+rows = []
+for m in range(25):
+    n_days = np.random.randint(3, 41)
+    readings = 1000 * m + np.cumsum(np.random.random(n_days * 24)).reshape(n_days, 24)
+    readings[np.random.random(readings.shape) < 0.25] = np.nan
+    frame = pd.DataFrame(readings, columns=value_columns)
+    frame.insert(0, 'data', pd.date_range('2024-01-01', periods=n_days).strftime('%Y-%m-%d'))
+    frame.insert(0, 'id', f'METER_{m:03d}')
+    rows.append(frame)
+df_test = pd.concat(rows, ignore_index=True)
+print(f"\nTest data: {df_test['id'].nunique()} meters, {len(df_test)} rows")
+
+print("\nRunning batched and per-meter engines...")
+batched = latc_svd_imputation(df_test, value_columns, engine='batched', verbose=False)
+threads = latc_svd_imputation(df_test, value_columns, engine='threads', verbose=False)
+batched = batched.sort_values(['id', 'data']).reset_index(drop=True)
+threads = threads.sort_values(['id', 'data']).reset_index(drop=True)
+
+print("\n" + "=" * 70)
+print("VALIDATION")
+print("=" * 70)
+
+if projectors_ok:
+    print("✅ PASS: Batched projectors equal numpy SVD (zero padding ignored)")
+else:
+    print("❌ FAIL: Batched projectors differ from numpy SVD")
+
+a = batched[value_columns].values
+b = threads[value_columns].values
+relative = np.abs(a - b).max() / np.abs(b).max()
+engines_ok = batched['id'].equals(threads['id']) and relative < 1e-6
+if engines_ok:
+    print(f"✅ PASS: Batched engine matches per-meter svds (max relative difference {relative:.1e})")
+else:
+    print(f"❌ FAIL: Engines differ (max relative difference {relative:.1e})")
+
+remaining_nan = np.isnan(a).sum()
+if remaining_nan == 0:
+    print("✅ PASS: No NaN values remaining")
+else:
+    print(f"❌ FAIL: {remaining_nan} NaN values remaining")
+
+print("\n" + "=" * 70)
+if projectors_ok and engines_ok and remaining_nan == 0:
+    print("🎉 ALL TESTS PASSED - Batched engine matches svds!")
+else:
+    print("⚠️ SOME TESTS FAILED - Review the implementation")
+print("=" * 70)
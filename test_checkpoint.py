@@ -0,0 +1,194 @@
+"""
+Test script for checkpoint / resume of imputation runs
+Interrupts a run part-way, restarts it with the same input and parameters
+and checks that only the unfinished shards are imputed again and that the
+result equals an uninterrupted run - for the streaming latc_simple path
+(first run on a fresh CSV, converted to Parquet during the run) and for
+checkpointed_imputation with the hybrid engine
+"""
+
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+import latc_simple
+from columnar_store import load_telemetry
+from latc_advanced import latc_hybrid_imputation
+from run_checkpoint import checkpointed_imputation, open_run_checkpoint
+
+
+class Interrupted(Exception):
+    pass
+
+
+print("=" * 70)
+print("Testing Checkpoint / Resume")
+print("=" * 70)
+
+np.random.seed(25)
+value_columns = [f'index_{h}' for h in range(24)]
+rows = []
+for m in range(30):
+    n_days = np.random.randint(3, 15)
+    readings = 100 * m + np.cumsum(np.random.random(n_days * 24)).reshape(n_days, 24)
+    readings[np.random.random(readings.shape) < 0.15] = np.nan
+    if m % 5 == 0:
+        readings[1:3] = np.nan
+    frame = pd.DataFrame(readings, columns=value_columns)
+    frame.insert(0, 'calibre', 15)
+    frame.insert(0, 'data', pd.date_range('2024-01-01', periods=n_days).strftime('%Y-%m-%d'))
+    frame.insert(0, 'id', f'METER_{m:03d}')
+    rows.append(frame)
+df_test = pd.concat(rows, ignore_index=True)
+
+impute_block = latc_simple.simple_latc_imputation
+with tempfile.TemporaryDirectory() as tmp:
+    tmp = Path(tmp)
+    data_file = tmp / 'telemetria.csv'
+    df_test.to_csv(data_file, index=False)
+    params = {'engine': 'latc_simple.stream', 'chunksize': 50, 'enforce_monotonicity': True}
+
+    # Streaming run interrupted after 3 blocks, then restarted
+    print("\nStreaming run interrupted after 3 blocks...")
+    imputed_blocks = []
+
+    def interrupting(*args, **kwargs):
+        if len(imputed_blocks) == 3:
+            raise Interrupted()
+        imputed_blocks.append(len(args[0]))
+        return impute_block(*args, **kwargs)
+
+    latc_simple.simple_latc_imputation = interrupting
+    try:
+        checkpoint = open_run_checkpoint(data_file, params, verbose=False)
+        latc_simple.stream_latc_imputation(data_file, tmp / 'out.csv', chunksize=50, checkpoint=checkpoint)
+    except Interrupted:
+        pass
+    finally:
+        latc_simple.simple_latc_imputation = impute_block
+
+    resumed = open_run_checkpoint(data_file, params, verbose=False)
+    same_run_ok = resumed.run_dir == checkpoint.run_dir and len(resumed.manifest['shards']) == 3
+
+    print("Restarting...")
+    imputed_blocks = []
+
+    def counting(*args, **kwargs):
+        imputed_blocks.append(len(args[0]))
+        return impute_block(*args, **kwargs)
+
+    latc_simple.simple_latc_imputation = counting
+    try:
+        output, _ = latc_simple.stream_latc_imputation(data_file, tmp / 'out.csv', chunksize=50,
+                                                      checkpoint=resumed)
+    finally:
+        latc_simple.simple_latc_imputation = impute_block
+    n_blocks = len(resumed.manifest['shards'])
+    only_rest_ok = len(imputed_blocks) == n_blocks - 3
+
+    reference, _ = latc_simple.stream_latc_imputation(data_file, tmp / 'ref.csv', chunksize=50)
+    resumed_df, reference_df = load_telemetry(output), load_telemetry(reference)
+    stream_equal_ok = (resumed_df['id'].equals(reference_df['id'])
+                       and np.array_equal(resumed_df[value_columns].values, reference_df[value_columns].values,
+                                          equal_nan=True))
+
+    # Other parameters: the previous run of this input is removed
+    other = open_run_checkpoint(data_file, {**params, 'chunksize': 80}, verbose=False)
+    pruned_ok = (not resumed.run_dir.exists()
+                 and [p.name for p in other.run_dir.parent.iterdir()] == [other.run_dir.name])
+    other.clear()
+    cleared_ok = not other.run_dir.parent.exists()
+
+    # checkpointed_imputation: hybrid engine, shuffled rows, 6 meters per shard
+    print("Sharded hybrid run interrupted after 2 of 5 shards...")
+    shuffled = df_test.sample(frac=1, random_state=0).reset_index(drop=True)
+
+    def hybrid(part, callback):
+        return latc_hybrid_imputation(part, value_columns, gap_threshold_hours=24, verbose=False,
+                                      progress_callback=callback)
+
+    hybrid_reference = hybrid(shuffled, None)
+    params = {'engine': 'latc_hybrid'}
+    shards_done = []
+
+    def interrupting_hybrid(part, callback):
+        if len(shards_done) == 2:
+            raise Interrupted()
+        shards_done.append(part['id'].nunique())
+        return hybrid(part, callback)
+
+    try:
+        checkpointed_imputation(shuffled, value_columns, interrupting_hybrid,
+                                open_run_checkpoint(data_file, params, verbose=False),
+                                meters_per_shard=6, verbose=False)
+    except Interrupted:
+        pass
+
+    shards_done = []
+
+    def counting_hybrid(part, callback):
+        shards_done.append(part['id'].nunique())
+        return hybrid(part, callback)
+
+    result = checkpointed_imputation(shuffled, value_columns, counting_hybrid,
+                                     open_run_checkpoint(data_file, params, verbose=False),
+                                     meters_per_shard=6, verbose=False)
+    shards_rest_ok = len(shards_done) == 3
+    shards_equal_ok = (result['id'].equals(shuffled['id'])
+                       and np.array_equal(result[value_columns].values, hybrid_reference[value_columns].values,
+                                          equal_nan=True))
+    routing_ok = ({path: stats['meters'] for path, stats in result.attrs['routing'].items()}
+                  == {path: stats['meters'] for path, stats in hybrid_reference.attrs['routing'].items()})
+
+print("\n" + "=" * 70)
+print("VALIDATION")
+print("=" * 70)
+
+if same_run_ok:
+    print("✅ PASS: Restart after the CSV conversion finds the same run")
+else:
+    print("❌ FAIL: Restart opened a different run")
+
+if only_rest_ok:
+    print(f"✅ PASS: Only the {n_blocks - 3} unfinished blocks imputed again")
+else:
+    print(f"❌ FAIL: {len(imputed_blocks)} blocks imputed on restart, expected {n_blocks - 3}")
+
+if stream_equal_ok:
+    print("✅ PASS: Resumed streaming output equals an uninterrupted run")
+else:
+    print("❌ FAIL: Resumed streaming output differs from an uninterrupted run")
+
+if pruned_ok:
+    print("✅ PASS: Runs of other parameters are removed")
+else:
+    print("❌ FAIL: Runs of other parameters were kept")
+
+if cleared_ok:
+    print("✅ PASS: clear() removes the run directory")
+else:
+    print("❌ FAIL: clear() left the run directory")
+
+if shards_rest_ok:
+    print("✅ PASS: Only the 3 unfinished shards imputed again")
+else:
+    print(f"❌ FAIL: {len(shards_done)} shards imputed on restart, expected 3")
+
+if shards_equal_ok:
+    print("✅ PASS: Resumed sharded result equals an uninterrupted run (same row order)")
+else:
+    print("❌ FAIL: Resumed sharded result differs from an uninterrupted run")
+
+if routing_ok:
+    print("✅ PASS: Routing counts merged over all shards")
+else:
+    print("❌ FAIL: Routing counts differ from an uninterrupted run")
+
+print("\n" + "=" * 70)
+if (same_run_ok and only_rest_ok and stream_equal_ok and pruned_ok and cleared_ok
+        and shards_rest_ok and shards_equal_ok and routing_ok):
+    print("🎉 ALL TESTS PASSED - Interrupted runs resume where they stopped!")
+else:
+    print("⚠️ SOME TESTS FAILED - Review the implementation")
+print("=" * 70)
@@ -0,0 +1,122 @@
+"""
+Test script for the columnar telemetry store
+Converts a small CSV in chunks and checks that the store reads back what
+pd.read_csv reads, including metadata columns whose type changes in a later
+chunk (integral to fractional, numeric to text) and integer ids that must
+keep all their digits; a CSV that cannot be converted is read directly
+"""
+
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+from columnar_store import load_telemetry, resolve_telemetry_path, save_telemetry, convert_csv_to_store
+
+print("=" * 70)
+print("Testing Columnar Telemetry Store")
+print("=" * 70)
+
+# 3 meters x 4 days, some missing readings; calibre only turns fractional
+# and diametro only turns to text in the last meter (after the first
+# conversion chunk); the last meter has no contact_id
+np.random.seed(0)
+rows = []
+meters = [(15, 15, 42), (15, 15, 9007199254740993), (20.5, 'DN20', None)]
+for m, (calibre, diametro, contact_id) in enumerate(meters):
+    for day in range(4):
+        row = {'id': f'METER_{m:03d}', 'data': f'2024-01-{day+1:02d}', 'calibre': calibre,
+               'diametro': diametro, 'contact_id': contact_id}
+        for h in range(24):
+            row[f'index_{h}'] = np.nan if np.random.random() < 0.2 else 100 * m + day * 24 + h
+        rows.append(row)
+df_test = pd.DataFrame(rows)
+df_test['contact_id'] = pd.array([contact_id for _, _, contact_id in meters for _ in range(4)], dtype='Int64')
+value_columns = [f'index_{h}' for h in range(24)]
+
+with tempfile.TemporaryDirectory() as tmp:
+    csv_path = Path(tmp) / 'telemetria.csv'
+    df_test.to_csv(csv_path, index=False)
+    expected = pd.read_csv(csv_path)
+
+    print("\nConverting in chunks of 5 rows...")
+    store_path = convert_csv_to_store(csv_path, chunksize=5, verbose=False)
+    loaded = load_telemetry(csv_path)
+
+    print("\n" + "=" * 70)
+    print("VALIDATION")
+    print("=" * 70)
+
+    resolved_ok = resolve_telemetry_path(csv_path) == store_path
+    if resolved_ok:
+        print("✅ PASS: CSV path resolves to its Parquet store")
+    else:
+        print(f"❌ FAIL: CSV path resolves to {resolve_telemetry_path(csv_path)}")
+
+    values_ok = (list(loaded.columns) == list(expected.columns)
+                 and loaded['id'].astype(str).equals(expected['id'].astype(str))
+                 and np.array_equal(loaded[value_columns].values, expected[value_columns].values, equal_nan=True))
+    if values_ok:
+        print("✅ PASS: Store reads back the CSV columns, ids and readings")
+    else:
+        print("❌ FAIL: Store differs from pd.read_csv")
+
+    calibre_ok = np.array_equal(loaded['calibre'].values.astype(float), expected['calibre'].values)
+    if calibre_ok:
+        print("✅ PASS: calibre 15 → 20.5 across chunks kept")
+    else:
+        print(f"❌ FAIL: calibre read back as {loaded['calibre'].unique()}")
+
+    diametro_ok = list(loaded['diametro'].astype(str)) == ['15'] * 8 + ['DN20'] * 4
+    if diametro_ok:
+        print("✅ PASS: diametro 15 → 'DN20' across chunks widened to text")
+    else:
+        print(f"❌ FAIL: diametro read back as {loaded['diametro'].unique()}")
+
+    contact_ids = loaded['contact_id']
+    contact_ok = (pd.api.types.is_integer_dtype(contact_ids.dtype)
+                  and str(contact_ids[0]) == '42'
+                  and contact_ids[4] == 9007199254740993
+                  and contact_ids[8:].isna().all())
+    if contact_ok:
+        print("✅ PASS: contact_id stays integral (42, 9007199254740993, missing)")
+    else:
+        print(f"❌ FAIL: contact_id read back as {contact_ids.dtype}: {contact_ids.unique()}")
+
+    subset = load_telemetry(csv_path, columns=['id', 'index_0'], meter_ids=['METER_001'])
+    subset_ok = list(subset.columns) == ['id', 'index_0'] and set(subset['id']) == {'METER_001'} and len(subset) == 4
+    if subset_ok:
+        print("✅ PASS: Column and meter pushdown")
+    else:
+        print(f"❌ FAIL: Pushdown returned {subset.shape} / {set(subset['id'])}")
+
+    saved = save_telemetry(loaded, Path(tmp) / 'imputed.csv')
+    roundtrip = load_telemetry(saved)
+    roundtrip_ok = saved.suffix == '.parquet' and roundtrip.equals(loaded)
+    if roundtrip_ok:
+        print("✅ PASS: save_telemetry / load_telemetry round trip")
+    else:
+        print("❌ FAIL: Saved store differs")
+
+    # A reading that is not a number cannot go into the store: the partial
+    # file is removed and the CSV is read as it is
+    bad_path = Path(tmp) / 'telemetria_invalida.csv'
+    bad = df_test.copy()
+    bad['index_0'] = bad['index_0'].astype(object)
+    bad.loc[10, 'index_0'] = 'erro'
+    bad.to_csv(bad_path, index=False)
+    fallback = load_telemetry(bad_path)
+    fallback_ok = (fallback.equals(pd.read_csv(bad_path))
+                   and sorted(p.name for p in Path(tmp).iterdir() if 'invalida' in p.name) == [bad_path.name])
+    if fallback_ok:
+        print("✅ PASS: Failed conversion leaves no partial file and reads the CSV")
+    else:
+        print(f"❌ FAIL: Fallback left {sorted(p.name for p in Path(tmp).iterdir())}")
+
+print("\n" + "=" * 70)
+if (resolved_ok and values_ok and calibre_ok and diametro_ok and contact_ok and subset_ok and roundtrip_ok
+        and fallback_ok):
+    print("🎉 ALL TESTS PASSED - Store matches the CSV!")
+else:
+    print("⚠️ SOME TESTS FAILED - Review the implementation")
+print("=" * 70)
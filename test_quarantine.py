@@ -0,0 +1,237 @@
+"""
+Test script for per-meter fault isolation
+A meter that raises is retried and then quarantined, a meter that runs past
+the time limit is abandoned, quarantined meters are filled with the gap-fill
+kernel, and every other meter is imputed as in a clean run - in the SVD
+threads and batched engines and in the joblib engine (whose Parallel is
+replaced by an in-process stand-in that times out on one meter). Abandoned
+tasks keep counting against the in-flight bound until they return
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import TimeoutError as MultiprocessingTimeoutError
+
+import joblib
+import pandas as pd
+import numpy as np
+import latc_advanced
+from latc_simple import simple_latc_imputation
+from latc_simple_joblib import simple_latc_imputation_joblib
+from meter_scheduler import guarded, isolated_executor_map
+
+print("=" * 70)
+print("Testing Per-Meter Quarantine (retry, error, timeout)")
+print("=" * 70)
+
+np.random.seed(24)
+value_columns = [f'index_{h}' for h in range(24)]
+rows = []
+for m in range(12):
+    readings = 100 * m + np.cumsum(np.random.random(10 * 24)).reshape(10, 24)
+    readings[np.random.random(readings.shape) < 0.2] = np.nan
+    frame = pd.DataFrame(readings, columns=value_columns)
+    frame.insert(0, 'data', pd.date_range('2024-01-01', periods=10).strftime('%Y-%m-%d'))
+    frame.insert(0, 'id', f'METER_{m:03d}')
+    rows.append(frame)
+df_test = pd.concat(rows, ignore_index=True)
+
+# guarded: bounded retry
+attempts = []
+
+
+def flaky(task):
+    attempts.append(task)
+    if len(attempts) < 2:
+        raise RuntimeError("flaky")
+    return task
+
+
+retry_ok = guarded(flaky, 'x', retries=1) == ('x', None) and len(attempts) == 2
+error_ok = guarded(lambda task: 1 / 0, 'x', retries=2) == (None, "ZeroDivisionError: division by zero")
+
+# SVD threads engine: METER_003 raises, METER_007 is slow, METER_009 fails once
+print("\nRunning the threads engine with faulty meters...")
+clean = latc_advanced.latc_svd_imputation(df_test, value_columns, engine='threads', verbose=False)
+original_svd = latc_advanced._legacy_svd_imputation
+calls = {}
+
+
+def faulty_svd(meter_df, *args, **kwargs):
+    meter_id = meter_df['id'].iloc[0]
+    calls[meter_id] = calls.get(meter_id, 0) + 1
+    if meter_id == 'METER_003':
+        raise ValueError("boom")
+    if meter_id == 'METER_007':
+        time.sleep(2)
+    if meter_id == 'METER_009' and calls[meter_id] == 1:
+        raise RuntimeError("flaky")
+    return original_svd(meter_df, *args, **kwargs)
+
+
+latc_advanced._legacy_svd_imputation = faulty_svd
+try:
+    result = latc_advanced.latc_svd_imputation(df_test, value_columns, engine='threads', verbose=False,
+                                               meter_timeout=0.5)
+finally:
+    latc_advanced._legacy_svd_imputation = original_svd
+threads_quarantine = result.attrs['quarantine']
+bad = df_test['id'].isin(['METER_003', 'METER_007']).values
+threads_others_ok = np.allclose(result[value_columns].values[~bad], clean[value_columns].values[~bad])
+cheap = simple_latc_imputation(df_test[bad].reset_index(drop=True), value_columns)
+threads_filled_ok = np.allclose(result[value_columns].values[bad], cheap[value_columns].values)
+
+# SVD batched engine: the block holding METER_003 (raises) and METER_007
+# (slow) fails, its meters are solved one by one, and only those two are
+# quarantined
+print("Running the batched engine with faulty meters...")
+clean_batched = latc_advanced.latc_svd_imputation(df_test, value_columns, verbose=False)
+original_stack = latc_advanced.stack_block
+
+
+def faulty_stack(filled, offsets, meters):
+    if 3 in meters:
+        raise ValueError("boom")
+    if 7 in meters:
+        time.sleep(2)
+    return original_stack(filled, offsets, meters)
+
+
+latc_advanced.stack_block = faulty_stack
+try:
+    result_batched = latc_advanced.latc_svd_imputation(df_test, value_columns, verbose=False, meter_timeout=0.5)
+finally:
+    latc_advanced.stack_block = original_stack
+batched_quarantine = result_batched.attrs['quarantine']
+batched_others_ok = np.allclose(result_batched[value_columns].values[~bad], clean_batched[value_columns].values[~bad])
+batched_filled_ok = not np.isnan(result_batched[value_columns].values[bad]).any()
+
+# isolated_executor_map: a hung task keeps its thread after it is abandoned,
+# so it still counts against max_in_flight
+running = []
+most_running = 0
+lock = threading.Lock()
+
+
+def counted(task):
+    global most_running
+    with lock:
+        running.append(task[0])
+        most_running = max(most_running, len(running))
+    time.sleep(1.5 if task[0] == 0 else 0.05)
+    with lock:
+        running.remove(task[0])
+    return task[0]
+
+
+with ThreadPoolExecutor(max_workers=4) as executor:
+    outcomes = {key: error for key, _, error in
+                isolated_executor_map(executor, counted, ((i,) for i in range(8)), 2, timeout=0.3)}
+bound_ok = most_running <= 2 and outcomes[0] == 'timeout (0.3s)' and len(outcomes) == 8
+
+
+# joblib engine: Parallel stand-in that times out on meter position 0
+class TimeoutOnFirstMeter:
+    def __init__(self, **kwargs):
+        pass
+
+    def __call__(self, tasks):
+        def results():
+            for func, args, kwargs in tasks:
+                if args[1][0] == 0:
+                    raise MultiprocessingTimeoutError()
+                yield func(*args, **kwargs)
+        return results()
+
+
+print("Running the joblib engine with a timed-out meter...")
+clean_joblib = simple_latc_imputation_joblib(df_test, value_columns, n_workers=2)
+original_parallel = joblib.Parallel
+joblib.Parallel = TimeoutOnFirstMeter
+try:
+    result_joblib = simple_latc_imputation_joblib(df_test, value_columns, n_workers=2, meter_timeout=3)
+finally:
+    joblib.Parallel = original_parallel
+joblib_quarantine = result_joblib.attrs['quarantine']
+first = (df_test['id'] == 'METER_000').values
+joblib_others_ok = np.allclose(result_joblib[value_columns].values[~first],
+                               clean_joblib[value_columns].values[~first])
+joblib_filled_ok = np.allclose(result_joblib[value_columns].values[first], clean_joblib[value_columns].values[first])
+
+print("\n" + "=" * 70)
+print("VALIDATION")
+print("=" * 70)
+
+if retry_ok and error_ok:
+    print("✅ PASS: guarded retries, then reports the last error")
+else:
+    print("❌ FAIL: guarded retry / error report")
+
+threads_quarantine_ok = threads_quarantine == {'METER_003': 'ValueError: boom', 'METER_007': 'timeout (0.5s)'}
+if threads_quarantine_ok:
+    print("✅ PASS: Threads engine quarantines the raising and the slow meter")
+else:
+    print(f"❌ FAIL: Threads engine quarantine {threads_quarantine}")
+
+flaky_ok = calls['METER_009'] == 2 and 'METER_009' not in threads_quarantine
+if flaky_ok:
+    print("✅ PASS: A meter that fails once is retried")
+else:
+    print(f"❌ FAIL: METER_009 ran {calls['METER_009']} times")
+
+if threads_others_ok:
+    print("✅ PASS: Threads engine: other meters as in a clean run")
+else:
+    print("❌ FAIL: Threads engine: other meters differ from a clean run")
+
+if threads_filled_ok:
+    print("✅ PASS: Threads engine: quarantined meters filled with the gap-fill kernel")
+else:
+    print("❌ FAIL: Threads engine: quarantined meters not filled")
+
+batched_quarantine_ok = batched_quarantine == {'METER_003': 'ValueError: boom', 'METER_007': 'timeout (0.5s)'}
+if batched_quarantine_ok:
+    print("✅ PASS: Batched engine quarantines only the raising and the slow meter")
+else:
+    print(f"❌ FAIL: Batched engine quarantine {batched_quarantine}")
+
+if batched_others_ok:
+    print("✅ PASS: Batched engine: other meters of the failed block as in a clean run")
+else:
+    print("❌ FAIL: Batched engine: other meters differ from a clean run")
+
+if batched_filled_ok:
+    print("✅ PASS: Batched engine: quarantined meters filled (no NaN)")
+else:
+    print("❌ FAIL: Batched engine: quarantined meters left with NaN")
+
+if bound_ok:
+    print(f"✅ PASS: Abandoned task counts against the in-flight bound (at most {most_running} running)")
+else:
+    print(f"❌ FAIL: {most_running} tasks running with max_in_flight=2 ({outcomes})")
+
+joblib_quarantine_ok = joblib_quarantine == {'METER_000': 'timeout (3s)'}
+if joblib_quarantine_ok:
+    print("✅ PASS: Joblib engine quarantines a timed-out meter (no untimed sequential rerun)")
+else:
+    print(f"❌ FAIL: Joblib engine quarantine {joblib_quarantine}")
+
+if joblib_others_ok:
+    print("✅ PASS: Joblib engine: other meters as in a clean run")
+else:
+    print("❌ FAIL: Joblib engine: other meters differ from a clean run")
+
+if joblib_filled_ok:
+    print("✅ PASS: Joblib engine: quarantined meter filled outside the pool")
+else:
+    print("❌ FAIL: Joblib engine: quarantined meter left as input")
+
+print("\n" + "=" * 70)
+if (retry_ok and error_ok and threads_quarantine_ok and flaky_ok and threads_others_ok and threads_filled_ok
+        and batched_quarantine_ok and batched_others_ok and batched_filled_ok and bound_ok
+        and joblib_quarantine_ok and joblib_others_ok and joblib_filled_ok):
+    print("🎉 ALL TESTS PASSED - Faulty meters are isolated!")
+else:
+    print("⚠️ SOME TESTS FAILED - Review the implementation")
+print("=" * 70)
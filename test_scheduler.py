@@ -0,0 +1,130 @@
+"""
+Test script for the cost-balanced meter scheduling
+Checks that cost_balanced_batches assigns every meter once, returns batches
+largest first, and that handing them to idle workers balances a mix of
+short and year-long meters; that bounded_pool_imap yields in completion
+order with a bounded number of tasks in flight; then runs the pool and
+shared-memory engines and compares them with the vectorized one
+"""
+
+import heapq
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+import numpy as np
+from latc_simple import simple_latc_imputation
+from meter_scheduler import bounded_pool_imap, cost_balanced_batches, meter_costs
+
+
+def makespan(batches, costs, n_workers):
+    """Longest worker load when each batch goes to the first idle worker"""
+    loads = [0.0] * n_workers
+    for batch in batches:
+        heapq.heapreplace(loads, loads[0] + costs[batch].sum())
+    return max(loads)
+
+
+def sleep_task(task):
+    """Task 0 is slow, the others are quick"""
+    time.sleep(1.0 if task == 0 else 0.05)
+    return task
+
+
+print("=" * 70)
+print("Testing Cost-Balanced Scheduling")
+print("=" * 70)
+
+# 2000 short meters and 200 year-long ones, long meters at the end
+np.random.seed(21)
+lengths = np.concatenate([np.random.randint(5, 30, 2000), np.random.randint(300, 366, 200)])
+offsets = np.concatenate([[0], np.cumsum(lengths)])
+costs = meter_costs(offsets)
+n_workers = 8
+batches = cost_balanced_batches(costs, n_workers, batches_per_worker=4)
+ideal = costs.sum() / n_workers
+
+# Equal-count chunks in input order (the previous split)
+equal_chunks = np.array_split(np.arange(len(costs)), n_workers)
+
+print("\n" + "=" * 70)
+print("VALIDATION")
+print("=" * 70)
+
+covered = np.sort(np.concatenate(batches))
+cover_ok = np.array_equal(covered, np.arange(len(costs)))
+if cover_ok:
+    print("✅ PASS: Every meter in exactly one batch")
+else:
+    print("❌ FAIL: Meters missing or repeated")
+
+batch_costs = [costs[batch].sum() for batch in batches]
+order_ok = all(a >= b for a, b in zip(batch_costs, batch_costs[1:]))
+if order_ok:
+    print("✅ PASS: Batches returned largest first")
+else:
+    print("❌ FAIL: Batches not in decreasing cost")
+
+balanced = makespan(batches, costs, n_workers) / ideal
+equal = makespan(equal_chunks, costs, n_workers) / ideal
+balance_ok = balanced < 1.1 and balanced < equal
+if balance_ok:
+    print(f"✅ PASS: Longest worker at {balanced:.2f}x the ideal load (equal-count chunks: {equal:.2f}x)")
+else:
+    print(f"❌ FAIL: Longest worker at {balanced:.2f}x the ideal load (equal-count chunks: {equal:.2f}x)")
+
+# bounded_pool_imap: the slow first task must not hold back the others,
+# and never more than 3 tasks pulled and not yet yielded
+pulled = []
+
+
+def task_stream():
+    for task in range(12):
+        pulled.append(task)
+        yield task
+
+
+yielded = []
+max_pending = 0
+with Pool(2) as pool:
+    for result in bounded_pool_imap(pool, sleep_task, task_stream(), 3):
+        yielded.append(result)
+        max_pending = max(max_pending, len(pulled) - len(yielded) + 1)
+
+imap_ok = sorted(yielded) == list(range(12)) and yielded[0] != 0 and yielded[-1] == 0 and max_pending <= 3
+if imap_ok:
+    print(f"✅ PASS: bounded_pool_imap yields in completion order (slow task last, at most {max_pending} in flight)")
+else:
+    print(f"❌ FAIL: bounded_pool_imap yielded {yielded} with up to {max_pending} in flight")
+
+# Engines: same output whatever the batching (results stored by meter position)
+value_columns = [f'index_{h}' for h in range(24)]
+rows = []
+for m in range(30):
+    n_days = np.random.randint(2, 60)
+    readings = 1000 * m + np.cumsum(np.random.random(n_days * 24)).reshape(n_days, 24)
+    readings[np.random.random(readings.shape) < 0.2] = np.nan
+    frame = pd.DataFrame(readings, columns=value_columns)
+    frame.insert(0, 'data', pd.date_range('2024-01-01', periods=n_days).strftime('%Y-%m-%d'))
+    frame.insert(0, 'id', f'METER_{m:03d}')
+    rows.append(frame)
+df_test = pd.concat(rows, ignore_index=True)
+
+print("\nRunning vectorized, pool and shared-memory engines...")
+vectorized = simple_latc_imputation(df_test, value_columns)
+engines_ok = True
+for execution in ('pool', 'shared_memory'):
+    result = simple_latc_imputation(df_test, value_columns, n_workers=3, execution=execution)
+    aligned = result.set_index(['id', 'data']).loc[pd.MultiIndex.from_frame(vectorized[['id', 'data']])]
+    if np.allclose(aligned[value_columns].values, vectorized[value_columns].values):
+        print(f"✅ PASS: {execution} engine matches the vectorized one")
+    else:
+        print(f"❌ FAIL: {execution} engine differs from the vectorized one")
+        engines_ok = False
+
+print("\n" + "=" * 70)
+if cover_ok and order_ok and balance_ok and imap_ok and engines_ok:
+    print("🎉 ALL TESTS PASSED - Batches are balanced!")
+else:
+    print("⚠️ SOME TESTS FAILED - Review the implementation")
+print("=" * 70)
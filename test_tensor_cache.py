@@ -0,0 +1,91 @@
+"""
+Test script for the memory-mapped tensor cache
+Builds the cache from a small CSV in several chunks and checks that the
+meter matrices and the rebuilt long frame match the source rows, metadata
+columns included
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+from tensor_cache import build_tensor_cache, cache_is_fresh, open_tensor_cache
+
+print("=" * 70)
+print("Testing Tensor Cache")
+print("=" * 70)
+
+# 3 meters with different calendars: METER_002 skips a day (not contiguous)
+np.random.seed(1)
+rows = []
+for m, days in enumerate([range(1, 6), range(3, 9), [1, 2, 4, 5]]):
+    for day in days:
+        row = {'id': f'METER_{m:03d}', 'data': f'2024-01-{day:02d}', 'calibre': 15 + 5 * m,
+               'contact_id': 1000 + m}
+        for h in range(24):
+            row[f'index_{h}'] = np.nan if np.random.random() < 0.2 else 1000 * m + day * 24 + h
+        rows.append(row)
+df_test = pd.DataFrame(rows)
+value_columns = [f'index_{h}' for h in range(24)]
+
+with tempfile.TemporaryDirectory() as tmp:
+    csv_path = Path(tmp) / 'telemetria.csv'
+    df_test.to_csv(csv_path, index=False)
+
+    print("\nBuilding cache in chunks of 4 rows...")
+    cache = build_tensor_cache(csv_path, chunksize=4, verbose=False)
+    print(f"  - shape {cache.values.shape}, {cache.n_meters} meters")
+
+    print("\n" + "=" * 70)
+    print("VALIDATION")
+    print("=" * 70)
+
+    matrices_ok = True
+    for i, meter_id, dates, matrix in cache.iter_meters():
+        source = df_test[df_test['id'] == meter_id]
+        if not (np.array_equal(np.datetime_as_string(dates, unit='D'), source['data'].values)
+                and np.array_equal(np.asarray(matrix), source[value_columns].values, equal_nan=True)):
+            matrices_ok = False
+    if matrices_ok:
+        print("✅ PASS: Every meter matrix equals its source rows")
+    else:
+        print("❌ FAIL: Meter matrices differ from the source")
+
+    missing_ok = np.array_equal(np.asarray(cache.missing)[np.asarray(cache.present)],
+                                np.isnan(cache.values[np.asarray(cache.present)]))
+    if missing_ok:
+        print("✅ PASS: Missing mask matches the NaN readings")
+    else:
+        print("❌ FAIL: Missing mask differs")
+
+    frame = cache.to_frame()
+    frame_ok = (list(frame.columns) == list(df_test.columns)
+                and frame['id'].equals(df_test['id'])
+                and frame['data'].equals(df_test['data'])
+                and np.array_equal(frame[value_columns].values, df_test[value_columns].values, equal_nan=True)
+                and np.array_equal(frame['calibre'].values.astype(float), df_test['calibre'].values)
+                and np.array_equal(frame['contact_id'].values.astype(float), df_test['contact_id'].values))
+    if frame_ok:
+        print("✅ PASS: to_frame rebuilds the source (calibre, contact_id kept)")
+    else:
+        print(f"❌ FAIL: to_frame columns {list(frame.columns)}")
+
+    fresh_before = cache_is_fresh(csv_path)
+    time.sleep(0.05)
+    df_test.iloc[:-1].to_csv(csv_path, index=False)
+    stale_after = not cache_is_fresh(csv_path)
+    rebuilt = open_tensor_cache(csv_path, verbose=False)
+    fresh_ok = fresh_before and stale_after and int(rebuilt.rows_per_meter().sum()) == len(df_test) - 1
+    if fresh_ok:
+        print("✅ PASS: Cache rebuilt after the source changes")
+    else:
+        print("❌ FAIL: Stale cache not detected")
+
+print("\n" + "=" * 70)
+if matrices_ok and missing_ok and frame_ok and fresh_ok:
+    print("🎉 ALL TESTS PASSED - Cache matches the source!")
+else:
+    print("⚠️ SOME TESTS FAILED - Review the implementation")
+print("=" * 70)
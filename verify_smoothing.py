@@ -1,9 +1,9 @@
 """
 Diagnostic script to verify if smoothing is actually being applied
 """
-import pandas as pd
 import numpy as np
-from pathlib import Path
+
+from columnar_store import load_telemetry, resolve_telemetry_path
 
 # Check files
 files = {
@@ -17,8 +17,8 @@ print("DIAGNÓSTICO: Verificando se suavização foi aplicada")
 print("="*70)
 
 for name, path in files.items():
-    p = Path(path)
-    if p.exists():
+    p = resolve_telemetry_path(path)
+    if p is not None:
         print(f"\n✓ {name}: {p.name} ({p.stat().st_size / (1024*1024):.1f} MB)")
     else:
         print(f"\n✗ {name}: NÃO ENCONTRADO")
@@ -27,7 +27,7 @@ for name, path in files.items():
 meter_id = "C15FA157523"
 
 try:
-    df_imp = pd.read_csv(files["Imputado"])
+    df_imp = load_telemetry(files["Imputado"])
     print(f"\n[IMPUTADO]")
     print(f"  Total linhas: {len(df_imp):,}")
     
@@ -50,7 +50,7 @@ except Exception as e:
     print(f"Erro ao ler imputado: {e}")
 
 try:
-    df_smooth = pd.read_csv(files["Suavizado"])
+    df_smooth = load_telemetry(files["Suavizado"])
     print(f"\n[SUAVIZADO]")
     print(f"  Total linhas: {len(df_smooth):,}")
     